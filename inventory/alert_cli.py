@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+库存预警命令行工具 - 不启动Streamlit，直接批量计算预警并输出文件
+
+示例:
+    python alert_cli.py demo_inventory_data.csv --otd 7 -o alerts.csv
+    python alert_cli.py feeds/*.csv --batch --workers 4 -o alerts.parquet
+    python alert_cli.py feeds/*.csv --batch --model service_level --service-level 0.98 -o alerts.csv
+"""
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from alert_core import define_channel_groups, calculate_moving_average, generate_alerts
+from batch_alerts import compute_batch_alerts
+from ingest import load_sales_data
+from safety_models import SAFETY_MODELS, DEFAULT_MODEL, DEFAULT_SERVICE_LEVEL, apply_safety_model
+
+OUTPUT_FORMATS = ['csv', 'json', 'parquet']
+
+
+def load_input(path):
+    """加载单个输入文件（经过列式缓存）"""
+    df = load_sales_data(path)
+    df['IDS GIV'] = df['IDS GIV'].fillna(0)
+    return df
+
+
+def single_series_alerts(df, source, channel_groups, otd_days, model_options):
+    """整个文件视为一条序列，与看板上的计算逻辑一致"""
+    safety_data = apply_safety_model(calculate_moving_average(df, channel_groups), otd_days, **model_options)
+    latest = safety_data.iloc[-1]
+    current_inventory = latest['Inv.Value(RMB)']
+
+    rows = []
+    for alert in generate_alerts(safety_data, current_inventory):
+        rows.append({
+            'Source': source,
+            'Date': latest['Date'],
+            'Inv.Value(RMB)': current_inventory,
+            'Level': alert['level'],
+            'Type': alert['type'],
+            'Message': alert['message'],
+            'Shortage': alert['shortage']
+        })
+    return pd.DataFrame(rows, columns=['Source', 'Date', 'Inv.Value(RMB)', 'Level', 'Type', 'Message', 'Shortage'])
+
+
+def batch_series_alerts(df, source, channel_groups, otd_days, workers, model_options):
+    """按 经销商 × Hub × 品牌 分别计算每条序列的预警"""
+    alerts = compute_batch_alerts(df, channel_groups, otd_days=otd_days, max_workers=workers,
+                                  model_options=model_options)
+    alerts.insert(0, 'Source', source)
+    return alerts
+
+
+def write_alerts(alerts, output, fmt):
+    """按指定格式写出预警表"""
+    if fmt == 'csv':
+        alerts.to_csv(output, index=False, encoding='utf-8-sig')
+    elif fmt == 'json':
+        alerts.to_json(output, orient='records', date_format='iso', force_ascii=False, indent=2)
+    else:
+        alerts.to_parquet(output, index=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='库存预警批量计算（无界面）')
+    parser.add_argument('inputs', nargs='+', help='输入的销售库存CSV文件')
+    parser.add_argument('-o', '--output', required=True, help='预警输出文件')
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS,
+                        help='输出格式，默认按输出文件扩展名判断')
+    parser.add_argument('--otd', type=int, default=7, help='OTD (Order to Delivery) 天数')
+    parser.add_argument('--batch', action='store_true',
+                        help='按 经销商 × Hub × 品牌 分别计算（文件包含多条序列时使用）')
+    parser.add_argument('--workers', type=int, default=1, help='--batch 模式下的并行进程数')
+    parser.add_argument('--model', choices=list(SAFETY_MODELS), default=DEFAULT_MODEL,
+                        help='安全库存模型（默认 移动平均 × OTD）')
+    parser.add_argument('--service-level', type=float, default=DEFAULT_SERVICE_LEVEL,
+                        help='目标服务水平，用于 service_level / reorder_point / lead_time_variance 模型')
+    parser.add_argument('--lead-time-std', type=float, default=0.0,
+                        help='交期标准差（天），用于 lead_time_variance 模型')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if fmt not in OUTPUT_FORMATS:
+        print(f'❌ 无法识别的输出格式: {fmt}，请使用 --format 指定 {OUTPUT_FORMATS}', file=sys.stderr)
+        return 2
+
+    channel_groups = define_channel_groups()
+    model_options = {
+        'model': args.model,
+        'service_level': args.service_level,
+        'lead_time_std': args.lead_time_std
+    }
+    results = []
+    for path in args.inputs:
+        try:
+            df = load_input(path)
+        except Exception as e:
+            print(f'❌ 数据加载失败 {path}: {e}', file=sys.stderr)
+            return 1
+
+        source = os.path.basename(path)
+        if args.batch:
+            alerts = batch_series_alerts(df, source, channel_groups, args.otd, args.workers, model_options)
+        else:
+            alerts = single_series_alerts(df, source, channel_groups, args.otd, model_options)
+        print(f'📄 {source}: {len(df):,} 条记录, {len(alerts)} 条预警')
+        results.append(alerts)
+
+    alerts = pd.concat(results, ignore_index=True)
+    write_alerts(alerts, args.output, fmt)
+    print(f'✅ 预警已写入 {args.output} ({len(alerts)} 条)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
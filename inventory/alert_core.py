@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+
+
+def group_label(group):
+    """渠道分组在结果列名中的写法，例如 retail -> Retail"""
+    return group.capitalize()
+
+
+def build_channel_daily(df, value_col='IDS GIV'):
+    """按 日期 × 渠道 汇总销量，得到日期为行、渠道为列的矩阵"""
+    return (
+        df.groupby(['Date', 'Store Group Channel'], observed=True)[value_col]
+        .sum()
+        .unstack(fill_value=0)
+    )
+
+
+def build_group_membership(channels, channel_groups):
+    """构建 渠道 × 渠道分组 的0/1成员矩阵"""
+    channels = pd.Index(channels)
+    matrix = np.column_stack([channels.isin(members) for members in channel_groups.values()])
+    return pd.DataFrame(matrix.astype('float64'), index=channels, columns=list(channel_groups))
+
+
+def aggregate_channel_groups(channel_daily, channel_groups):
+    """
+    一次计算所有渠道分组的日销量
+
+    日期×渠道 矩阵乘以 渠道×分组 成员矩阵，分组再多也只是一次矩阵乘法。
+    """
+    membership = build_group_membership(channel_daily.columns, channel_groups)
+    return pd.DataFrame(
+        channel_daily.to_numpy(dtype='float64') @ membership.to_numpy(),
+        index=channel_daily.index,
+        columns=membership.columns
+    )
+
+
+# 定义渠道分类
+def define_channel_groups():
+    """定义渠道分组"""
+    retail_channels = ['HSM', 'MM', 'ICP', 'Grocery & Others', 'CVS', 'DCP']
+    offline_channels = ['HSM', 'MM', 'Grocery & Others', 'CVS', 'DCP', 'ICP', 'WS']
+    all_channels = ['HSM', 'MM', 'ICP', 'Grocery & Others', 'CVS', 'DCP', 'WS', 'B Store', 'CB', 'DKS', 'DMW', 'DP.com', 'EB']
+    
+    return {
+        'retail': retail_channels,
+        'offline': offline_channels,
+        'all': all_channels
+    }
+
+
+# 移动平均列的后缀，例如 Retail_Sales_MA
+MA_SUFFIX = '_Sales_MA'
+
+
+# 计算日均销量和移动平均（与OTD无关的部分）
+def calculate_moving_average(df, channel_groups, window=7):
+    """计算每日库存、各渠道分组日销量及其移动平均"""
+    # 按日期聚合数据
+    daily_data = df.groupby('Date').agg({
+        'Inv.Value(RMB)': 'first',  # 库存值（假设同一天所有记录的库存值相同）
+        'IDS GIV': 'sum'  # 当日总销量
+    }).reset_index()
+    
+    # 一次得到所有渠道分组的日销量：日期×渠道 矩阵 × 渠道×分组 成员矩阵
+    channel_daily = build_channel_daily(df).reindex(daily_data['Date'], fill_value=0)
+    group_daily = aggregate_channel_groups(channel_daily, channel_groups)
+    
+    return summarize_moving_average(daily_data, group_daily, window)
+
+
+def summarize_moving_average(daily_data, group_daily, window=7):
+    """在按日汇总（日期、库存、总销量）和各分组日销量上计算移动平均，拼成结果表"""
+    # 过滤掉库存为0的异常数据，兜底的日均销量只使用有效库存日期最近一个窗口的数据
+    valid_inventory = (daily_data['Inv.Value(RMB)'] > 0).to_numpy()
+    if valid_inventory.any():
+        ma_fallback = group_daily[valid_inventory].tail(window).mean()
+    else:
+        ma_fallback = group_daily.mean()
+    
+    # 所有分组一起计算移动平均（默认7天，用于图表显示）
+    group_ma = group_daily.rolling(window=window, min_periods=1).mean().fillna(ma_fallback)
+    
+    # 合并数据（各分组的列一次性拼接）
+    sales_columns = [f'{group_label(group)}_Daily_Sales' for group in group_daily.columns]
+    ma_columns = [f'{group_label(group)}{MA_SUFFIX}' for group in group_daily.columns]
+    result = pd.concat([
+        daily_data,
+        pd.DataFrame(group_daily.to_numpy(), columns=sales_columns),
+        pd.DataFrame(group_ma.to_numpy(), columns=ma_columns)
+    ], axis=1)
+    result[sales_columns] = result[sales_columns].fillna(0)
+    
+    return result
+
+
+# 按OTD计算安全库存线
+def apply_otd(moving_average, otd_days=7):
+    """安全库存线 = 移动平均 × OTD天数，移动平均列替换为安全库存列"""
+    ma_columns = [col for col in moving_average.columns if col.endswith(MA_SUFFIX)]
+    safety_columns = [f'Safety_Stock_{col[:-len(MA_SUFFIX)]}' for col in ma_columns]
+    safety_stock = pd.DataFrame(
+        moving_average[ma_columns].to_numpy() * otd_days,
+        columns=safety_columns,
+        index=moving_average.index
+    )
+    
+    # 确保所有数值都是有效的（不是NaN）
+    return pd.concat([moving_average.drop(columns=ma_columns), safety_stock.fillna(0)], axis=1)
+
+
+# 计算日均销量和安全库存
+def calculate_safety_stock(df, channel_groups, otd_days=7):
+    """计算安全库存线"""
+    return apply_otd(calculate_moving_average(df, channel_groups), otd_days)
+
+
+def _extend_daily_result(previous, df, compute, window=7):
+    """在已有按日结果的基础上追加新日期，只重算移动平均窗口的尾部"""
+    if previous is None or len(previous) == 0:
+        return compute(df)
+    
+    # 最后一天可能只到了部分渠道的数据，和新日期一起重算
+    last_date = previous['Date'].iloc[-1]
+    if df[df['Date'] >= last_date].empty:
+        return previous
+    
+    # 只需要前 window-1 天的原始数据作为移动平均的上下文
+    context_start = previous['Date'].iloc[max(len(previous) - window, 0)]
+    tail = compute(df[df['Date'] >= context_start])
+    tail = tail[tail['Date'] >= last_date]
+    
+    return pd.concat([previous[previous['Date'] < last_date], tail], ignore_index=True)
+
+
+# 增量更新移动平均
+def extend_moving_average(previous, df, channel_groups, window=7):
+    """增量追加新日期的日销量和移动平均（与OTD无关）"""
+    return _extend_daily_result(
+        previous, df, lambda data: calculate_moving_average(data, channel_groups, window), window
+    )
+
+
+# 增量更新安全库存数据
+def extend_safety_stock(previous, df, channel_groups, otd_days=7, window=7):
+    """在已有计算结果的基础上追加新日期，只重算移动平均窗口的尾部"""
+    return _extend_daily_result(
+        previous, df, lambda data: calculate_safety_stock(data, channel_groups, otd_days), window
+    )
+
+
+# 生成预警信号
+def generate_alerts(data, current_inventory_value):
+    """生成预警信号"""
+    alerts = []
+    latest_data = data.iloc[-1]
+    
+    # 检查是否低于安全库存线
+    if current_inventory_value < latest_data['Safety_Stock_Retail']:
+        alerts.append({
+            'level': 'critical',
+            'type': '零售渠道安全库存预警',
+            'message': f'当前库存 ¥{current_inventory_value:,.0f} 低于零售渠道安全库存线 ¥{latest_data["Safety_Stock_Retail"]:,.0f}',
+            'shortage': latest_data['Safety_Stock_Retail'] - current_inventory_value
+        })
+    
+    if current_inventory_value < latest_data['Safety_Stock_Offline']:
+        alerts.append({
+            'level': 'warning',
+            'type': '线下渠道安全库存预警',
+            'message': f'当前库存 ¥{current_inventory_value:,.0f} 低于线下渠道安全库存线 ¥{latest_data["Safety_Stock_Offline"]:,.0f}',
+            'shortage': latest_data['Safety_Stock_Offline'] - current_inventory_value
+        })
+    
+    if current_inventory_value < latest_data['Safety_Stock_All']:
+        alerts.append({
+            'level': 'info',
+            'type': '全渠道安全库存预警',
+            'message': f'当前库存 ¥{current_inventory_value:,.0f} 低于全渠道安全库存线 ¥{latest_data["Safety_Stock_All"]:,.0f}',
+            'shortage': latest_data['Safety_Stock_All'] - current_inventory_value
+        })
+    
+    return alerts
+
+
+# 各渠道分组对应的预警级别和类型（未列出的自定义分组按提醒级别处理）
+ALERT_LEVELS = {
+    'retail': ('critical', '零售渠道安全库存预警'),
+    'offline': ('warning', '线下渠道安全库存预警'),
+    'all': ('info', '全渠道安全库存预警')
+}
+
+
+def alert_level(group):
+    """返回渠道分组的 (预警级别, 预警类型)"""
+    return ALERT_LEVELS.get(group, ('info', f'{group}渠道安全库存预警'))
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+预警推送服务 - 定时批量计算预警，去重后汇总为摘要推送到 Webhook / 邮件 / 文件
+
+每一轮对所有输入文件按序列批量计算预警，与上次已推送的预警对比，只推送新出现的
+预警（以及缺口扩大到 RENOTIFY_SHORTAGE_RATIO 倍以上的预警）。成千上万条序列的
+预警汇总成少量摘要消息（每条最多 DIGEST_MAX_ALERTS 条），而不是每条序列推送一次。
+每个推送目标单独记录已推送的预警，某个目标暂时不可用时只有它在下一轮补发。
+
+示例:
+    python alert_dispatch.py feeds/*.csv --sink https://hooks.example.com/inventory --once
+    python alert_dispatch.py feeds/*.csv --sink smtp://mail.example.com:25/ops@example.com?from=alerts@example.com \\
+        --sink file:alerts.jsonl --interval 60
+"""
+
+import argparse
+import json
+import os
+import smtplib
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from email.message import EmailMessage
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import pandas as pd
+
+from alert_cli import load_input, batch_series_alerts
+from alert_core import define_channel_groups
+from batch_alerts import SERIES_KEYS
+from safety_models import SAFETY_MODELS, DEFAULT_MODEL, DEFAULT_SERVICE_LEVEL
+
+# 每条摘要消息最多包含的预警数，超过时拆成多条
+DIGEST_MAX_ALERTS = 500
+
+# 已推送过的预警，缺口扩大到上次推送时的该倍数以上时再次推送
+RENOTIFY_SHORTAGE_RATIO = 2.0
+
+# 默认推送周期（分钟）和单次推送的网络超时（秒）
+DEFAULT_INTERVAL_MINUTES = 60
+SINK_TIMEOUT_SECONDS = 10
+
+DEFAULT_STATE_FILE = 'alert_state.json'
+
+# SMTP 登录信息从环境变量读取，不写在命令行中
+SMTP_USER_ENV = 'INVENTORY_SMTP_USER'
+SMTP_PASSWORD_ENV = 'INVENTORY_SMTP_PASSWORD'
+
+LEVEL_ORDER = {'critical': 0, 'warning': 1, 'info': 2}
+LEVEL_NAMES = {'critical': '严重', 'warning': '警告', 'info': '提醒'}
+
+# 一条预警的标识：来源文件（绝对路径） × 序列 × 渠道分组
+ALERT_KEY_COLUMNS = ['Source'] + SERIES_KEYS + ['Channel Group']
+
+DIGEST_COLUMNS = ALERT_KEY_COLUMNS + ['Level', 'Type', 'Date', 'Inv.Value(RMB)', 'Safety_Stock', 'Shortage']
+
+
+def new_dispatch_state():
+    """空的推送状态：推送目标 -> 该目标已确认收到的预警（见 new_sink_state）"""
+    return {'updated_at': None, 'sinks': {}}
+
+
+def new_sink_state():
+    """单个推送目标的状态：预警标识 -> 上次推送的级别、缺口和日期"""
+    return {'updated_at': None, 'alerts': {}}
+
+
+def sink_state(state, name):
+    """
+    取某个推送目标的状态（没有推送过时为空状态）
+
+    旧版本的状态文件只有一份全局的 alerts（当时所有目标都已推送成功），
+    对每个目标都按它处理。
+    """
+    if name in state.get('sinks', {}):
+        return state['sinks'][name]
+    if 'alerts' in state:
+        return {'updated_at': state.get('updated_at'), 'alerts': state['alerts']}
+    return new_sink_state()
+
+
+def load_state(path):
+    """读取推送状态（文件不存在时为空状态）"""
+    if not os.path.exists(path):
+        return new_dispatch_state()
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    """先写临时文件再替换，中途退出不会留下损坏的状态文件"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def alert_keys(alerts):
+    """每条预警的标识字符串（缺少的序列键列按空值处理）"""
+    if len(alerts) == 0:
+        return pd.Series([], index=alerts.index, dtype=object)
+    columns = [alerts[col].astype(str) if col in alerts.columns else pd.Series('', index=alerts.index)
+               for col in ALERT_KEY_COLUMNS]
+    keys = columns[0]
+    for column in columns[1:]:
+        keys = keys + '|' + column
+    return keys
+
+
+def dedupe_alerts(alerts, state, renotify_ratio=RENOTIFY_SHORTAGE_RATIO, keys=None):
+    """
+    与某个推送目标上次推送的状态对比，返回 (需要推送的预警, 已解除的预警数, 新状态)
+
+    新出现的预警和缺口扩大到上次推送时 renotify_ratio 倍以上的预警需要推送；
+    仍在持续的其他预警不重复推送；本轮不再触发的预警视为已解除，从状态中移除，
+    之后再次触发时会重新推送。keys 为预先算好的 alert_keys(alerts)。
+    """
+    previous = state['alerts']
+    keys = alert_keys(alerts) if keys is None else keys
+    shortage = alerts['Shortage'].to_numpy(dtype='float64')
+
+    last_shortage = keys.map(lambda key: previous[key]['shortage'] if key in previous else None)
+    is_new = last_shortage.isna().to_numpy()
+    grown = ~is_new & (shortage >= last_shortage.fillna(0).to_numpy(dtype='float64') * renotify_ratio)
+    notify = is_new | grown
+
+    dates = alerts['Date'].dt.strftime('%Y-%m-%d') if len(alerts) else pd.Series([], dtype=object)
+    current = {}
+    for key, level, value, date, send in zip(keys, alerts['Level'].astype(str), shortage, dates, notify):
+        if send:
+            current[key] = {'level': level, 'shortage': float(value), 'date': date}
+        else:
+            current[key] = dict(previous[key], date=date)
+
+    resolved = len(set(previous) - set(current))
+    next_state = {'updated_at': datetime.now().isoformat(timespec='seconds'), 'alerts': current}
+    return alerts[notify].reset_index(drop=True), resolved, next_state
+
+
+def build_digests(alerts, resolved=0, max_alerts=DIGEST_MAX_ALERTS):
+    """
+    把预警汇总成摘要消息：按级别（严重 → 提醒）和缺口从大到小排序，每条最多 max_alerts 条
+
+    每条摘要带有本轮的总体统计（各级别预警数、已解除数），方便只看第一条就了解全貌。
+    没有新预警也没有解除的预警时不产生消息。
+    """
+    if len(alerts) == 0 and resolved == 0:
+        return []
+
+    ordered = alerts.assign(_order=alerts['Level'].astype(str).map(LEVEL_ORDER).fillna(len(LEVEL_ORDER)))
+    ordered = ordered.sort_values(['_order', 'Shortage'], ascending=[True, False], kind='stable')
+    columns = [col for col in DIGEST_COLUMNS if col in ordered.columns]
+    text_columns = [col for col in columns if col in ALERT_KEY_COLUMNS + ['Level', 'Type']]
+    digest_frame = ordered[columns].astype({col: str for col in text_columns})
+    if 'Date' in columns:
+        digest_frame['Date'] = ordered['Date'].dt.strftime('%Y-%m-%d')
+    records = digest_frame.to_dict('records')
+
+    counts = alerts['Level'].astype(str).value_counts().to_dict() if len(alerts) else {}
+    chunks = [records[i:i + max_alerts] for i in range(0, len(records), max_alerts)] or [[]]
+    generated_at = datetime.now().isoformat(timespec='seconds')
+    return [
+        {
+            'generated_at': generated_at,
+            'part': part,
+            'parts': len(chunks),
+            'counts': {level: int(counts.get(level, 0)) for level in LEVEL_ORDER},
+            'total': len(records),
+            'resolved': resolved,
+            'alerts': chunk
+        }
+        for part, chunk in enumerate(chunks, 1)
+    ]
+
+
+def digest_subject(digest):
+    counts = '，'.join(f"{LEVEL_NAMES[level]} {n}" for level, n in digest['counts'].items() if n)
+    subject = f"库存预警摘要：新增 {digest['total']} 条"
+    if counts:
+        subject += f"（{counts}）"
+    if digest['resolved']:
+        subject += f"，解除 {digest['resolved']} 条"
+    if digest['parts'] > 1:
+        subject += f" [{digest['part']}/{digest['parts']}]"
+    return subject
+
+
+def format_digest(digest):
+    """摘要的纯文本正文（邮件使用）"""
+    lines = [digest_subject(digest), f"生成时间: {digest['generated_at']}", '']
+    for alert in digest['alerts']:
+        series = ' / '.join(alert[col] for col in ['Source'] + SERIES_KEYS if alert.get(col) not in (None, '', 'nan'))
+        lines.append(
+            f"[{LEVEL_NAMES.get(alert['Level'], alert['Level'])}] {series} {alert['Type']}: "
+            f"库存 ¥{alert['Inv.Value(RMB)']:,.0f} 低于安全库存线 ¥{alert['Safety_Stock']:,.0f}，"
+            f"建议补货 ¥{alert['Shortage']:,.0f}"
+        )
+    return '\n'.join(lines)
+
+
+def send_webhook(sink, digests):
+    """每条摘要以JSON POST到Webhook地址"""
+    for digest in digests:
+        request = urllib.request.Request(
+            sink['url'],
+            data=json.dumps(digest, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json; charset=utf-8'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=sink.get('timeout', SINK_TIMEOUT_SECONDS)) as response:
+            response.read()
+
+
+def send_smtp(sink, digests):
+    """所有摘要在同一个SMTP会话中发送，每条摘要一封邮件"""
+    with smtplib.SMTP(sink['host'], sink['port'], timeout=sink.get('timeout', SINK_TIMEOUT_SECONDS)) as smtp:
+        if sink.get('starttls'):
+            smtp.starttls()
+        if os.environ.get(SMTP_PASSWORD_ENV):
+            smtp.login(os.environ.get(SMTP_USER_ENV, sink['sender']), os.environ[SMTP_PASSWORD_ENV])
+        for digest in digests:
+            message = EmailMessage()
+            message['Subject'] = digest_subject(digest)
+            message['From'] = sink['sender']
+            message['To'] = ', '.join(sink['recipients'])
+            message.set_content(format_digest(digest))
+            smtp.send_message(message)
+
+
+def send_file(sink, digests):
+    """每条摘要追加为JSON文件中的一行"""
+    with open(sink['path'], 'a', encoding='utf-8') as f:
+        for digest in digests:
+            f.write(json.dumps(digest, ensure_ascii=False) + '\n')
+
+
+# 推送方式 -> 发送函数，新增推送方式只需要在这里注册
+SINK_SENDERS = {
+    'webhook': send_webhook,
+    'smtp': send_smtp,
+    'file': send_file
+}
+
+
+def parse_sink(spec):
+    """
+    解析推送目标：
+        http(s)://...                                   Webhook
+        smtp://host[:port]/收件人[,收件人]?from=发件人[&starttls=1]   邮件
+        file:路径                                        JSON Lines 文件
+    """
+    parts = urlsplit(spec)
+    if parts.scheme in ('http', 'https'):
+        return {'type': 'webhook', 'url': spec}
+    if parts.scheme == 'smtp':
+        query = parse_qs(parts.query)
+        recipients = [unquote(r) for r in parts.path.lstrip('/').split(',') if r]
+        if not parts.hostname or not recipients:
+            raise ValueError(f'SMTP推送目标需要主机和收件人: {spec}')
+        return {
+            'type': 'smtp',
+            'host': parts.hostname,
+            'port': parts.port or 25,
+            'recipients': recipients,
+            'sender': query.get('from', [recipients[0]])[0],
+            'starttls': query.get('starttls', ['0'])[0] not in ('', '0')
+        }
+    if spec.startswith('file:'):
+        return {'type': 'file', 'path': spec[len('file:'):]}
+    raise ValueError(f'无法识别的推送目标: {spec}，支持 http(s)://、smtp://、file:')
+
+
+def sink_name(sink):
+    return sink.get('url') or sink.get('path') or f"smtp://{sink['host']}:{sink['port']}"
+
+
+def deliver(sink, digests):
+    """把摘要推送到一个目标，返回 (耗时, 错误)；异常不向外抛出，不影响其他目标"""
+    start = time.perf_counter()
+    error = None
+    try:
+        if digests:
+            SINK_SENDERS[sink['type']](sink, digests)
+    except Exception as e:
+        error = str(e)
+    return time.perf_counter() - start, error
+
+
+def input_sources(inputs):
+    """
+    各输入文件的来源标识（绝对路径），作为预警标识的一部分
+
+    不同目录下的同名文件（例如 east/sales.csv 和 west/sales.csv）标识不同；
+    同一个文件重复出现时预警标识会重复，直接报错。
+    """
+    sources = [os.path.abspath(path) for path in inputs]
+    duplicates = sorted({source for source in sources if sources.count(source) > 1})
+    if duplicates:
+        raise ValueError(f'输入文件重复: {duplicates}')
+    return sources
+
+
+def collect_alerts(inputs, channel_groups, otd_days=7, workers=1, model_options=None):
+    """对所有输入文件按序列批量计算预警，合并为一张表（Source 为输入文件的绝对路径）"""
+    results = []
+    for path, source in zip(inputs, input_sources(inputs)):
+        df = load_input(path)
+        results.append(batch_series_alerts(df, source, channel_groups, otd_days, workers,
+                                           model_options or {}))
+    return pd.concat(results, ignore_index=True)
+
+
+def dispatch_alerts(alerts, sinks, state, max_alerts=DIGEST_MAX_ALERTS, renotify_ratio=RENOTIFY_SHORTAGE_RATIO):
+    """
+    一轮推送：每个目标分别去重、汇总成摘要、推送
+
+    每个目标只收到它还没有确认收到的预警。推送成功的目标更新自己的状态，
+    失败的目标保留原状态，下一轮只对它重新推送，其他目标不受影响。
+    返回 (报告, 新状态)，报告中每个目标一条推送记录。
+    """
+    start = time.perf_counter()
+    keys = alert_keys(alerts)
+    key_seconds = time.perf_counter() - start
+
+    sink_states = dict(state.get('sinks', {}))
+    deliveries = []
+    for sink in sinks:
+        name = sink_name(sink)
+        start = time.perf_counter()
+        pending, resolved, next_sink_state = dedupe_alerts(alerts, sink_state(state, name), renotify_ratio, keys)
+        digests = build_digests(pending, resolved, max_alerts)
+        prepare_seconds = key_seconds + time.perf_counter() - start
+
+        seconds, error = deliver(sink, digests)
+        if error is None:
+            sink_states[name] = next_sink_state
+        else:
+            sink_states.setdefault(name, sink_state(state, name))
+        deliveries.append({
+            'sink': name,
+            'type': sink['type'],
+            'new': len(pending),
+            'resolved': resolved,
+            'messages': len(digests),
+            'prepare_seconds': prepare_seconds,
+            'seconds': seconds,
+            'error': error
+        })
+
+    report = {
+        'alerts': len(alerts),
+        'deliveries': deliveries,
+        'delivered': all(result['error'] is None for result in deliveries)
+    }
+    next_state = {'updated_at': datetime.now().isoformat(timespec='seconds'), 'sinks': sink_states}
+    return report, next_state
+
+
+def print_report(report):
+    print(f"🔔 预警 {report['alerts']:,} 条")
+    for result in report['deliveries']:
+        status = '✅' if result['error'] is None else f"❌ {result['error']}（下一轮重新推送）"
+        print(f"  {result['type']:<8s} {result['sink']}: 需推送 {result['new']:,} 条，解除 {result['resolved']:,} 条，"
+              f"{result['messages']} 条消息 {result['seconds']:.3f} 秒 {status}")
+
+
+def run_once(args, sinks, channel_groups, model_options):
+    alerts = collect_alerts(args.inputs, channel_groups, args.otd, args.workers, model_options)
+    report, state = dispatch_alerts(alerts, sinks, load_state(args.state), args.max_alerts)
+    save_state(args.state, state)
+    print_report(report)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='库存预警定时推送（去重、批量摘要）')
+    parser.add_argument('inputs', nargs='+', help='输入的销售库存CSV文件')
+    parser.add_argument('--sink', action='append', required=True,
+                        help='推送目标，可重复：http(s)://... / smtp://host:port/收件人?from=发件人 / file:路径')
+    parser.add_argument('--state', default=DEFAULT_STATE_FILE, help='已推送预警的状态文件（用于去重）')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL_MINUTES, help='推送周期（分钟）')
+    parser.add_argument('--once', action='store_true', help='只运行一轮')
+    parser.add_argument('--max-alerts', type=int, default=DIGEST_MAX_ALERTS, help='每条摘要最多包含的预警数')
+    parser.add_argument('--otd', type=int, default=7, help='OTD (Order to Delivery) 天数')
+    parser.add_argument('--workers', type=int, default=1, help='并行进程数')
+    parser.add_argument('--model', choices=list(SAFETY_MODELS), default=DEFAULT_MODEL,
+                        help='安全库存模型（默认 移动平均 × OTD）')
+    parser.add_argument('--service-level', type=float, default=DEFAULT_SERVICE_LEVEL,
+                        help='目标服务水平，用于 service_level / reorder_point / lead_time_variance 模型')
+    parser.add_argument('--lead-time-std', type=float, default=0.0,
+                        help='交期标准差（天），用于 lead_time_variance 模型')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        sinks = [parse_sink(spec) for spec in args.sink]
+        input_sources(args.inputs)
+    except ValueError as e:
+        print(f'❌ {e}', file=sys.stderr)
+        return 2
+
+    channel_groups = define_channel_groups()
+    model_options = {
+        'model': args.model,
+        'service_level': args.service_level,
+        'lead_time_std': args.lead_time_std
+    }
+
+    if args.once:
+        report = run_once(args, sinks, channel_groups, model_options)
+        return 0 if report['delivered'] else 1
+
+    # 按固定节拍运行（下一轮的开始时间不受本轮耗时影响），单轮失败只记录错误
+    interval = args.interval * 60
+    next_run = time.monotonic()
+    while True:
+        print(f"⏰ {datetime.now().isoformat(timespec='seconds')}")
+        try:
+            run_once(args, sinks, channel_groups, model_options)
+        except Exception as e:
+            print(f'❌ 本轮推送失败: {e}', file=sys.stderr)
+        next_run += interval
+        time.sleep(max(0.0, next_run - time.monotonic()))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+from alert_core import alert_level
+from batch_alerts import SERIES_KEYS, aggregate_batch_daily, rolling_mean_by_series, rolling_std_by_series
+from safety_models import DEFAULT_MODEL, DEFAULT_SERVICE_LEVEL, safety_stock_lines
+
+# 默认回测的OTD网格（天）
+OTD_GRID = list(range(1, 31))
+
+# 单次广播的最大元素数（行 × 渠道分组 × OTD），超过时按序列分块，控制峰值内存
+MAX_BROADCAST_CELLS = 8_000_000
+
+
+def series_starts(positions):
+    """每条序列在按 序列、日期 排序的数组中的起始行号"""
+    return np.flatnonzero(np.asarray(positions) == 0)
+
+
+def first_true_by_series(mask, starts):
+    """
+    每条序列中第一个为True的行号（沿第0维），没有时为 -1
+
+    mask 的第0维按序列分段，其余维度原样保留。
+    """
+    n_rows = len(mask)
+    shape = (n_rows,) + (1,) * (mask.ndim - 1)
+    rows = np.where(mask, np.arange(n_rows).reshape(shape), n_rows)
+    first = np.minimum.reduceat(rows, starts, axis=0)
+    return np.where(first < n_rows, first, -1)
+
+
+def _chunk_bounds(starts, n_rows, cells_per_row, max_cells=MAX_BROADCAST_CELLS):
+    """按完整序列切块，使每块的广播元素数不超过 max_cells（单条序列超过时单独成块）"""
+    max_rows = max(1, max_cells // max(cells_per_row, 1))
+    bounds = np.append(starts, n_rows)
+    chunks = []
+    first = 0
+    while first < len(starts):
+        last = np.searchsorted(bounds, bounds[first] + max_rows, side='right') - 1
+        last = min(max(last, first + 1), len(starts))
+        chunks.append((first, last))
+        first = last
+    return chunks
+
+
+def backtest_grid(inventory, mean, std, positions, otd_grid=OTD_GRID, model=DEFAULT_MODEL,
+                  service_level=DEFAULT_SERVICE_LEVEL, lead_time_std=0.0, max_cells=MAX_BROADCAST_CELLS):
+    """
+    对每一天、每个渠道分组、每个OTD判断是否触发预警（行 × 分组 × OTD 一次广播）
+
+    inventory 为每行（序列 × 日期）的库存，mean/std 为 行 × 分组 的日销量移动平均和标准差，
+    positions 为每行在所属序列内的序号。返回字典：
+        alert_days   序列 × 分组 × OTD 的预警天数
+        first_alert  序列 × 分组 × OTD 首次预警的行号（没有为 -1）
+        days         每条序列的天数
+        stockout     每条序列首次断货（库存 <= 0）的行号（没有为 -1）
+    """
+    inventory = np.asarray(inventory, dtype='float64')
+    mean = np.asarray(mean, dtype='float64')
+    std = np.asarray(std, dtype='float64')
+    otd = np.asarray(otd_grid, dtype='float64')
+    starts = series_starts(positions)
+    n_rows = len(inventory)
+
+    alert_days = np.zeros((len(starts), mean.shape[1], len(otd)), dtype='int64')
+    first_alert = np.full(alert_days.shape, -1, dtype='int64')
+    for first, last in _chunk_bounds(starts, n_rows, mean.shape[1] * len(otd), max_cells):
+        lo = starts[first]
+        hi = starts[last] if last < len(starts) else n_rows
+        safety = safety_stock_lines(mean[lo:hi, :, None], std[lo:hi, :, None], otd[None, None, :],
+                                    model, service_level, lead_time_std)
+        below = inventory[lo:hi, None, None] < safety
+        chunk_starts = starts[first:last] - lo
+        alert_days[first:last] = np.add.reduceat(below, chunk_starts, axis=0)
+        chunk_first = first_true_by_series(below, chunk_starts)
+        first_alert[first:last] = np.where(chunk_first >= 0, chunk_first + lo, -1)
+
+    return {
+        'alert_days': alert_days,
+        'first_alert': first_alert,
+        'days': np.diff(np.append(starts, n_rows)),
+        'stockout': first_true_by_series(inventory <= 0, starts)
+    }
+
+
+def backtest_alerts(daily, group_daily, otd_grid=OTD_GRID, window=7, series_keys=SERIES_KEYS,
+                    model=DEFAULT_MODEL, service_level=DEFAULT_SERVICE_LEVEL, lead_time_std=0.0):
+    """
+    历史预警回测：在 aggregate_batch_daily 的结果上评估所有 序列 × 渠道分组 × OTD
+
+    返回长表，每个 序列 × 渠道分组 × OTD 一行：预警级别、预警天数及占比、首次预警日期、
+    首次断货日期，以及首次预警到首次断货的提前天数（Stockout_Lead_Days，预警晚于
+    断货或没有断货时为NaN）。
+    """
+    keys = list(series_keys)
+    positions = daily.groupby(level=keys, observed=True).cumcount().to_numpy() if keys \
+        else np.arange(len(daily))
+    values = group_daily.to_numpy(dtype='float64')
+    mean = rolling_mean_by_series(values, positions, window)
+    std = rolling_std_by_series(values, positions, window) if model != DEFAULT_MODEL else np.zeros_like(mean)
+
+    grid = backtest_grid(daily.to_numpy(dtype='float64'), mean, std, positions, otd_grid,
+                         model, service_level, lead_time_std)
+
+    frame = daily.reset_index()
+    dates = frame['Date'].to_numpy()
+    starts = series_starts(positions)
+    groups = list(group_daily.columns)
+    n_series, n_groups, n_otd = grid['alert_days'].shape
+
+    def take_dates(rows):
+        return np.where(rows >= 0, dates[np.maximum(rows, 0)], np.datetime64('NaT'))
+
+    result = pd.DataFrame({
+        'Channel Group': pd.Categorical(np.tile(np.repeat(groups, n_otd), n_series), categories=groups),
+        'OTD': np.tile(np.asarray(otd_grid), n_series * n_groups),
+        'Alert_Days': grid['alert_days'].ravel(),
+        'Days': np.repeat(grid['days'], n_groups * n_otd),
+        'First_Alert': take_dates(grid['first_alert'].ravel()),
+        'Stockout_Date': np.repeat(take_dates(grid['stockout']), n_groups * n_otd)
+    })
+    if keys:
+        labels = frame.loc[starts, keys].reset_index(drop=True)
+        result = pd.concat([labels.loc[np.repeat(np.arange(n_series), n_groups * n_otd)].reset_index(drop=True),
+                            result], axis=1)
+
+    result.insert(len(keys) + 1, 'Level', result['Channel Group'].map({g: alert_level(g)[0] for g in groups}))
+    result['Alert_Pct'] = result['Alert_Days'] / result['Days'] * 100
+    lead = (result['Stockout_Date'] - result['First_Alert']).dt.days
+    result['Stockout_Lead_Days'] = lead.where(lead >= 0)
+    return result
+
+
+def run_backtest(df, channel_groups, otd_grid=OTD_GRID, window=7, series_keys=SERIES_KEYS, **model_options):
+    """从原始记录直接回测（数据中缺少的序列键列会被忽略）"""
+    keys = [key for key in series_keys if key in df.columns]
+    data = df.assign(Date=pd.to_datetime(df['Date']), **{'IDS GIV': df['IDS GIV'].fillna(0)})
+    daily, group_daily = aggregate_batch_daily(data, channel_groups, keys)
+    return backtest_alerts(daily, group_daily, otd_grid, window, keys, **model_options)
+
+
+def summarize_backtest(result):
+    """按 OTD × 预警级别 汇总回测结果：触发预警的序列数、预警天数占比、断货提前天数中位数"""
+    summary = result.groupby(['OTD', 'Level'], sort=True).agg(
+        Series=('Days', 'size'),
+        Alerted_Series=('Alert_Days', lambda days: int((days > 0).sum())),
+        Alert_Days=('Alert_Days', 'sum'),
+        Days=('Days', 'sum'),
+        Median_Lead_Days=('Stockout_Lead_Days', 'median')
+    ).reset_index()
+    summary['Alert_Pct'] = summary['Alert_Days'] / summary['Days'] * 100
+    return summary
@@ -0,0 +1,221 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from alert_core import aggregate_channel_groups, alert_level
+from safety_models import DEFAULT_MODEL, DEFAULT_SERVICE_LEVEL, safety_stock_lines
+
+# 一条库存序列由 经销商 × Hub × 品牌 唯一确定
+SERIES_KEYS = ['Distributor', 'Hub', 'Product Hierarchy - Brand']
+
+# 并行计算时按 经销商 × Hub 分区，同一序列的数据总在同一个分区里
+PARTITION_KEYS = ['Distributor', 'Hub']
+
+
+def _window_sum(values, counts, window, center=None):
+    """
+    每行向前 counts 行（含当行）的窗口和，按滞后天数逐个累加
+
+    每个窗口只累加自己的几个值，结果与该行在数组中的位置、数据如何分区无关，
+    也不会像全局累加和相减那样在序列很多、累加和很大时丢失精度。center 不为
+    None 时累加的是与 center 之差的平方（用于方差）。
+    """
+    total = np.zeros_like(values)
+    for lag in range(window):
+        # 第 i 行加上第 i - lag 行（只在该行的窗口包含这一天时）
+        term = values[:len(values) - lag]
+        if center is not None:
+            term = term - center[lag:]
+            term *= term
+        inside = counts[lag:] > lag
+        if values.ndim > 1:
+            inside = inside[:, None]
+        total[lag:] += np.where(inside, term, 0)
+    return total
+
+
+def rolling_mean_by_series(values, positions, window=7):
+    """
+    按序列分段计算移动平均（min_periods=1）
+
+    values 按 序列、日期 排序，positions 为每行在所属序列内的序号。
+    计算量为 行数 × 窗口天数，和序列数量无关。
+    """
+    values = np.asarray(values, dtype='float64')
+    counts = np.minimum(np.asarray(positions) + 1, window)
+    window_sum = _window_sum(values, counts, window)
+
+    if values.ndim > 1:
+        counts = counts[:, None]
+    return window_sum / counts
+
+
+def rolling_std_by_series(values, positions, window=7):
+    """
+    按序列分段计算窗口内的样本标准差（ddof=1，窗口内不足两天为NaN）
+
+    先求窗口均值，再累加窗口内各值与均值之差的平方（两遍法），
+    低波动、高销量的序列也不会因相减抵消而失真。
+    """
+    values = np.asarray(values, dtype='float64')
+    counts = np.minimum(np.asarray(positions) + 1, window)
+    column_counts = counts[:, None] if values.ndim > 1 else counts
+
+    mean = _window_sum(values, counts, window) / column_counts
+    squares = _window_sum(values, counts, window, center=mean)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = squares / (column_counts - 1)
+    return np.sqrt(np.where(column_counts > 1, variance, np.nan))
+
+
+def aggregate_batch_daily(df, channel_groups, series_keys=SERIES_KEYS):
+    """
+    按 序列 × 日期 聚合：返回每日库存和各渠道分组的日销量
+
+    两者的索引都是按 序列、日期 排好序的 MultiIndex。
+    """
+    keys = list(series_keys) + ['Date']
+
+    # 每个序列每天的库存（同一天所有记录的库存值相同）
+    daily = df.groupby(keys, observed=True, sort=True)['Inv.Value(RMB)'].first()
+
+    # 序列×日期 × 渠道 的销量矩阵，再乘以成员矩阵得到所有分组的日销量
+    channel_daily = (
+        df.groupby(keys + ['Store Group Channel'], observed=True)['IDS GIV']
+        .sum()
+        .unstack(fill_value=0)
+        .reindex(daily.index, fill_value=0)
+    )
+    return daily, aggregate_channel_groups(channel_daily, channel_groups)
+
+
+def batch_moving_average(daily, group_daily, window=7, series_keys=SERIES_KEYS):
+    """各序列、各渠道分组日销量的移动平均"""
+    positions = daily.groupby(level=list(series_keys), observed=True).cumcount().to_numpy()
+    return rolling_mean_by_series(group_daily.to_numpy(), positions, window)
+
+
+def build_batch_lines(daily, group_daily, moving_avg, otd_days=7):
+    """展开为长表：每个 序列 × 日期 × 渠道分组 一行"""
+    groups = list(group_daily.columns)
+    frame = daily.reset_index()
+    lines = frame.loc[np.repeat(np.arange(len(frame)), len(groups))].reset_index(drop=True)
+    lines['Channel Group'] = pd.Categorical(np.tile(groups, len(frame)), categories=groups)
+    lines['Daily_Sales'] = group_daily.to_numpy().ravel()
+    lines['Daily_Sales_MA'] = moving_avg.ravel()
+    lines['Safety_Stock'] = lines['Daily_Sales_MA'] * otd_days
+    return lines
+
+
+def apply_batch_safety_model(lines, daily, group_daily, otd_days=7, window=7, series_keys=SERIES_KEYS,
+                             model=DEFAULT_MODEL, service_level=DEFAULT_SERVICE_LEVEL, lead_time_std=0.0):
+    """按安全库存模型重算长表的 Safety_Stock 列，所有序列和渠道分组一次计算"""
+    positions = daily.groupby(level=list(series_keys), observed=True).cumcount().to_numpy()
+    std = rolling_std_by_series(group_daily.to_numpy(), positions, window)
+    lines['Daily_Sales_Std'] = std.ravel()
+    lines['Safety_Stock'] = safety_stock_lines(
+        lines['Daily_Sales_MA'].to_numpy(), lines['Daily_Sales_Std'].to_numpy(), otd_days,
+        model, service_level, lead_time_std
+    )
+    return lines
+
+
+def calculate_batch_safety_stock(df, channel_groups, otd_days=7, window=7, series_keys=SERIES_KEYS,
+                                 model=DEFAULT_MODEL, service_level=DEFAULT_SERVICE_LEVEL, lead_time_std=0.0):
+    """
+    批量计算所有序列的安全库存线
+
+    所有 经销商×Hub×品牌 序列在一次分组聚合中完成，返回整理好的长表：
+    每个 序列 × 日期 × 渠道分组 一行。model 不是移动平均模型时，
+    安全库存线按 safety_models 中对应的公式计算（需要日销量的标准差）。
+    """
+    daily, group_daily = aggregate_batch_daily(df, channel_groups, series_keys)
+    moving_avg = batch_moving_average(daily, group_daily, window, series_keys)
+    lines = build_batch_lines(daily, group_daily, moving_avg, otd_days)
+    if model != DEFAULT_MODEL:
+        lines = apply_batch_safety_model(lines, daily, group_daily, otd_days, window, series_keys,
+                                         model, service_level, lead_time_std)
+    return lines
+
+
+def generate_batch_alerts(lines, series_keys=SERIES_KEYS, include_ok=False):
+    """
+    批量生成预警：用每个序列最新一天的库存对比各渠道分组的安全库存线
+
+    返回整理好的预警表，每个 序列 × 渠道分组 一行；默认只保留触发预警的行。
+    """
+    latest_date = lines.groupby(list(series_keys), observed=True)['Date'].transform('max')
+    alerts = lines[lines['Date'] == latest_date].copy()
+
+    alerts['Shortage'] = (alerts['Safety_Stock'] - alerts['Inv.Value(RMB)']).clip(lower=0)
+    alerts['Alert'] = alerts['Inv.Value(RMB)'] < alerts['Safety_Stock']
+
+    groups = alerts['Channel Group'].cat.categories
+    levels = {group: alert_level(group) for group in groups}
+    alerts['Level'] = alerts['Channel Group'].map({g: level for g, (level, _) in levels.items()})
+    alerts['Type'] = alerts['Channel Group'].map({g: label for g, (_, label) in levels.items()})
+
+    if not include_ok:
+        alerts = alerts[alerts['Alert']]
+    return alerts.reset_index(drop=True)
+
+
+def _alert_partition(df, channel_groups, otd_days, window, include_ok, model_options=None):
+    """单个分区的 安全库存 + 预警 计算（在子进程中执行）"""
+    lines = calculate_batch_safety_stock(df, channel_groups, otd_days, window, **(model_options or {}))
+    return generate_batch_alerts(lines, include_ok=include_ok)
+
+
+def split_partitions(df, partitions_per_task, partition_keys=PARTITION_KEYS):
+    """按 经销商 × Hub 排序切分数据，每个任务包含若干个完整分区"""
+    codes = df.groupby(partition_keys, observed=True, sort=True).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+
+    n_partitions = int(sorted_codes[-1]) + 1 if len(sorted_codes) else 0
+    task_bounds = np.arange(0, n_partitions, partitions_per_task)
+    row_bounds = np.searchsorted(sorted_codes, task_bounds)
+    row_bounds = np.append(row_bounds, len(sorted_codes))
+
+    return [
+        df.iloc[order[start:end]]
+        for start, end in zip(row_bounds[:-1], row_bounds[1:])
+    ]
+
+
+def compute_batch_alerts(df, channel_groups, otd_days=7, window=7, include_ok=False,
+                         max_workers=1, partitions_per_task=None, model_options=None):
+    """
+    批量预警计算入口
+
+    max_workers 为1时在当前进程串行计算；大于1时按 经销商 × Hub 分区，
+    每 partitions_per_task 个分区打包成一个任务交给进程池。结果按分区顺序
+    合并，与串行计算完全一致。model_options 为安全库存模型参数
+    （model / service_level / lead_time_std），默认使用移动平均 × OTD。
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers <= 1 or len(df) == 0:
+        return _alert_partition(df, channel_groups, otd_days, window, include_ok, model_options)
+
+    n_partitions = df.groupby(PARTITION_KEYS, observed=True).ngroups
+    if partitions_per_task is None:
+        # 默认每个进程分到约4个任务，兼顾负载均衡和进程间传输开销
+        partitions_per_task = max(1, math.ceil(n_partitions / (max_workers * 4)))
+    tasks = split_partitions(df, partitions_per_task)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(
+            _alert_partition,
+            tasks,
+            repeat(channel_groups),
+            repeat(otd_days),
+            repeat(window),
+            repeat(include_ok),
+            repeat(model_options)
+        ))
+    return pd.concat(results, ignore_index=True)
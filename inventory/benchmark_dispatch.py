@@ -0,0 +1,146 @@
+import argparse
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from alert_dispatch import DIGEST_MAX_ALERTS, new_dispatch_state, dispatch_alerts
+from batch_alerts import compute_batch_alerts
+from generate_demo_data import DEMO_CHANNEL_WEIGHTS, generate_scaled_frame
+from ingest import normalize_sales_frame
+
+CHANNEL_GROUPS = {
+    'retail': ['HSM', 'MM', 'ICP', 'Grocery & Others', 'CVS', 'DCP'],
+    'offline': ['HSM', 'MM', 'Grocery & Others', 'CVS', 'DCP', 'ICP', 'WS'],
+    'all': list(DEMO_CHANNEL_WEIGHTS)
+}
+
+
+def start_webhook_stub(latency=0.0):
+    """本地Webhook桩服务：记录收到的请求数和字节数，每个请求模拟 latency 秒的处理时间"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            with self.server.lock:
+                self.server.requests += 1
+                self.server.bytes += len(body)
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.bytes = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_smtp_stub(latency=0.0):
+    """本地SMTP桩服务：只实现投递需要的命令，记录收到的邮件数和字节数"""
+    class Handler(socketserver.StreamRequestHandler):
+        def reply(self, line):
+            self.wfile.write(line.encode('ascii') + b'\r\n')
+
+        def handle(self):
+            self.reply('220 stub')
+            for line in self.rfile:
+                command = line[:4].upper()
+                if command == b'DATA':
+                    self.reply('354 end with .')
+                    size = 0
+                    for data in self.rfile:
+                        if data in (b'.\r\n', b'.\n'):
+                            break
+                        size += len(data)
+                    time.sleep(latency)
+                    with self.server.lock:
+                        self.server.messages += 1
+                        self.server.bytes += size
+                    self.reply('250 queued')
+                elif command == b'QUIT':
+                    self.reply('221 bye')
+                    break
+                else:
+                    self.reply('250 ok')
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.messages = 0
+    server.bytes = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_case(label, alerts, sink, max_alerts, state=None):
+    """一轮推送并输出 消息数、耗时、预警/秒 和每条消息的平均延迟"""
+    report, state = dispatch_alerts(alerts, [sink], state or new_dispatch_state(), max_alerts)
+    delivery = report['deliveries'][0]
+    if delivery['error']:
+        raise RuntimeError(f"{label} 推送失败: {delivery['error']}")
+
+    seconds = delivery['prepare_seconds'] + delivery['seconds']
+    latency = delivery['seconds'] / delivery['messages'] * 1000 if delivery['messages'] else 0
+    print(f"  {label:<22s} 推送 {delivery['new']:>7,} 条 → {delivery['messages']:>6,} 条消息  "
+          f"{seconds:8.3f} 秒  {delivery['new'] / seconds if seconds else 0:>12,.0f} 预警/秒  "
+          f"每条消息 {latency:8.2f} 毫秒")
+    return delivery, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预警推送基准测试（本地Webhook/SMTP桩服务）')
+    parser.add_argument('--distributors', type=int, default=100)
+    parser.add_argument('--hubs', type=int, default=10)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--max-alerts', type=int, default=DIGEST_MAX_ALERTS, help='每条摘要最多包含的预警数')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='桩服务处理每条消息的模拟延迟（毫秒）')
+    parser.add_argument('--output-dir', default='.', help='文件推送目标所在目录')
+    args = parser.parse_args()
+
+    print('⏱️ 预警推送基准测试')
+    print('=' * 50)
+    df = normalize_sales_frame(generate_scaled_frame(args.distributors, args.hubs, args.days))
+    start = time.perf_counter()
+    alerts = compute_batch_alerts(df, CHANNEL_GROUPS, otd_days=7)
+    alerts.insert(0, 'Source', 'benchmark')
+    print(f'数据规模: {len(df):,} 行, {args.distributors * args.hubs:,} 个序列, '
+          f'{len(alerts):,} 条预警（计算 {time.perf_counter() - start:.2f} 秒）')
+
+    latency = args.latency_ms / 1000
+    webhook = start_webhook_stub(latency)
+    smtp = start_smtp_stub(latency)
+    webhook_sink = {'type': 'webhook', 'url': f'http://127.0.0.1:{webhook.server_address[1]}/alerts'}
+    smtp_sink = {'type': 'smtp', 'host': '127.0.0.1', 'port': smtp.server_address[1],
+                 'sender': 'alerts@localhost', 'recipients': ['ops@localhost']}
+    os.makedirs(args.output_dir, exist_ok=True)
+    file_sink = {'type': 'file', 'path': os.path.join(args.output_dir, 'benchmark_alerts.jsonl')}
+
+    print(f'\n摘要推送（每条消息最多 {args.max_alerts} 条预警）:')
+    _, state = run_case('webhook', alerts, webhook_sink, args.max_alerts)
+    run_case('smtp', alerts, smtp_sink, args.max_alerts)
+    run_case('file', alerts, file_sink, args.max_alerts)
+
+    print('\n对比：每条预警单独推送:')
+    per_alert, _ = run_case('webhook (逐条)', alerts, webhook_sink, 1)
+
+    print('\n去重：下一轮没有新预警:')
+    run_case('webhook (重复一轮)', alerts, webhook_sink, args.max_alerts, state)
+
+    digest_messages = -(-len(alerts) // args.max_alerts)
+    assert webhook.requests == digest_messages + per_alert['messages'], '桩服务收到的请求数与推送报告不一致'
+    assert smtp.messages == digest_messages, '桩服务收到的邮件数与推送报告不一致'
+    print(f'\n桩服务收到: Webhook {webhook.requests:,} 个请求 ({webhook.bytes / 1e6:.1f} MB), '
+          f'SMTP {smtp.messages:,} 封邮件 ({smtp.bytes / 1e6:.1f} MB) ✅')
+
+    webhook.shutdown()
+    smtp.shutdown()
+
+
+if __name__ == '__main__':
+    main()
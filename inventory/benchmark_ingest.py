@@ -0,0 +1,88 @@
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+
+from alert_core import calculate_safety_stock, define_channel_groups
+from feed_ingest import DEFAULT_MAX_CONCURRENCY, discover_feeds, load_feeds, load_feeds_sequential, \
+    total_daily_channel_sales
+from generate_demo_data import simulate_sales_chunk
+from ingest import CACHE_DIR_NAME
+
+
+def write_feeds(output_dir, n_feeds, n_hubs, n_days, seed=42):
+    """每个经销商生成一个CSV文件（包含其全部Hub），已存在的文件不重新生成"""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for feed in range(n_feeds):
+        path = os.path.join(output_dir, f'distributor_{feed:04d}.csv')
+        series_ids = np.arange(feed * n_hubs, (feed + 1) * n_hubs)
+        chunk = simulate_sales_chunk(series_ids, n_hubs, n_days, 13, rng)
+        if not os.path.exists(path):
+            chunk.to_csv(path, index=False)
+    return discover_feeds(output_dir)
+
+
+def clear_caches(output_dir):
+    shutil.rmtree(os.path.join(output_dir, CACHE_DIR_NAME), ignore_errors=True)
+
+
+def time_load(load, output_dir, cold, repeats):
+    """多次运行取最短耗时；cold 时每次运行前删除列式缓存（全量解析CSV）"""
+    best = None
+    result = None
+    for _ in range(repeats):
+        if cold:
+            clear_caches(output_dir)
+        start = time.perf_counter()
+        result = load()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多文件并发加载 vs 逐个文件串行加载 基准测试')
+    parser.add_argument('--feeds', type=int, default=40, help='数据文件（经销商）数')
+    parser.add_argument('--hubs', type=int, default=5, help='每个文件中的Hub数')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[2, 4, DEFAULT_MAX_CONCURRENCY],
+                        help='同时处理的文件数上限')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output-dir', default='benchmark_feeds', help='生成的数据文件目录')
+    args = parser.parse_args()
+
+    print('⏱️ 多文件加载基准测试')
+    print('=' * 50)
+    paths = write_feeds(args.output_dir, args.feeds, args.hubs, args.days)
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f'数据文件: {len(paths):,} 个, 共 {size / 1e6:,.1f} MB, CPU核数 {os.cpu_count()}')
+
+    for cold, label in [(True, '首次加载（解析CSV并写缓存）'), (False, '命中列式缓存')]:
+        print(f'\n{label}:')
+        serial_time, serial_result = time_load(
+            lambda: load_feeds_sequential(args.output_dir), args.output_dir, cold, args.repeats)
+        print(f'  串行循环             {serial_time:7.2f} 秒 ({len(serial_result) / serial_time:>12,.0f} 行/秒)')
+
+        for executor in ['process', 'thread']:
+            for concurrency in sorted(set(args.concurrency)):
+                elapsed, result = time_load(
+                    lambda: load_feeds(args.output_dir, executor=executor, max_concurrency=concurrency),
+                    args.output_dir, cold, args.repeats)
+                assert serial_result.equals(result), '并发加载的结果与串行不一致'
+                print(f'  asyncio {executor:<7s} 并发{concurrency:>3d}  {elapsed:7.2f} 秒 '
+                      f'({len(result) / elapsed:>12,.0f} 行/秒, 加速比 {serial_time / elapsed:.2f}x, 结果一致 ✅)')
+
+    # 各序列的库存先按序列取当天的值再相加，才能与所有序列的合计销量比较
+    total = total_daily_channel_sales(result)
+    total['IDS GIV'] = total['IDS GIV'].fillna(0)
+    safety_data = calculate_safety_stock(total, define_channel_groups())
+    print(f'\n合并后: {len(result):,} 行, {result["Distributor"].nunique():,} 个经销商, '
+          f'合计为 {len(total):,} 行 日期 × 渠道, calculate_safety_stock 得到 {len(safety_data):,} 天, '
+          f'最新总库存 ¥{safety_data["Inv.Value(RMB)"].iloc[-1]:,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+安全库存与预警计算流程的基准测试
+
+用演示数据生成器生成不同规模的数据集，分阶段计时（解析、聚合、移动平均、
+预警、新一天数据的滚动增量更新、OTD 1-30天历史预警回测、紧凑存储的转换和按日移动平均、
+日期前缀和索引及区间查询、看板汇总立方体和各Tab的切片汇总），
+报告 行/秒 和峰值内存，结果保存为JSON，可以用 --compare 与之前版本的结果对比。
+
+示例:
+    python benchmark_pipeline.py --series 10 100 1000 --output bench.json
+    python benchmark_pipeline.py --output bench_new.json --compare bench.json
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from alert_core import define_channel_groups
+from backtest import backtest_alerts
+from compact_store import compact_sales, compact_moving_average
+from batch_alerts import aggregate_batch_daily, batch_moving_average, build_batch_lines, generate_batch_alerts
+from dashboard_data import (
+    WEEK_COLUMN, MONTH_COLUMN, build_rollup_cube, available_channels,
+    weekly_trend, monthly_channel_sales, monthly_summary, period_inventory, period_channel_sales
+)
+from generate_demo_data import generate_scaled_data
+from ingest import parse_sales_csv, build_sales_cache, load_sales_data
+from range_index import build_date_index, channel_summary, group_summary
+from rolling_engine import seed_rolling_state, update_rolling_state
+
+HUBS_PER_DISTRIBUTOR = 10
+
+# 每档数据随机查询的日期范围个数
+RANGE_QUERIES = 100
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(func, repeats):
+    """多次运行取最短耗时，再单独跑一次用tracemalloc测峰值内存"""
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # 先释放计时阶段的结果，避免计入峰值
+    result = None
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, (peak - baseline) / 1024 / 1024
+
+
+def to_weekly_schema(df):
+    """把生成的日数据映射成看板（save.xlsx）的字段，用于测量各Tab的汇总"""
+    rng = np.random.default_rng(0)
+    weekly = df.rename(columns={'Date': WEEK_COLUMN})
+    weekly[MONTH_COLUMN] = weekly[WEEK_COLUMN].dt.to_period('M')
+    weekly['DS GIV'] = rng.gamma(2.0, 500.0, size=len(weekly))
+    return weekly
+
+
+def dashboard_tabs(cube, channel_groups):
+    """在汇总立方体上依次执行看板四个Tab的汇总"""
+    channels = list(available_channels(cube)[:5])
+    weekly_trend(cube)
+    monthly_channel_sales(cube, channels)
+    monthly_summary(cube)
+    for review_period in ["Weekly", "Monthly"]:
+        period_inventory(cube, review_period)
+        period_channel_sales(cube, review_period, channel_groups['retail'])
+        period_channel_sales(cube, review_period, channel_groups['offline'])
+        period_channel_sales(cube, review_period)
+
+
+def range_queries(index, n_queries=RANGE_QUERIES, seed=0):
+    """随机日期范围的渠道与渠道分组汇总"""
+    rng = np.random.default_rng(seed)
+    dates = index['dates']
+    for _ in range(n_queries):
+        i, j = np.sort(rng.integers(0, len(dates), 2))
+        channel_summary(index, dates[i], dates[j])
+        group_summary(index, dates[i], dates[j])
+
+
+def run_size(n_series, n_days, repeats, workdir):
+    """生成一个规模的数据集并逐阶段计时"""
+    n_distributors = max(1, n_series // HUBS_PER_DISTRIBUTOR)
+    n_hubs = min(n_series, HUBS_PER_DISTRIBUTOR)
+    path = os.path.join(workdir, f'bench_{n_distributors}x{n_hubs}x{n_days}.csv')
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = generate_scaled_data(path, n_distributors, n_hubs, n_days)
+
+    channel_groups = define_channel_groups()
+    results = []
+
+    # stage_rows 为该阶段实际处理的记录数（默认整个数据集）
+    def record(stage, func, stage_rows=None):
+        value, seconds, peak_mb = measure(func, repeats)
+        n_rows = rows if stage_rows is None else stage_rows
+        results.append({
+            'series': n_distributors * n_hubs,
+            'days': n_days,
+            'rows': rows,
+            'stage': stage,
+            'seconds': round(seconds, 6),
+            'rows_per_sec': round(n_rows / seconds) if seconds > 0 else None,
+            'peak_mb': round(peak_mb, 2)
+        })
+        print(f"  {stage:<15s} {seconds:8.3f} 秒  {n_rows / seconds:>14,.0f} 行/秒  峰值 {peak_mb:8.1f} MB")
+        return value
+
+    df = record('parse', lambda: parse_sales_csv(path))
+    record('cache_build', lambda: build_sales_cache(path))
+    record('cached_load', lambda: load_sales_data(path))
+    daily, group_daily = record('aggregation', lambda: aggregate_batch_daily(df, channel_groups))
+    moving_avg = record('rolling', lambda: batch_moving_average(daily, group_daily))
+    record('alert', lambda: generate_batch_alerts(build_batch_lines(daily, group_daily, moving_avg)))
+
+    # 新的一天到达：在滚动状态上增量更新，对比上面的全量 rolling
+    last_date = df['Date'].max()
+    history = daily.index.get_level_values('Date') < last_date
+    state = seed_rolling_state(daily[history], group_daily[history])
+    last_day = df[df['Date'] == last_date]
+    # 每次都在种子状态的副本上写入，计时的始终是新的一天追加（而不是同一天的替换）
+    record('rolling_update', lambda: update_rolling_state(copy.deepcopy(state), last_day, channel_groups),
+           stage_rows=len(last_day))
+    record('backtest', lambda: backtest_alerts(daily, group_daily))
+
+    # 紧凑存储：明细表与紧凑结构的内存对比，以及在紧凑结构上的按日移动平均
+    compact = record('compact', lambda: compact_sales(df))
+    record('compact_rolling', lambda: compact_moving_average(compact, channel_groups))
+
+    date_index = record('date_index', lambda: build_date_index(df, channel_groups))
+    record('range_queries', lambda: range_queries(date_index))
+
+    weekly_df = to_weekly_schema(df)
+    cube = record('rollup_cube', lambda: build_rollup_cube(weekly_df))
+    record('dashboard_tabs', lambda: dashboard_tabs(cube, channel_groups))
+    return results
+
+
+def compare(results, baseline_path):
+    """与之前保存的结果逐项对比耗时"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['series'], r['days'], r['stage']): r for r in baseline['results']}
+
+    print(f"\n📊 与 {baseline_path} (版本 {baseline['meta'].get('git_revision')}) 对比:")
+    for r in results:
+        old = previous.get((r['series'], r['days'], r['stage']))
+        if old is None:
+            continue
+        ratio = r['seconds'] / old['seconds'] if old['seconds'] > 0 else float('nan')
+        flag = '⚠️' if ratio > 1.2 else ('🚀' if ratio < 0.8 else '  ')
+        print(f"  {flag} {r['series']:>6d} 序列 {r['stage']:<15s} "
+              f"{old['seconds']:8.3f} → {r['seconds']:8.3f} 秒 ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='安全库存与预警流程基准测试')
+    parser.add_argument('--series', type=int, nargs='+', default=[10, 100, 500],
+                        help='各档数据的序列数（经销商×Hub）')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='之前保存的基准结果JSON')
+    args = parser.parse_args()
+
+    print('⏱️ 安全库存与预警流程基准测试')
+    print('=' * 60)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_series in args.series:
+            print(f"\n📦 {n_series} 个序列 × {args.days} 天")
+            results.extend(run_size(n_series, args.days, args.repeats, workdir))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'repeats': args.repeats
+        },
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已保存到 {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import numpy as np
+import plotly.graph_objects as go
+
+# 每张图默认最多发送到浏览器的点数（按所选时间范围内的数据量自适应分桶）
+MAX_CHART_POINTS = 1500
+
+# 所选时间范围内（降采样前）超过该点数时改用WebGL渲染（Scattergl）
+WEBGL_THRESHOLD = 5000
+
+
+def minmax_indices(values, n_buckets):
+    """
+    按等宽分桶，保留每个桶内的最大值和最小值所在位置
+
+    峰值和谷值都会被保留，曲线的包络与原始数据一致。
+    """
+    values = np.asarray(values, dtype='float64')
+    n = len(values)
+    if n == 0 or n_buckets <= 0:
+        return np.array([], dtype='int64')
+
+    width = int(np.ceil(n / n_buckets))
+    n_rows = int(np.ceil(n / width))
+    padded = np.full(n_rows * width, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(n_rows, width)
+
+    # NaN 不参与比较（整桶都是NaN时取桶内第一个点）
+    offsets = np.arange(n_rows) * width
+    highs = np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1) + offsets
+    lows = np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1) + offsets
+    return np.unique(np.minimum(np.concatenate([highs, lows]), n - 1))
+
+
+def crossing_indices(values, reference):
+    """两条曲线相交的位置（交叉点前后两天都保留），用于保留预警线被穿越的时刻"""
+    diff = np.asarray(values, dtype='float64') - np.asarray(reference, dtype='float64')
+    sign = np.sign(diff)
+    changed = np.flatnonzero(sign[1:] != sign[:-1])
+    return np.unique(np.concatenate([changed, changed + 1]))
+
+
+def downsample_frame(data, columns, max_points=MAX_CHART_POINTS, crossings=None):
+    """
+    图表数据降采样：返回原表中需要保留的行（保持原顺序）
+
+    columns 为同一张图里要画的数值列，各列共用同一组行，保证曲线在同一日期上对齐。
+    首尾两行、每列每个桶的最大/最小值都会保留；crossings 为 (列, 参照列) 列表，
+    两列相交处的行也会保留（例如库存穿越安全库存线的日期）。
+    数据量不超过 max_points 时原样返回，因此选择较短的时间范围时显示全部数据。
+    """
+    n = len(data)
+    if max_points is None or n <= max_points:
+        return data
+
+    n_buckets = max(1, max_points // (2 * len(columns)))
+    keep = [np.array([0, n - 1])]
+    for col in columns:
+        keep.append(minmax_indices(data[col].to_numpy(), n_buckets))
+    for col, reference in crossings or []:
+        keep.append(crossing_indices(data[col].to_numpy(), data[reference].to_numpy()))
+
+    return data.iloc[np.unique(np.concatenate(keep))]
+
+
+def scatter_trace(n_points, webgl_threshold=WEBGL_THRESHOLD, **kwargs):
+    """
+    点数超过阈值时使用 Scattergl（WebGL），否则使用普通 Scatter；阈值为None时不切换
+
+    n_points 为降采样前的点数：降采样后的点数不会超过点数上限，按它判断时
+    阈值高于上限就永远不会切换。
+    """
+    if webgl_threshold is not None and n_points > webgl_threshold:
+        return go.Scattergl(**kwargs)
+    return go.Scatter(**kwargs)
@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+from alert_core import build_group_membership, extend_moving_average, summarize_moving_average
+from batch_alerts import SERIES_KEYS
+from range_index import assemble_date_index
+
+# 紧凑存储中金额列的类型：float32 约7位有效数字，按日汇总时再用 float64 累加
+MEASURE_DTYPE = 'float32'
+
+CHANNEL_COLUMN = 'Store Group Channel'
+
+
+def _day_dtype(n_days):
+    """日期编号的最小整数类型"""
+    return 'int16' if n_days < np.iinfo('int16').max else 'int32'
+
+
+def compact_sales(frame, series_keys=SERIES_KEYS):
+    """
+    把明细表转换为紧凑的列式结构
+
+    返回字典：
+        days        所有日期（升序的 DatetimeIndex）
+        keys        数据中存在的序列键列
+        sales       销量明细：日期编号（int16）、序列键和渠道（分类类型）、出货金额（float32），
+                    按日期编号排序
+        inventory   库存单独成表，每个 序列 × 日期 一行（取当天第一条非空值，float32），
+                    按 日期编号、序列 排序
+    明细表中每条记录都重复的库存值只保存一份，日期只保存编号；日期为空的记录被丢弃。
+    """
+    keys = [key for key in series_keys if key in frame.columns]
+    dates = pd.to_datetime(frame['Date'])
+    days = pd.DatetimeIndex(dates.dropna().unique()).sort_values()
+    day = days.get_indexer(dates).astype(_day_dtype(len(days)))
+    valid = day >= 0
+
+    dims = {col: frame[col].astype('category').array for col in keys + [CHANNEL_COLUMN]}
+    sales = pd.DataFrame({
+        'Day': day,
+        **dims,
+        'IDS GIV': frame['IDS GIV'].fillna(0).to_numpy(dtype=MEASURE_DTYPE)
+    })[valid]
+    sales = sales.sort_values('Day', kind='stable').reset_index(drop=True)
+
+    inventory = (
+        pd.DataFrame({'Day': day, **{key: dims[key] for key in keys},
+                      'Inv.Value(RMB)': frame['Inv.Value(RMB)'].to_numpy(dtype='float64')})[valid]
+        .groupby(['Day'] + keys, observed=True, sort=True)['Inv.Value(RMB)']
+        .first()
+        .astype(MEASURE_DTYPE)
+        .reset_index()
+    )
+
+    return {'days': days, 'keys': keys, 'sales': sales, 'inventory': inventory}
+
+
+def compact_memory_usage(compact):
+    """紧凑结构占用的内存（字节）"""
+    return int(compact['sales'].memory_usage(deep=True).sum() + compact['inventory'].memory_usage(deep=True).sum()
+               + compact['days'].nbytes)
+
+
+def day_bounds(compact, start=None, end=None):
+    """日期范围（含首尾）对应的日期编号区间 [i, j)"""
+    days = compact['days']
+    i = 0 if start is None else days.searchsorted(pd.Timestamp(start), side='left')
+    j = len(days) if end is None else days.searchsorted(pd.Timestamp(end), side='right')
+    return i, max(i, j)
+
+
+def slice_compact(compact, start=None, end=None):
+    """
+    取日期范围内的紧凑结构（两张表都按日期编号排序，二分定位后切片，不扫描全表）
+
+    切片是原数据的视图，不复制记录；日期编号保持不变，相对切片后 days 的偏移
+    记录在 day_offset 中（编号 - day_offset 即在切片 days 中的位置）。
+    """
+    i, j = day_bounds(compact, start, end)
+    offset = compact.get('day_offset', 0)
+    if (i, j) == (0, len(compact['days'])):
+        return compact
+
+    def take(table):
+        lo, hi = np.searchsorted(table['Day'].to_numpy(), [offset + i, offset + j], side='left')
+        return table.iloc[lo:hi]
+
+    return {
+        'days': compact['days'][i:j],
+        'day_offset': offset + i,
+        'keys': compact['keys'],
+        'sales': take(compact['sales']),
+        'inventory': take(compact['inventory'])
+    }
+
+
+def expand_compact(compact, start=None, end=None):
+    """展开为原来的明细表（只展开日期范围内的记录，金额转回 float64），供按明细表计算的函数使用"""
+    part = slice_compact(compact, start, end)
+    sales = part['sales']
+    keys = part['keys']
+
+    frame = pd.DataFrame({
+        'Date': part['days'][sales['Day'].to_numpy() - part.get('day_offset', 0)],
+        **{col: sales[col].array for col in keys + [CHANNEL_COLUMN]},
+        'IDS GIV': sales['IDS GIV'].to_numpy(dtype='float64')
+    })
+
+    inventory = part['inventory'].astype({'Inv.Value(RMB)': 'float64'})
+    lookup = sales[['Day'] + keys].merge(inventory, on=['Day'] + keys, how='left')
+    frame.insert(1, 'Inv.Value(RMB)', lookup['Inv.Value(RMB)'].to_numpy())
+    return frame
+
+
+def _daily_sales(part):
+    """
+    按日期编号汇总：每日库存、总销量、日期 × 渠道 的销量和记录数
+
+    用 bincount 在整数编号上直接累加（float64），不做分组排序。每日库存取库存表中
+    当天第一条非空值（单序列即当天的库存）。
+    """
+    sales = part['sales']
+    n_days = len(part['days'])
+    day = sales['Day'].to_numpy(dtype='int64') - part.get('day_offset', 0)
+    amount = sales['IDS GIV'].to_numpy(dtype='float64')
+
+    channels = sales[CHANNEL_COLUMN].cat.categories
+    codes = sales[CHANNEL_COLUMN].cat.codes.to_numpy(dtype='int64')
+    known = codes >= 0
+    cells = day[known] * len(channels) + codes[known]
+    size = n_days * len(channels)
+    channel_daily = np.bincount(cells, weights=amount[known], minlength=size).reshape(n_days, len(channels))
+    channel_counts = np.bincount(cells, minlength=size).reshape(n_days, len(channels))
+
+    # 只保留出现过的渠道，与 groupby(observed=True) 一致
+    observed = channel_counts.sum(axis=0) > 0
+    index = pd.DatetimeIndex(part['days'], name='Date')
+    columns = pd.CategoricalIndex(channels[observed], categories=channels, name=CHANNEL_COLUMN)
+
+    inventory = part['inventory'].dropna(subset=['Inv.Value(RMB)'])
+    first_day, first_row = np.unique(inventory['Day'].to_numpy(dtype='int64') - part.get('day_offset', 0),
+                                     return_index=True)
+    daily_inventory = np.full(n_days, np.nan)
+    daily_inventory[first_day] = inventory['Inv.Value(RMB)'].to_numpy(dtype='float64')[first_row]
+
+    return {
+        'inventory': daily_inventory,
+        'total': np.bincount(day, weights=amount, minlength=n_days),
+        'channel_daily': pd.DataFrame(channel_daily[:, observed], index=index, columns=columns),
+        'channel_counts': pd.DataFrame(channel_counts[:, observed], index=index, columns=columns)
+    }
+
+
+def compact_moving_average(compact, channel_groups, window=7, start=None, end=None):
+    """在紧凑结构上计算日期范围内的移动平均，结果与 calculate_moving_average 一致"""
+    part = slice_compact(compact, start, end)
+    daily = _daily_sales(part)
+    membership = build_group_membership(daily['channel_daily'].columns, channel_groups)
+    group_daily = pd.DataFrame(
+        daily['channel_daily'].to_numpy() @ membership.to_numpy(),
+        columns=membership.columns
+    )
+    daily_data = pd.DataFrame({
+        'Date': part['days'],
+        'Inv.Value(RMB)': daily['inventory'],
+        'IDS GIV': daily['total']
+    })
+    return summarize_moving_average(daily_data, group_daily, window)
+
+
+def extend_compact_moving_average(previous, compact, channel_groups, window=7, start=None, end=None):
+    """增量追加新日期：只展开移动平均窗口尾部的记录交给 extend_moving_average"""
+    if previous is None or len(previous) == 0:
+        return compact_moving_average(compact, channel_groups, window, start, end)
+    context_start = previous['Date'].iloc[max(len(previous) - window, 0)]
+    return extend_moving_average(previous, expand_compact(compact, context_start, end), channel_groups, window)
+
+
+def compact_date_index(compact, channel_groups):
+    """在紧凑结构上构建前缀和索引，结果与 build_date_index 一致"""
+    daily = _daily_sales(compact)
+    return assemble_date_index(daily['inventory'], daily['total'], daily['channel_daily'],
+                               daily['channel_counts'], channel_groups)
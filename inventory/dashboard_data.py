@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+WEEK_COLUMN = 'Report Date Hierarchy - Week Ending'
+MONTH_COLUMN = 'Year-Month'
+
+# 看板用到的工作簿列（其余列不读取）
+WORKBOOK_COLUMNS = [
+    'Distributor Hierarchy - Distributor',
+    'Distributor Hierarchy - Hub',
+    'Inv.Value(RMB)',
+    WEEK_COLUMN,
+    'IDS GIV',
+    'Store Group Channel',
+    'FPC Code',
+    'DS GIV'
+]
+
+CHANNEL_COLUMN = 'Store Group Channel'
+
+
+def prepare_workbook_frame(df):
+    """处理日期和金额字段，派生 Year-Month / Week 期间列"""
+    df[WEEK_COLUMN] = pd.to_datetime(df[WEEK_COLUMN])
+    df[MONTH_COLUMN] = df[WEEK_COLUMN].dt.to_period('M')
+    df['Week'] = df[WEEK_COLUMN].dt.strftime('%Y-W%U')
+
+    for col in ['Inv.Value(RMB)', 'IDS GIV', 'DS GIV']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def workbook_overview(df):
+    """侧边栏的数据概览：记录数、首尾周、SKU、经销商、Hub（取第一条记录）"""
+    return {
+        'rows': len(df),
+        'first_date': df[WEEK_COLUMN].min(),
+        'last_date': df[WEEK_COLUMN].max(),
+        'fpc_code': df['FPC Code'].iloc[0],
+        'distributor': df['Distributor Hierarchy - Distributor'].iloc[0],
+        'hub': df['Distributor Hierarchy - Hub'].iloc[0]
+    }
+
+
+def period_column(review_period):
+    """返回分析周期对应的分组列和每个周期的天数"""
+    if review_period == "Weekly":
+        return WEEK_COLUMN, 7
+    return MONTH_COLUMN, 30
+
+
+def build_rollup_cube(df):
+    """
+    加载时一次性构建 周 × 渠道 的汇总立方体
+
+    每个 周 × 渠道 一行（渠道为空的记录单独成行），保存出货、进货和库存的合计，
+    以及该格子里最后一条非空库存及其行号（Inv_Row），用于在任意周期上取期末库存。
+    First_Row / Rows 记录原始行的位置和数量。各Tab只对这张小表做切片和再汇总。
+    """
+    rows = np.arange(len(df))
+    data = pd.DataFrame({
+        WEEK_COLUMN: df[WEEK_COLUMN],
+        MONTH_COLUMN: df[MONTH_COLUMN],
+        CHANNEL_COLUMN: df[CHANNEL_COLUMN],
+        'IDS GIV': df['IDS GIV'],
+        'DS GIV': df['DS GIV'],
+        'Inv.Value(RMB)': df['Inv.Value(RMB)'],
+        'Row': rows,
+        'Inv_Row': pd.Series(rows, index=df.index, dtype='float64').where(df['Inv.Value(RMB)'].notna())
+    })
+
+    cube = data.groupby([WEEK_COLUMN, MONTH_COLUMN, CHANNEL_COLUMN], dropna=False, sort=True).agg(
+        **{
+            'IDS GIV': ('IDS GIV', 'sum'),
+            'DS GIV': ('DS GIV', 'sum'),
+            'Inv_Sum': ('Inv.Value(RMB)', 'sum'),
+            'Inv_Last': ('Inv.Value(RMB)', 'last'),
+            'Inv_Row': ('Inv_Row', 'max'),
+            'First_Row': ('Row', 'min'),
+            'Rows': ('Row', 'size')
+        }
+    )
+    return cube.reset_index()
+
+
+def slice_cube(cube, date_range=None):
+    """
+    按所选日期范围（含首尾）切出立方体的子集
+
+    立方体按周排序，二分定位首尾后按位置切片，得到的是共享立方体的视图而不是副本。
+    """
+    if date_range is None or len(date_range) != 2:
+        return cube
+    weeks = cube[WEEK_COLUMN]
+    start = weeks.searchsorted(pd.Timestamp(date_range[0]), side='left')
+    stop = weeks.searchsorted(pd.Timestamp(date_range[1]) + pd.Timedelta(days=1), side='left')
+    return cube.iloc[start:max(start, stop)]
+
+
+def available_channels(cube):
+    """切片中出现的渠道，按原始数据中首次出现的顺序"""
+    channels = cube[cube[CHANNEL_COLUMN].notna()]
+    first_seen = channels.groupby(CHANNEL_COLUMN)['First_Row'].min().sort_values(kind='stable')
+    return first_seen.index.to_numpy()
+
+
+def channel_record_count(cube, channels=None):
+    """原始记录条数（channels为None表示全部记录）"""
+    if channels is None:
+        return int(cube['Rows'].sum())
+    return int(cube.loc[cube[CHANNEL_COLUMN].isin(channels), 'Rows'].sum())
+
+
+def last_inventory(cube, column):
+    """每个周期的期末库存：周期内原始行号最大的那条非空库存"""
+    valid = cube[cube['Inv_Row'].notna()]
+    last_rows = valid.groupby(column)['Inv_Row'].idxmax()
+    return valid.loc[last_rows].set_index(column)['Inv_Last']
+
+
+def weekly_trend(cube):
+    """库存销售趋势：按周汇总库存、出货和进货"""
+    weekly = cube.groupby(WEEK_COLUMN).agg({
+        'Inv_Sum': 'sum',
+        'IDS GIV': 'sum',
+        'DS GIV': 'sum'
+    })
+    return weekly.rename(columns={'Inv_Sum': 'Inv.Value(RMB)'}).reset_index()
+
+
+def monthly_channel_sales(cube, selected_channels):
+    """渠道分布：按 月份 × 渠道 汇总出货和进货"""
+    if selected_channels:
+        channel_cube = cube[cube[CHANNEL_COLUMN].isin(selected_channels)]
+    else:
+        channel_cube = cube[cube[CHANNEL_COLUMN].notna()]
+
+    monthly_channel = channel_cube.groupby([MONTH_COLUMN, CHANNEL_COLUMN]).agg({
+        'IDS GIV': 'sum',
+        'DS GIV': 'sum'
+    }).reset_index()
+
+    # 将Period对象转换为字符串
+    monthly_channel['Year-Month-Str'] = monthly_channel[MONTH_COLUMN].astype(str)
+    return monthly_channel
+
+
+def monthly_summary(cube):
+    """瀑布图：按月汇总进货、出货和期末库存"""
+    summary = cube.groupby(MONTH_COLUMN).agg({
+        'DS GIV': 'sum',  # 进货
+        'IDS GIV': 'sum'  # 出货
+    })
+    summary['Inv.Value(RMB)'] = last_inventory(cube, MONTH_COLUMN)  # 期末库存
+    summary = summary.reset_index()
+
+    summary['Month'] = summary[MONTH_COLUMN].astype(str)
+    summary = summary.sort_values(MONTH_COLUMN)
+
+    # 计算净变化（进货 - 出货）
+    summary['Net_Change'] = summary['DS GIV'] - summary['IDS GIV']
+    return summary
+
+
+def period_inventory(cube, review_period):
+    """安全库存分析：按周/月汇总出货和期末库存"""
+    column, _ = period_column(review_period)
+    period_data = cube.groupby(column).agg({
+        'IDS GIV': 'sum'
+    })
+    period_data['Inv.Value(RMB)'] = last_inventory(cube, column)
+    period_data = period_data.reset_index()
+
+    if review_period == "Weekly":
+        period_data['Period'] = period_data[column].dt.strftime('%Y-%m-%d')
+    else:
+        period_data['Period'] = period_data[column].astype(str)
+    return period_data
+
+
+def period_channel_sales(cube, review_period, channels=None):
+    """安全库存分析：指定渠道按周/月的出货合计（channels为None表示全部渠道）"""
+    column, _ = period_column(review_period)
+    if channels is None:
+        return cube.groupby(column)['IDS GIV'].sum()
+
+    channel_cube = cube[cube[CHANNEL_COLUMN].isin(channels)]
+    if channel_cube.empty:
+        return pd.Series(dtype=float)
+    return channel_cube.groupby(column)['IDS GIV'].sum()
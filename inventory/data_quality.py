@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+
+from batch_alerts import SERIES_KEYS, rolling_mean_by_series
+
+# 补货识别阈值：单日库存增加超过5万视为一次补货
+RESTOCK_THRESHOLD = 50000
+
+# 库存逻辑一致性允许的误差
+CONSISTENCY_TOLERANCE = 1000
+
+OTD_SCENARIOS = [7, 14, 21]
+
+
+def present_series_keys(df, series_keys=SERIES_KEYS):
+    """数据中实际存在的序列键（演示数据等单序列文件可能缺少部分列）"""
+    return [key for key in series_keys if key in df.columns]
+
+
+def build_series_daily(df, series_keys=SERIES_KEYS):
+    """
+    按 序列 × 日期 汇总每日库存和销量，按 序列、日期 排序
+
+    额外返回两列：Series（序列编号）和 Position（在序列内的序号），
+    后续的 shift/diff 检查都基于这两列按序列分段，不需要逐组循环。
+    """
+    keys = present_series_keys(df, series_keys)
+    data = df.assign(Date=pd.to_datetime(df['Date']))
+
+    daily = data.groupby(keys + ['Date'], observed=True, sort=True).agg({
+        'Inv.Value(RMB)': 'first',
+        'IDS GIV': 'sum'
+    }).reset_index()
+
+    if keys:
+        daily['Series'] = daily.groupby(keys, observed=True, sort=False).ngroup()
+    else:
+        daily['Series'] = 0
+    daily['Position'] = daily.groupby('Series').cumcount()
+    return daily
+
+
+def previous_in_series(values, positions):
+    """序列内的上一行值（每个序列第一行为NaN），相当于按序列分组的 shift(1)"""
+    values = np.asarray(values, dtype='float64')
+    previous = np.empty_like(values)
+    previous[0:1] = np.nan
+    previous[1:] = values[:-1]
+    previous[np.asarray(positions) == 0] = np.nan
+    return previous
+
+
+def add_quality_flags(daily, restock_threshold=RESTOCK_THRESHOLD, tolerance=CONSISTENCY_TOLERANCE):
+    """在日汇总表上添加逐日检查结果（全部为整列运算）"""
+    positions = daily['Position'].to_numpy()
+    inventory = daily['Inv.Value(RMB)'].to_numpy(dtype='float64')
+    prev_inventory = previous_in_series(inventory, positions)
+    prev_sales = previous_in_series(daily['IDS GIV'], positions)
+
+    daily['Inventory_Change'] = inventory - prev_inventory
+    daily['Restock'] = daily['Inventory_Change'] > restock_threshold
+    daily['Downward'] = inventory < prev_inventory
+
+    # 理论库存 = 前一天库存 - 前一天销量（不考虑补货）；
+    # 明显高于理论值的视为补货，明显低于理论值的标记为不一致
+    theoretical = prev_inventory - prev_sales
+    daily['Inconsistent'] = inventory < theoretical - tolerance
+
+    daily['MA7'] = rolling_mean_by_series(daily['IDS GIV'], positions, window=7)
+    return daily
+
+
+def summarize_series(daily, keys):
+    """每条序列一行的质量统计"""
+    inventory = daily['Inv.Value(RMB)']
+    sales = daily['IDS GIV']
+    flags = daily.assign(
+        Missing_Inventory=inventory.isna(),
+        Missing_Sales=sales.isna(),
+        Zero_Inventory=inventory == 0,
+        Zero_Sales=sales == 0
+    )
+
+    summary = flags.groupby('Series').agg(
+        Start_Date=('Date', 'min'),
+        End_Date=('Date', 'max'),
+        Days=('Date', 'size'),
+        Initial_Inventory=('Inv.Value(RMB)', 'first'),
+        Final_Inventory=('Inv.Value(RMB)', 'last'),
+        Max_Inventory=('Inv.Value(RMB)', 'max'),
+        Min_Inventory=('Inv.Value(RMB)', 'min'),
+        Total_Sales=('IDS GIV', 'sum'),
+        Mean_Sales=('IDS GIV', 'mean'),
+        Max_Sales=('IDS GIV', 'max'),
+        Min_Sales=('IDS GIV', 'min'),
+        Missing_Inventory_Days=('Missing_Inventory', 'sum'),
+        Missing_Sales_Days=('Missing_Sales', 'sum'),
+        Zero_Inventory_Days=('Zero_Inventory', 'sum'),
+        Zero_Sales_Days=('Zero_Sales', 'sum'),
+        Inconsistent_Days=('Inconsistent', 'sum'),
+        Downward_Days=('Downward', 'sum'),
+        Restocks=('Restock', 'sum')
+    )
+
+    transitions = (summary['Days'] - 1).where(summary['Days'] > 1)
+    summary['Downward_Trend_Pct'] = summary['Downward_Days'] / transitions * 100
+
+    if keys:
+        labels = daily.groupby('Series')[keys].first()
+        summary = labels.join(summary)
+    return summary.reset_index()
+
+
+def summarize_otd_scenarios(daily, keys, otd_scenarios=OTD_SCENARIOS):
+    """不同OTD下每条序列的安全库存线和预警触发情况"""
+    inventory = daily['Inv.Value(RMB)'].to_numpy(dtype='float64')
+    otd = np.asarray(otd_scenarios, dtype='float64')
+
+    # 日期 × OTD 一次广播计算
+    safety = daily['MA7'].to_numpy()[:, None] * otd[None, :]
+    below = inventory[:, None] < safety
+    ratio = np.full(safety.shape, np.nan)
+    np.divide(inventory[:, None], safety, out=ratio, where=below)
+
+    n_rows = len(daily)
+    scenarios = pd.DataFrame({
+        'Series': np.tile(daily['Series'].to_numpy(), len(otd)),
+        'OTD': np.repeat(np.asarray(otd_scenarios), n_rows),
+        'Safety_Stock': safety.ravel(order='F'),
+        'Below': below.ravel(order='F'),
+        'Ratio': ratio.ravel(order='F'),
+        'Alert_Date': np.tile(daily['Date'].to_numpy(), len(otd))
+    })
+    scenarios['Alert_Date'] = scenarios['Alert_Date'].where(scenarios['Below'])
+
+    summary = scenarios.groupby(['Series', 'OTD']).agg(
+        Safety_Stock_Mean=('Safety_Stock', 'mean'),
+        Alert_Days=('Below', 'sum'),
+        Days=('Below', 'size'),
+        First_Alert=('Alert_Date', 'min'),
+        Min_Inventory_Ratio=('Ratio', 'min')
+    ).reset_index()
+    summary['Alert_Pct'] = summary['Alert_Days'] / summary['Days'] * 100
+
+    if keys:
+        labels = daily.groupby('Series')[keys].first()
+        summary = summary.merge(labels, left_on='Series', right_index=True)
+        summary = summary[['Series'] + keys + [c for c in summary.columns if c not in keys and c != 'Series']]
+    return summary
+
+
+def channel_share(df):
+    """各渠道销量及占比（降序）"""
+    sales = df.groupby('Store Group Channel', observed=True)['IDS GIV'].sum().sort_values(ascending=False)
+    total = sales.sum()
+    return pd.DataFrame({
+        'Store Group Channel': sales.index,
+        'IDS GIV': sales.to_numpy(),
+        'Share_Pct': (sales / total * 100).to_numpy() if total else np.zeros(len(sales))
+    })
+
+
+def run_quality_checks(df, series_keys=SERIES_KEYS, otd_scenarios=OTD_SCENARIOS,
+                       restock_threshold=RESTOCK_THRESHOLD, tolerance=CONSISTENCY_TOLERANCE):
+    """
+    对销售库存数据运行全部质量检查，按序列分别统计
+
+    返回字典：
+        overview  - 整体记录数、日期范围、渠道数、序列数
+        daily     - 序列 × 日期 的汇总及逐日检查标记
+        series    - 每条序列的质量统计
+        otd       - 每条序列在各OTD场景下的预警统计
+        restocks  - 识别出的补货事件
+        channels  - 各渠道销量占比
+    """
+    keys = present_series_keys(df, series_keys)
+    daily = add_quality_flags(build_series_daily(df, keys), restock_threshold, tolerance)
+
+    dates = pd.to_datetime(df['Date'])
+    overview = {
+        'records': len(df),
+        'start_date': dates.min(),
+        'end_date': dates.max(),
+        'unique_dates': dates.nunique(),
+        'channels': df['Store Group Channel'].nunique(),
+        'series': int(daily['Series'].max()) + 1 if len(daily) else 0
+    }
+
+    restocks = daily.loc[daily['Restock'], ['Series'] + keys + ['Date', 'Inventory_Change']].reset_index(drop=True)
+
+    return {
+        'overview': overview,
+        'daily': daily,
+        'series': summarize_series(daily, keys),
+        'otd': summarize_otd_scenarios(daily, keys, otd_scenarios),
+        'restocks': restocks,
+        'channels': channel_share(df)
+    }
@@ -0,0 +1,139 @@
+import asyncio
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from batch_alerts import SERIES_KEYS
+from ingest import CACHE_DIR_NAME, DATE_COLUMN, STREAM_COLUMNS, concat_sales_frames, load_sales_data, \
+    normalize_sales_frame
+
+# 目录中按该模式查找各经销商/Hub的数据文件
+FEED_PATTERN = '*.csv'
+
+# 同时处理的文件数上限（控制同时驻留在内存中的解析结果数量）
+DEFAULT_MAX_CONCURRENCY = 8
+
+EXECUTOR_KINDS = ['process', 'thread']
+
+
+def discover_feeds(sources, pattern=FEED_PATTERN):
+    """
+    查找数据文件：sources 可以是单个路径或路径列表，每项可以是文件、目录或通配符
+
+    目录按 pattern 查找其中的文件（不递归，跳过缓存目录），结果去重后按路径排序，
+    保证每次合并的顺序一致。
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+
+    paths = set()
+    for source in sources:
+        source = os.fspath(source)
+        if os.path.isdir(source):
+            matches = glob.glob(os.path.join(source, pattern))
+        elif glob.has_magic(source):
+            matches = glob.glob(source)
+        else:
+            matches = [source]
+        paths.update(
+            os.path.abspath(path) for path in matches
+            if os.path.isfile(path) and CACHE_DIR_NAME not in path.split(os.sep)
+        )
+    return sorted(paths)
+
+
+def feeds_stamp(paths):
+    """各文件的 (路径, mtime, 大小)，任一文件变化、新增或删除时随之变化"""
+    stamps = []
+    for path in paths:
+        stat = os.stat(path)
+        stamps.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def parse_feed(path, columns=None):
+    """解析单个数据文件（经过列式缓存），在执行器中运行"""
+    return load_sales_data(path, columns=columns)
+
+
+async def ingest_feeds(paths, columns=None, executor=None, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    并发读取多个数据文件，返回与 paths 顺序一致的解析结果列表
+
+    解析是CPU密集的，交给 executor 执行（None 表示事件循环默认的线程池），
+    事件循环只负责调度；信号量限制同时在处理的文件数。
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def read(path):
+        async with semaphore:
+            return await loop.run_in_executor(executor, parse_feed, path, columns)
+
+    return await asyncio.gather(*(read(path) for path in paths))
+
+
+def make_executor(kind='process', max_workers=None):
+    """解析用的执行器：process 为进程池（绕过GIL），thread 为线程池"""
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f'未知的执行器类型: {kind}，可选 {EXECUTOR_KINDS}')
+    if kind == 'process':
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+def load_feeds(sources, columns=None, executor='process', max_workers=None,
+               max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    并发加载多个经销商/Hub的数据文件，按文件路径顺序合并为一张明细表
+
+    工作者数默认取 文件数、并发上限和CPU核数 中的最小值。结果与逐个文件读取后
+    依次合并完全一致，保留序列键列，可直接交给批量预警计算；按单条序列计算
+    （calculate_safety_stock）前先用 total_daily_channel_sales 合并各序列。
+    没有找到任何文件时抛出 ValueError。
+    """
+    paths = discover_feeds(sources)
+    if not paths:
+        raise ValueError(f'没有找到数据文件: {sources}')
+    if len(paths) == 1:
+        return parse_feed(paths[0], columns)
+
+    workers = max_workers or min(len(paths), max_concurrency, os.cpu_count() or 1)
+    if workers <= 1:
+        # 只有一个工作者时不值得启动子进程，用线程执行（事件循环仍按文件交错调度）
+        executor = 'thread'
+    with make_executor(executor, workers) as pool:
+        frames = asyncio.run(ingest_feeds(paths, columns, pool, max_concurrency))
+    return concat_sales_frames(frames)
+
+
+def load_feeds_sequential(sources, columns=None):
+    """逐个文件读取并合并（基准对照）"""
+    paths = discover_feeds(sources)
+    if not paths:
+        raise ValueError(f'没有找到数据文件: {sources}')
+    return concat_sales_frames([parse_feed(path, columns) for path in paths])
+
+
+def total_daily_channel_sales(df, series_keys=SERIES_KEYS):
+    """
+    把多条序列合并为一条总量序列：日期 × 渠道 的出货合计，库存为各序列当天库存之和
+
+    每条序列（经销商 × Hub × 品牌）当天取第一条非空库存，再按日期把各序列相加
+    （当天所有序列都没有库存时为空）。直接对合并后的明细取“当天第一条库存”只会
+    得到其中一条序列的库存，却和所有序列的销量比较。结果的列与
+    stream_daily_channel_sales 相同，可直接传给 calculate_safety_stock；
+    原始行数记录在 attrs['source_rows']。
+    """
+    keys = [key for key in series_keys if key in df.columns]
+    sales = df.groupby([DATE_COLUMN, 'Store Group Channel'], observed=True, dropna=False)['IDS GIV'].sum()
+    inventory = (
+        df.groupby([DATE_COLUMN] + keys, observed=True, sort=False)['Inv.Value(RMB)'].first()
+        .groupby(level=DATE_COLUMN).sum(min_count=1)
+    )
+
+    total = sales.reset_index().merge(inventory.reset_index(), on=DATE_COLUMN, how='left')
+    total = normalize_sales_frame(total[STREAM_COLUMNS])
+    total = total.sort_values(DATE_COLUMN, kind='stable').reset_index(drop=True)
+    total.attrs['source_rows'] = len(df)
+    return total
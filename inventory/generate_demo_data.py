@@ -183,5 +183,173 @@ def generate_demo_data():
     print("⚡ 能够清晰展示三级预警的实际应用")
     print("📊 数据合理且具有说服力")
 
+# 大规模数据生成（压测用）：N经销商 × M Hub × K渠道 × D天，NumPy向量化模拟
+
+DEMO_CHANNEL_WEIGHTS = {
+    'HSM': 0.65, 'MM': 0.08, 'ICP': 0.06, 'CVS': 0.05, 'Grocery & Others': 0.04,
+    'DCP': 0.04, 'WS': 0.03, 'B Store': 0.02, 'CB': 0.015, 'DP.com': 0.01,
+    'DMW': 0.005, 'DKS': 0.003, 'EB': 0.002
+}
+
+# 每2-3天才集中出货一次的渠道
+INTERMITTENT_CHANNELS = ['ICP', 'WS']
+
+
+def scaled_channels(n_channels):
+    """返回前K个渠道及其销量权重，超过13个时补充小权重的虚拟渠道"""
+    names = list(DEMO_CHANNEL_WEIGHTS)[:n_channels]
+    weights = [DEMO_CHANNEL_WEIGHTS[name] for name in names]
+    for i in range(len(names), n_channels):
+        names.append(f'Channel_{i + 1:03d}')
+        weights.append(0.002)
+    return names, np.array(weights)
+
+
+def simulate_inventory(initial_inventory, restock, planned_sales):
+    """
+    向量化的库存消耗/补货递推
+
+    递推关系 x[t] = max(0, x[t-1] + r[t] - d[t]) 等价于
+    x[t] = S[t] - min(0, min(S[1..t]))，其中 S 为 期初库存 + 累计(补货 - 需求)，
+    因此只需要 cumsum 和 minimum.accumulate 两次累计运算。
+    返回每天的期初库存（补货之后）和实际销量。
+    """
+    net = np.cumsum(restock - planned_sales, axis=1) + initial_inventory[:, None]
+    end_inventory = net - np.minimum(np.minimum.accumulate(net, axis=1), 0)
+
+    prev_inventory = np.concatenate([initial_inventory[:, None], end_inventory[:, :-1]], axis=1)
+    start_inventory = prev_inventory + restock
+    actual_sales = start_inventory - end_inventory
+    return start_inventory, actual_sales
+
+
+def simulate_sales_chunk(series_ids, n_hubs, n_days, n_channels, rng,
+                         start_date=date(2025, 1, 1), brand="H&S"):
+    """模拟一批序列（经销商×Hub）的逐日逐渠道销量和库存，返回DataFrame"""
+    n_series = len(series_ids)
+    channels, weights = scaled_channels(n_channels)
+    intermittent = np.isin(channels, INTERMITTENT_CHANNELS)
+
+    # 每条序列的销量规模和逐日基础销量
+    scale = rng.lognormal(mean=np.log(12000), sigma=0.5, size=n_series)
+    base_sales = scale[:, None] * rng.uniform(0.8, 1.2, size=(n_series, n_days))
+
+    # 各渠道计划销量：权重 × ±30%波动，ICP/WS 40%概率集中出货
+    planned = base_sales[:, :, None] * weights * rng.uniform(0.7, 1.3, size=(n_series, n_days, n_channels))
+    if intermittent.any():
+        burst = rng.random((n_series, n_days, int(intermittent.sum()))) < 0.4
+        factor = np.where(burst, rng.uniform(2, 4, size=burst.shape), 0)
+        planned[:, :, intermittent] *= factor
+    planned_total = planned.sum(axis=2)
+
+    # 每5-7天补货一次，补货量为4-8天的销量，库存会随机起伏并偶尔断货
+    gaps = rng.integers(5, 8, size=(n_series, n_days // 5 + 2))
+    restock_days = np.cumsum(gaps, axis=1) - 1
+    restock = np.zeros((n_series, n_days))
+    rows, cols = np.nonzero(restock_days < n_days)
+    restock[rows, restock_days[rows, cols]] = scale[rows] * rng.uniform(4, 8, size=len(rows))
+
+    initial_inventory = scale * rng.uniform(10, 20, size=n_series)
+    start_inventory, actual_total = simulate_inventory(initial_inventory, restock, planned_total)
+
+    # 库存不足时各渠道按比例缩减
+    ratio = np.divide(actual_total, planned_total, out=np.ones_like(planned_total), where=planned_total > 0)
+    sales = planned * ratio[:, :, None]
+
+    n_rows = n_series * n_days * n_channels
+    series_idx = np.repeat(np.asarray(series_ids), n_days * n_channels)
+    day_idx = np.tile(np.repeat(np.arange(n_days), n_channels), n_series)
+    dates = pd.date_range(start_date, periods=n_days, freq='D')
+
+    return pd.DataFrame({
+        'Date': np.asarray(dates.strftime('%Y-%m-%d'), dtype=object)[day_idx],
+        'Distributor': pd.Categorical.from_codes(series_idx // n_hubs, distributor_names(series_ids, n_hubs)),
+        'Hub': pd.Categorical.from_codes(series_idx % n_hubs, hub_names(n_hubs)),
+        'Inv.Value(RMB)': np.repeat(start_inventory.round(2).ravel(), n_channels),
+        'Product Hierarchy - Brand': pd.Categorical.from_codes(np.zeros(n_rows, dtype='int8'), [brand]),
+        'Store Group Channel': pd.Categorical.from_codes(np.tile(np.arange(n_channels), n_series * n_days), channels),
+        'IDS GIV': sales.round(2).ravel()
+    })
+
+
+def distributor_names(series_ids, n_hubs):
+    """经销商名称列表（覆盖到本批序列中最大的经销商编号）"""
+    n_distributors = int(np.max(series_ids)) // n_hubs + 1 if len(series_ids) else 0
+    return [f'Distributor_{i:05d}' for i in range(n_distributors)]
+
+
+def hub_names(n_hubs):
+    return [f'Hub_{i:03d}' for i in range(n_hubs)]
+
+
+def generate_scaled_frame(n_distributors, n_hubs, n_days, n_channels=13, seed=42):
+    """在内存中生成一份完整的大规模数据（用于基准测试）"""
+    rng = np.random.default_rng(seed)
+    series_ids = np.arange(n_distributors * n_hubs)
+    return simulate_sales_chunk(series_ids, n_hubs, n_days, n_channels, rng)
+
+
+def generate_scaled_data(output_filename, n_distributors, n_hubs, n_days, n_channels=13,
+                         series_per_chunk=200, seed=42):
+    """
+    分块生成大规模数据并流式写出到CSV或Parquet
+
+    每次只在内存中模拟 series_per_chunk 条序列，内存占用与总行数无关。
+    """
+    rng = np.random.default_rng(seed)
+    n_series = n_distributors * n_hubs
+    is_parquet = output_filename.endswith('.parquet')
+    writer = None
+    total_rows = 0
+
+    # 所有分块共用同一套分类取值，保证Parquet各分块的schema一致
+    all_distributors = [f'Distributor_{i:05d}' for i in range(n_distributors)]
+
+    try:
+        for chunk_start in range(0, n_series, series_per_chunk):
+            series_ids = np.arange(chunk_start, min(chunk_start + series_per_chunk, n_series))
+            chunk = simulate_sales_chunk(series_ids, n_hubs, n_days, n_channels, rng)
+            chunk['Distributor'] = chunk['Distributor'].cat.set_categories(all_distributors)
+
+            if is_parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_filename, table.schema)
+                writer.write_table(table)
+            elif chunk_start == 0:
+                chunk.to_csv(output_filename, index=False, encoding='utf-8-sig')
+            else:
+                chunk.to_csv(output_filename, index=False, header=False, mode='a', encoding='utf-8')
+
+            total_rows += len(chunk)
+            print(f"  已生成 {min(chunk_start + series_per_chunk, n_series):,}/{n_series:,} 条序列, 共 {total_rows:,} 行")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print(f"🎯 大规模数据生成完成: {output_filename} ({total_rows:,} 行)")
+    return total_rows
+
+
 if __name__ == "__main__":
-    generate_demo_data() 
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="生成库存预警演示数据；指定 --output 时生成大规模压测数据")
+    parser.add_argument('--output', help="大规模数据输出文件（.csv 或 .parquet）")
+    parser.add_argument('--distributors', type=int, default=100)
+    parser.add_argument('--hubs', type=int, default=10)
+    parser.add_argument('--channels', type=int, default=13)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--series-per-chunk', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.output:
+        generate_scaled_data(
+            args.output, args.distributors, args.hubs, args.days, args.channels,
+            series_per_chunk=args.series_per_chunk, seed=args.seed
+        )
+    else:
+        generate_demo_data()
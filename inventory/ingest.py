@@ -0,0 +1,399 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+from operator import itemgetter
+
+import openpyxl
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # 未安装pyarrow时退回直接解析CSV
+    pa = None
+    feather = None
+
+# 列式缓存目录（位于源文件同级目录）
+CACHE_DIR_NAME = '.inventory_cache'
+
+# 各列的目标类型
+DATE_COLUMN = 'Date'
+CATEGORY_COLUMNS = ['Distributor', 'Hub', 'Product Hierarchy - Brand', 'Store Group Channel']
+FLOAT_COLUMNS = {
+    'Inv.Value(RMB)': 'float64',
+    'IDS GIV': 'float64'
+}
+
+HASH_BLOCK_SIZE = 1 << 20
+
+# 流式读取：安全库存计算只需要这几列
+STREAM_COLUMNS = ['Date', 'Inv.Value(RMB)', 'Store Group Channel', 'IDS GIV']
+STREAM_DTYPES = {
+    'Date': 'str',
+    'Store Group Channel': 'str',
+    'Inv.Value(RMB)': 'float64',
+    'IDS GIV': 'float64'
+}
+STREAM_CHUNKSIZE = 500_000
+
+# 与pandas.read_excel默认一致，视为缺失值的文本
+EXCEL_NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+
+def _cache_paths(source_path):
+    """返回源文件对应的缓存数据文件和元数据文件路径"""
+    source_path = os.path.abspath(source_path)
+    cache_dir = os.path.join(os.path.dirname(source_path), CACHE_DIR_NAME)
+    stem = os.path.basename(source_path)
+    return (
+        os.path.join(cache_dir, f'{stem}.arrow'),
+        os.path.join(cache_dir, f'{stem}.json')
+    )
+
+
+def _file_sha256(path):
+    """分块计算文件的sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _replace_atomically(path, write):
+    """
+    write(临时路径) 写完后原子替换为 path
+
+    临时文件由 mkstemp 为每次写入单独创建，多个进程同时重建同一份缓存时
+    不会互相删除或覆盖对方写到一半的文件；写入失败时删除自己的临时文件。
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(path))
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_meta(meta_path, meta):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    _replace_atomically(meta_path, write)
+
+
+def normalize_sales_frame(df):
+    """将原始销售数据转换为带类型的列：日期、分类维度、数值"""
+    if DATE_COLUMN in df.columns:
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col, dtype in FLOAT_COLUMNS.items():
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return df
+
+
+def parse_sales_csv(source_path, columns=None):
+    """直接解析CSV（不经过缓存）"""
+    df = pd.read_csv(
+        source_path,
+        usecols=columns,
+        dtype={col: 'category' for col in CATEGORY_COLUMNS}
+    )
+    return normalize_sales_frame(df)
+
+
+def _write_cache(df, data_path):
+    """写入未压缩的Arrow IPC文件，便于之后内存映射读取"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    _replace_atomically(data_path, lambda tmp_path: feather.write_feather(table, tmp_path, compression='uncompressed'))
+
+
+def _cache_is_valid(meta, stat, source_path):
+    """按 mtime + 大小 + 内容哈希 判断缓存是否可用"""
+    if meta is None or meta.get('size') != stat.st_size:
+        return False, None
+    if meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True, None
+    # mtime变了但内容可能没变（例如重新拷贝），再比较哈希
+    sha256 = _file_sha256(source_path)
+    return sha256 == meta.get('sha256'), sha256
+
+
+def build_sales_cache(source_path):
+    """全量解析CSV并写入列式缓存，返回完整的DataFrame"""
+    data_path, meta_path = _cache_paths(source_path)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+    stat = os.stat(source_path)
+    sha256 = _file_sha256(source_path)
+    df = parse_sales_csv(source_path)
+    _write_cache(df, data_path)
+    _write_meta(meta_path, {
+        'source': os.path.abspath(source_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+        # 全量重建时的内容哈希，追加写入不会改变它，可用来判断历史数据是否被改写
+        'base_sha256': sha256,
+        'rows': len(df),
+        'columns': list(df.columns)
+    })
+    return df
+
+
+def concat_sales_frames(frames):
+    """按顺序合并多份销售数据并重建分类列（各份的类别集合可能不同）"""
+    df = pd.concat(frames, ignore_index=True)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def append_new_rows(source_path):
+    """
+    增量追加：只解析源文件在上次缓存之后新追加的行
+
+    以上次缓存时的文件长度作为偏移量，先校验偏移量之前的内容哈希与缓存一致
+    （即文件只发生了追加），然后只解析偏移量之后的完整行并追加到列式缓存。
+    返回新增行的DataFrame（没有新数据时为空表）；如果缓存不存在或源文件
+    已被改写，返回None，调用方需要全量重建。
+    """
+    if feather is None:
+        return None
+
+    data_path, meta_path = _cache_paths(source_path)
+    meta = _read_meta(meta_path)
+    if meta is None or not os.path.exists(data_path):
+        return None
+
+    stat = os.stat(source_path)
+    offset = meta['size']
+    if stat.st_size < offset:
+        return None
+
+    digest = hashlib.sha256()
+    with open(source_path, 'rb') as f:
+        remaining = offset
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+        if digest.hexdigest() != meta['sha256']:
+            return None
+        tail = f.read()
+
+    # 只处理到最后一个换行符，正在写入的半行留到下次
+    complete = tail.rfind(b'\n') + 1
+    tail = tail[:complete]
+    if not tail.strip():
+        new_df = pd.DataFrame(columns=meta['columns'])
+    else:
+        new_df = pd.read_csv(
+            io.BytesIO(tail),
+            header=None,
+            names=meta['columns'],
+            dtype={col: 'category' for col in CATEGORY_COLUMNS}
+        )
+    new_df = normalize_sales_frame(new_df)
+
+    if len(new_df) > 0:
+        df = concat_sales_frames([read_sales_cache(data_path), new_df])
+        _write_cache(df, data_path)
+        meta['rows'] = len(df)
+
+    digest.update(tail)
+    meta['size'] = offset + complete
+    meta['sha256'] = digest.hexdigest()
+    if meta['size'] == stat.st_size:
+        meta['mtime_ns'] = stat.st_mtime_ns
+    _write_meta(meta_path, meta)
+    return new_df
+
+
+def stream_daily_channel_sales(source_path, chunksize=STREAM_CHUNKSIZE):
+    """
+    分块流式读取超大导出文件，只保留 日期 × 渠道 的汇总
+
+    每块只读取需要的列并指定类型，读完即折叠进累计的汇总：
+    出货金额按 日期 × 渠道 求和，库存取每个日期最先出现的非空值。
+    峰值内存取决于块大小和汇总表大小，与原始行数无关。
+    返回的表与原始明细列相同（每个 日期 × 渠道 一行），可直接传给
+    calculate_safety_stock；原始行数记录在 attrs['source_rows']。
+    """
+    sales = None
+    inventory = None
+    rows = 0
+
+    reader = pd.read_csv(source_path, usecols=STREAM_COLUMNS, dtype=STREAM_DTYPES, chunksize=chunksize)
+    for chunk in reader:
+        rows += len(chunk)
+        chunk_sales = chunk.groupby([DATE_COLUMN, 'Store Group Channel'], sort=False, dropna=False)['IDS GIV'].sum()
+        chunk_inventory = chunk.groupby(DATE_COLUMN, sort=False)['Inv.Value(RMB)'].first()
+
+        if sales is None:
+            sales, inventory = chunk_sales, chunk_inventory
+        else:
+            sales = sales.add(chunk_sales, fill_value=0)
+            # 已有日期保留先出现的库存值，新日期补进来
+            inventory = inventory.combine_first(chunk_inventory)
+
+    if sales is None:
+        return normalize_sales_frame(pd.DataFrame(columns=STREAM_COLUMNS))
+
+    df = sales.reset_index().merge(inventory.reset_index(), on=DATE_COLUMN, how='left')
+    df = normalize_sales_frame(df[STREAM_COLUMNS])
+    df = df.sort_values(DATE_COLUMN, kind='stable').reset_index(drop=True)
+    df.attrs['source_rows'] = rows
+    return df
+
+
+def read_xlsx_columns(source_path, columns, sheet_name=None):
+    """
+    用openpyxl只读模式逐行读取工作表，只取需要的列
+
+    只读模式按行流式解析XML，不会构建整个工作簿的单元格对象；
+    表头之后每行只用itemgetter取出需要的几列。
+    """
+    wb = openpyxl.load_workbook(source_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name is not None else wb.active
+        rows = ws.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        missing = [col for col in columns if col not in header]
+        if missing:
+            raise ValueError(f'工作表缺少列: {missing}')
+
+        positions = [header.index(col) for col in columns]
+        width = max(positions) + 1
+        getter = itemgetter(*positions)
+        padding = (None,) * width
+        records = []
+        for row in rows:
+            if len(row) < width:
+                row = tuple(row) + padding[len(row):]
+            if any(value is not None for value in row):
+                records.append(getter(row))
+    finally:
+        wb.close()
+
+    if len(columns) == 1:
+        records = [(value,) for value in records]
+    df = pd.DataFrame.from_records(records, columns=columns)
+
+    # 文本列中的 N/A 等占位符按缺失值处理
+    for col in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].mask(df[col].isin(EXCEL_NA_VALUES))
+    return df
+
+
+def load_workbook_data(source_path, columns, prepare=None, sheet_name=None):
+    """
+    加载Excel工作簿，首次读取后转换为列式缓存
+
+    只读取 columns 中的列，prepare 用于类型转换和派生列（例如按周、月的期间列），
+    其结果一并写入缓存，之后命中缓存时不再重复计算。工作簿的大小、mtime或
+    内容哈希变化，或者请求的列、处理函数变化时缓存失效。
+    """
+    def read_workbook():
+        df = read_xlsx_columns(source_path, columns, sheet_name)
+        return prepare(df) if prepare is not None else df
+
+    if feather is None:
+        return read_workbook()
+
+    data_path, meta_path = _cache_paths(source_path)
+    stat = os.stat(source_path)
+    meta = _read_meta(meta_path)
+    signature = {
+        'columns': list(columns),
+        'sheet_name': sheet_name,
+        'prepare': getattr(prepare, '__name__', None)
+    }
+
+    valid, sha256 = _cache_is_valid(meta, stat, source_path)
+    if valid and meta.get('signature') == signature and os.path.exists(data_path):
+        if sha256 is not None:
+            meta['mtime_ns'] = stat.st_mtime_ns
+            _write_meta(meta_path, meta)
+        return read_sales_cache(data_path)
+
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    df = read_workbook()
+    _write_cache(df, data_path)
+    _write_meta(meta_path, {
+        'source': os.path.abspath(source_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256 or _file_sha256(source_path),
+        'signature': signature,
+        'rows': len(df),
+        'columns': list(df.columns)
+    })
+    return df
+
+
+def get_cache_info(source_path):
+    """读取缓存元数据（不存在时返回None）"""
+    return _read_meta(_cache_paths(source_path)[1])
+
+
+def read_sales_cache(data_path, columns=None):
+    """以内存映射方式读取缓存，只读取需要的列"""
+    table = feather.read_table(data_path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def load_sales_data(source_path, columns=None):
+    """
+    加载销售库存数据，优先使用列式缓存
+
+    首次加载时把CSV转换为带类型的Arrow文件（Date为datetime64，渠道/经销商等
+    为分类类型，金额为浮点数），之后按源文件的mtime和哈希判断缓存是否失效，
+    命中时通过内存映射只读取所需的列。源文件只有追加时增量更新缓存。
+    """
+    if feather is None:
+        return parse_sales_csv(source_path, columns)
+
+    data_path, meta_path = _cache_paths(source_path)
+    stat = os.stat(source_path)
+    meta = _read_meta(meta_path)
+
+    valid, sha256 = _cache_is_valid(meta, stat, source_path)
+    if valid and os.path.exists(data_path):
+        if sha256 is not None:
+            # 内容未变，只更新mtime，避免下次重复计算哈希
+            meta['mtime_ns'] = stat.st_mtime_ns
+            _write_meta(meta_path, meta)
+        return read_sales_cache(data_path, columns)
+
+    # 源文件只是追加了新行时，增量解析即可
+    if os.path.exists(data_path) and append_new_rows(source_path) is not None:
+        return read_sales_cache(data_path, columns)
+
+    df = build_sales_cache(source_path)
+    return df[columns] if columns is not None else df
@@ -6,7 +6,25 @@ from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime, timedelta
 import warnings
+from ingest import append_new_rows, get_cache_info
+from alert_core import define_channel_groups, generate_alerts
+from compact_store import day_bounds, compact_moving_average, extend_compact_moving_average
+from memo import new_lru_cache, lru_get, lru_put
+from range_index import channel_summary
+from chart_sampling import MAX_CHART_POINTS, WEBGL_THRESHOLD, downsample_frame, scatter_trace
+from safety_models import SAFETY_MODELS, DEFAULT_MODEL, DEFAULT_SERVICE_LEVEL, apply_safety_model
+from sales_data import resolve_data_path, load_dataset, dataset_aggregate, enable_copy_on_write
+from sql_store import sql_store_enabled, open_sales_store, store_date_bounds, store_moving_average, store_channel_summary
 warnings.filterwarnings('ignore')
+enable_copy_on_write()
+
+# 默认为脚本同级目录的演示数据，可用环境变量 INVENTORY_DATA_PATH 指定
+DATA_PATH = resolve_data_path()
+LOAD_COLUMNS = ['Date', 'Inv.Value(RMB)', 'Store Group Channel', 'IDS GIV']
+
+# 设置 INVENTORY_SQL_STORE 时日期过滤、分组汇总、移动平均和渠道分析都在本地嵌入式数据库中查询，
+# 各会话只取回结果集，不在内存中保存数据
+USE_SQL_STORE = sql_store_enabled()
 
 # 页面配置
 st.set_page_config(
@@ -20,143 +38,50 @@ st.set_page_config(
 st.title("📊 库存预警与订单建议系统")
 st.markdown("---")
 
-# 数据加载和缓存
-@st.cache_data
+# 数据加载和缓存：数据集在进程内只保存一份，所有会话引用同一个对象（不序列化、不复制），
+# 各会话按时间范围取的都是它的视图，计算结果另外保存在各自的会话中
+@st.cache_resource
 def load_data():
     """加载和预处理数据"""
     try:
-        df = pd.read_csv('/Users/willmbp/Documents/2024/My_projects/inventory/demo_inventory_data.csv')
-        
-        # 数据类型转换
-        df['Date'] = pd.to_datetime(df['Date'])
-        df['Inv.Value(RMB)'] = pd.to_numeric(df['Inv.Value(RMB)'], errors='coerce')
-        df['IDS GIV'] = pd.to_numeric(df['IDS GIV'], errors='coerce')
-        
-        # 填充缺失值
-        df['IDS GIV'] = df['IDS GIV'].fillna(0)
-        
-        return df
+        # 共享的数据集：通过列式缓存只读取需要的列（已完成类型转换、缺失值填充），
+        # 超大文件分块流式汇总为 日期 × 渠道；以紧凑结构（日期编号、float32金额、
+        # 库存单独成表）常驻内存
+        return load_dataset(DATA_PATH, columns=LOAD_COLUMNS, compact=True)['compact']
     except Exception as e:
         st.error(f"数据加载失败: {e}")
         return None
 
-# 定义渠道分类
-def define_channel_groups():
-    """定义渠道分组"""
-    retail_channels = ['HSM', 'MM', 'ICP', 'Grocery & Others', 'CVS', 'DCP']
-    offline_channels = ['HSM', 'MM', 'Grocery & Others', 'CVS', 'DCP', 'ICP', 'WS']
-    all_channels = ['HSM', 'MM', 'ICP', 'Grocery & Others', 'CVS', 'DCP', 'WS', 'B Store', 'CB', 'DKS', 'DMW', 'DP.com', 'EB']
-    
-    return {
-        'retail': retail_channels,
-        'offline': offline_channels,
-        'all': all_channels
-    }
-
-# 计算日均销量和安全库存
-def calculate_safety_stock(df, channel_groups, otd_days=7):
-    """计算安全库存线"""
-    # 按日期聚合数据
-    daily_data = df.groupby('Date').agg({
-        'Inv.Value(RMB)': 'first',  # 库存值（假设同一天所有记录的库存值相同）
-        'IDS GIV': 'sum'  # 当日总销量
-    }).reset_index()
-    
-    # 计算各渠道的日均销量
-    retail_daily = df[df['Store Group Channel'].isin(channel_groups['retail'])].groupby('Date')['IDS GIV'].sum()
-    offline_daily = df[df['Store Group Channel'].isin(channel_groups['offline'])].groupby('Date')['IDS GIV'].sum()
-    all_daily = df[df['Store Group Channel'].isin(channel_groups['all'])].groupby('Date')['IDS GIV'].sum()
-    
-    # 过滤掉库存为0的异常数据进行计算移动平均
-    valid_inventory_dates = daily_data[daily_data['Inv.Value(RMB)'] > 0]['Date']
-    
-    # 只使用有效库存日期的销量数据计算移动平均
-    retail_valid = retail_daily[retail_daily.index.isin(valid_inventory_dates)]
-    offline_valid = offline_daily[offline_daily.index.isin(valid_inventory_dates)]
-    all_valid = all_daily[all_daily.index.isin(valid_inventory_dates)]
-    
-    # 计算移动平均（7天），但基于有效数据
-    if len(retail_valid) > 0:
-        retail_ma_value = retail_valid.rolling(window=min(7, len(retail_valid)), min_periods=1).mean().iloc[-1]
-    else:
-        retail_ma_value = retail_daily.mean() if len(retail_daily) > 0 else 0
-        
-    if len(offline_valid) > 0:
-        offline_ma_value = offline_valid.rolling(window=min(7, len(offline_valid)), min_periods=1).mean().iloc[-1]
-    else:
-        offline_ma_value = offline_daily.mean() if len(offline_daily) > 0 else 0
-        
-    if len(all_valid) > 0:
-        all_ma_value = all_valid.rolling(window=min(7, len(all_valid)), min_periods=1).mean().iloc[-1]
-    else:
-        all_ma_value = all_daily.mean() if len(all_daily) > 0 else 0
-    
-    # 计算完整的移动平均序列（用于图表显示）
-    retail_ma = retail_daily.rolling(window=7, min_periods=1).mean().fillna(retail_ma_value)
-    offline_ma = offline_daily.rolling(window=7, min_periods=1).mean().fillna(offline_ma_value)
-    all_ma = all_daily.rolling(window=7, min_periods=1).mean().fillna(all_ma_value)
-    
-    # 计算安全库存线（考虑OTD时间）
-    safety_stock_retail = retail_ma * otd_days
-    safety_stock_offline = offline_ma * otd_days
-    safety_stock_all = all_ma * otd_days
-    
-    # 合并数据
-    result = daily_data.copy()
-    result['Retail_Daily_Sales'] = retail_daily.reindex(result['Date']).fillna(0)
-    result['Offline_Daily_Sales'] = offline_daily.reindex(result['Date']).fillna(0)
-    result['All_Daily_Sales'] = all_daily.reindex(result['Date']).fillna(0)
-    result['Safety_Stock_Retail'] = safety_stock_retail.reindex(result['Date']).fillna(0)
-    result['Safety_Stock_Offline'] = safety_stock_offline.reindex(result['Date']).fillna(0)
-    result['Safety_Stock_All'] = safety_stock_all.reindex(result['Date']).fillna(0)
-    
-    # 确保所有数值都是有效的（不是NaN）
-    numeric_columns = ['Retail_Daily_Sales', 'Offline_Daily_Sales', 'All_Daily_Sales', 
-                      'Safety_Stock_Retail', 'Safety_Stock_Offline', 'Safety_Stock_All']
-    for col in numeric_columns:
-        result[col] = result[col].fillna(0)
-    
-    return result
+# 日期前缀和索引：任意时间范围的渠道汇总不再扫描原始记录（同样所有会话共用）
+@st.cache_resource
+def load_date_index():
+    """构建按日期的前缀和索引（与其他脚本共用数据集上的汇总）"""
+    if load_data() is None:
+        return None
+    return dataset_aggregate(load_dataset(DATA_PATH, columns=LOAD_COLUMNS, compact=True), 'date_index')
 
-# 生成预警信号
-def generate_alerts(data, current_inventory_value):
-    """生成预警信号"""
-    alerts = []
-    latest_data = data.iloc[-1]
-    
-    # 检查是否低于安全库存线
-    if current_inventory_value < latest_data['Safety_Stock_Retail']:
-        alerts.append({
-            'level': 'critical',
-            'type': '零售渠道安全库存预警',
-            'message': f'当前库存 ¥{current_inventory_value:,.0f} 低于零售渠道安全库存线 ¥{latest_data["Safety_Stock_Retail"]:,.0f}',
-            'shortage': latest_data['Safety_Stock_Retail'] - current_inventory_value
-        })
-    
-    if current_inventory_value < latest_data['Safety_Stock_Offline']:
-        alerts.append({
-            'level': 'warning',
-            'type': '线下渠道安全库存预警',
-            'message': f'当前库存 ¥{current_inventory_value:,.0f} 低于线下渠道安全库存线 ¥{latest_data["Safety_Stock_Offline"]:,.0f}',
-            'shortage': latest_data['Safety_Stock_Offline'] - current_inventory_value
-        })
-    
-    if current_inventory_value < latest_data['Safety_Stock_All']:
-        alerts.append({
-            'level': 'info',
-            'type': '全渠道安全库存预警',
-            'message': f'当前库存 ¥{current_inventory_value:,.0f} 低于全渠道安全库存线 ¥{latest_data["Safety_Stock_All"]:,.0f}',
-            'shortage': latest_data['Safety_Stock_All'] - current_inventory_value
-        })
-    
-    return alerts
+# 嵌入式数据库后端
+@st.cache_data
+def load_store():
+    """打开数据库（源文件变化时重建），返回的只是数据库文件的位置和版本"""
+    try:
+        return open_sales_store(DATA_PATH)
+    except Exception as e:
+        st.error(f"数据库加载失败: {e}")
+        return None
 
 # 主应用
 def main():
     # 加载数据
-    df = load_data()
-    if df is None:
-        st.stop()
+    if USE_SQL_STORE:
+        store = load_store()
+        if store is None:
+            st.stop()
+    else:
+        compact = load_data()
+        date_index = load_date_index()
+        if compact is None or date_index is None:
+            st.stop()
     
     # 获取渠道分组
     channel_groups = define_channel_groups()
@@ -164,9 +89,17 @@ def main():
     # 侧边栏参数设置
     st.sidebar.header("📋 参数设置")
     
-    # 清除缓存按钮
+    # 刷新数据按钮：源文件只是追加了新行时增量解析，否则全量重建
     if st.sidebar.button("🔄 刷新数据"):
-        st.cache_data.clear()
+        new_rows = append_new_rows(DATA_PATH)
+        if new_rows is None:
+            st.session_state.pop('safety_memo', None)
+            st.cache_data.clear()
+            st.cache_resource.clear()
+        elif len(new_rows) > 0:
+            load_data.clear()
+            load_date_index.clear()
+            load_store.clear()
         st.rerun()
     
     # OTD设置
@@ -178,24 +111,120 @@ def main():
         help="补货周期时间（天）"
     )
     
-    # 时间范围选择
+    # 安全库存模型：默认 移动平均 × OTD，也可以按销量波动和目标服务水平计算
+    safety_model = st.sidebar.selectbox(
+        "安全库存模型",
+        options=list(SAFETY_MODELS),
+        format_func=SAFETY_MODELS.get
+    )
+    service_level = DEFAULT_SERVICE_LEVEL
+    lead_time_std = 0.0
+    if safety_model != DEFAULT_MODEL:
+        service_level = st.sidebar.slider(
+            "目标服务水平",
+            min_value=0.80,
+            max_value=0.99,
+            value=DEFAULT_SERVICE_LEVEL,
+            step=0.01,
+            help="库存覆盖交期内需求的概率，决定 z 值"
+        )
+        if safety_model == 'lead_time_variance':
+            lead_time_std = st.sidebar.number_input(
+                "交期标准差（天）",
+                min_value=0.0,
+                max_value=15.0,
+                value=2.0,
+                step=0.5
+            )
+    
+    # 时间范围选择（首尾日期直接取自索引）
+    if USE_SQL_STORE:
+        first_date, last_date = (day.date() for day in store_date_bounds(store))
+    else:
+        first_date = date_index['dates'][0].date()
+        last_date = date_index['dates'][-1].date()
     date_range = st.sidebar.date_input(
         "选择分析时间范围",
-        value=[df['Date'].min().date(), df['Date'].max().date()],
-        min_value=df['Date'].min().date(),
-        max_value=df['Date'].max().date()
+        value=[first_date, last_date],
+        min_value=first_date,
+        max_value=last_date
     )
     
-    # 过滤数据
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        filtered_df = df[(df['Date'] >= pd.to_datetime(start_date)) & 
-                        (df['Date'] <= pd.to_datetime(end_date))]
-    else:
-        filtered_df = df
+    # 图表设置：长时间范围的数据先在服务端降采样，再发送给浏览器
+    with st.sidebar.expander("📉 图表设置"):
+        max_chart_points = st.number_input(
+            "每张图最多显示点数",
+            min_value=200,
+            max_value=20000,
+            value=MAX_CHART_POINTS,
+            step=100,
+            help="所选时间范围内的数据超过该点数时，按桶保留最高/最低点和预警线交叉点"
+        )
+        use_webgl = st.checkbox(
+            "点数较多时使用WebGL渲染",
+            value=True,
+            help=f"所选时间范围超过 {WEBGL_THRESHOLD:,} 天时用WebGL绘制曲线"
+        )
+    webgl_threshold = WEBGL_THRESHOLD if use_webgl else None
+    
+    # OTD无关的结果（每日库存、日销量、移动平均）按 数据版本 × 时间范围
+    # 缓存在会话中（LRU淘汰），拖动OTD滑块只需要做最后一步乘法
+    cache_info = get_cache_info(DATA_PATH)
+    data_version = (
+        cache_info.get('base_sha256') if cache_info else None,
+        cache_info.get('sha256') if cache_info else None
+    )
+    if USE_SQL_STORE:
+        data_version = (None, store['stamp'])
+    range_key = tuple(date_range) if len(date_range) == 2 else None
+    memo = st.session_state.setdefault('safety_memo', new_lru_cache())
+    computed = lru_get(memo, (data_version, range_key))
+    
+    if computed is None:
+        if range_key is not None:
+            start_date, end_date = pd.to_datetime(range_key[0]), pd.to_datetime(range_key[1])
+        else:
+            start_date, end_date = None, None
+    
+    if computed is None and USE_SQL_STORE:
+        # 日期过滤、分组汇总和移动平均一次查询完成
+        moving_average = store_moving_average(store, channel_groups, start_date, end_date)
+        computed = lru_put(memo, (data_version, range_key), {
+            'base_sha256': None,
+            'start': moving_average['Date'].min(),
+            'end': moving_average['Date'].max(),
+            'moving_average': moving_average
+        })
+    
+    if computed is None:
+        # 过滤数据（紧凑结构按日期排序，二分定位切片）
+        first, last = day_bounds(compact, start_date, end_date)
+        filtered_days = compact['days'][first:last]
+        
+        # 历史数据没有被改写、起始日期相同、结束日期只向后延伸时（例如追加了新一天的数据），
+        # 在之前的结果上增量计算，否则全量计算
+        start, end = filtered_days.min(), filtered_days.max()
+        candidates = [
+            entry for entry in memo.values()
+            if data_version[0] is not None and entry['base_sha256'] == data_version[0]
+            and entry['start'] == start and entry['end'] <= end
+        ]
+        if candidates:
+            previous = max(candidates, key=lambda entry: entry['end'])
+            moving_average = extend_compact_moving_average(previous['moving_average'], compact, channel_groups,
+                                                           start=start_date, end=end_date)
+        else:
+            moving_average = compact_moving_average(compact, channel_groups, start=start_date, end=end_date)
+        
+        computed = lru_put(memo, (data_version, range_key), {
+            'base_sha256': data_version[0],
+            'start': start,
+            'end': end,
+            'moving_average': moving_average
+        })
     
-    # 计算安全库存数据
-    safety_data = calculate_safety_stock(filtered_df, channel_groups, otd_days)
+    # 计算安全库存线（考虑OTD时间和所选模型）
+    safety_data = apply_safety_model(computed['moving_average'], otd_days, safety_model, service_level, lead_time_std)
     
     # 获取当前库存值
     current_inventory = safety_data['Inv.Value(RMB)'].iloc[-1]
@@ -250,6 +279,12 @@ def main():
     # 图表1：库存与销量时间趋势
     st.header("📈 库存与销量时间趋势")
     
+    trend_data = downsample_frame(
+        safety_data,
+        ['Inv.Value(RMB)', 'Retail_Daily_Sales', 'Offline_Daily_Sales', 'All_Daily_Sales'],
+        max_points=max_chart_points
+    )
+    
     fig1 = make_subplots(
         rows=2, cols=1,
         subplot_titles=('库存价值变化', '各渠道日销量变化'),
@@ -259,9 +294,10 @@ def main():
     
     # 库存变化
     fig1.add_trace(
-        go.Scatter(
-            x=safety_data['Date'],
-            y=safety_data['Inv.Value(RMB)'],
+        scatter_trace(
+            len(safety_data), webgl_threshold,
+            x=trend_data['Date'],
+            y=trend_data['Inv.Value(RMB)'],
             mode='lines',
             name='实际库存',
             line=dict(color='blue', width=3)
@@ -271,9 +307,10 @@ def main():
     
     # 销量变化
     fig1.add_trace(
-        go.Scatter(
-            x=safety_data['Date'],
-            y=safety_data['Retail_Daily_Sales'],
+        scatter_trace(
+            len(safety_data), webgl_threshold,
+            x=trend_data['Date'],
+            y=trend_data['Retail_Daily_Sales'],
             mode='lines',
             name='零售渠道日销量',
             line=dict(color='green', width=2)
@@ -282,9 +319,10 @@ def main():
     )
     
     fig1.add_trace(
-        go.Scatter(
-            x=safety_data['Date'],
-            y=safety_data['Offline_Daily_Sales'],
+        scatter_trace(
+            len(safety_data), webgl_threshold,
+            x=trend_data['Date'],
+            y=trend_data['Offline_Daily_Sales'],
             mode='lines',
             name='线下渠道日销量',
             line=dict(color='orange', width=2)
@@ -293,9 +331,10 @@ def main():
     )
     
     fig1.add_trace(
-        go.Scatter(
-            x=safety_data['Date'],
-            y=safety_data['All_Daily_Sales'],
+        scatter_trace(
+            len(safety_data), webgl_threshold,
+            x=trend_data['Date'],
+            y=trend_data['All_Daily_Sales'],
             mode='lines',
             name='全渠道日销量',
             line=dict(color='red', width=2)
@@ -317,12 +356,22 @@ def main():
     # 图表2：安全库存线与预警
     st.header("🛡️ 安全库存线与预警信号")
     
+    # 降采样时保留库存穿越各条安全库存线的日期
+    safety_columns = ['Safety_Stock_Retail', 'Safety_Stock_Offline', 'Safety_Stock_All']
+    safety_chart_data = downsample_frame(
+        safety_data,
+        ['Inv.Value(RMB)'] + safety_columns,
+        max_points=max_chart_points,
+        crossings=[('Inv.Value(RMB)', col) for col in safety_columns]
+    )
+    
     fig2 = go.Figure()
     
     # 实际库存
-    fig2.add_trace(go.Scatter(
-        x=safety_data['Date'],
-        y=safety_data['Inv.Value(RMB)'],
+    fig2.add_trace(scatter_trace(
+        len(safety_data), webgl_threshold,
+        x=safety_chart_data['Date'],
+        y=safety_chart_data['Inv.Value(RMB)'],
         mode='lines',
         name='实际库存',
         line=dict(color='blue', width=4),
@@ -330,27 +379,30 @@ def main():
     ))
     
     # 安全库存线
-    fig2.add_trace(go.Scatter(
-        x=safety_data['Date'],
-        y=safety_data['Safety_Stock_Retail'],
+    fig2.add_trace(scatter_trace(
+        len(safety_data), webgl_threshold,
+        x=safety_chart_data['Date'],
+        y=safety_chart_data['Safety_Stock_Retail'],
         mode='lines',
         name=f'零售渠道安全库存线 (OTD={otd_days}天)',
         line=dict(color='red', width=2, dash='dash'),
         fill=None
     ))
     
-    fig2.add_trace(go.Scatter(
-        x=safety_data['Date'],
-        y=safety_data['Safety_Stock_Offline'],
+    fig2.add_trace(scatter_trace(
+        len(safety_data), webgl_threshold,
+        x=safety_chart_data['Date'],
+        y=safety_chart_data['Safety_Stock_Offline'],
         mode='lines',
         name=f'线下渠道安全库存线 (OTD={otd_days}天)',
         line=dict(color='orange', width=2, dash='dash'),
         fill=None
     ))
     
-    fig2.add_trace(go.Scatter(
-        x=safety_data['Date'],
-        y=safety_data['Safety_Stock_All'],
+    fig2.add_trace(scatter_trace(
+        len(safety_data), webgl_threshold,
+        x=safety_chart_data['Date'],
+        y=safety_chart_data['Safety_Stock_All'],
         mode='lines',
         name=f'全渠道安全库存线 (OTD={otd_days}天)',
         line=dict(color='green', width=2, dash='dash'),
@@ -422,7 +474,7 @@ def main():
         
         ### 安全库存计算：
         1. **日均销量计算**: 使用7天移动平均来平滑销量波动
-        2. **安全库存线**: 日均销量 × OTD天数
+        2. **安全库存线**: 日均销量 × OTD天数（侧边栏可切换为服务水平 z·σ·√L、再订货点或含交期波动的模型，σ 为7天窗口内日销量的标准差）
         3. **预警机制**: 当实际库存低于安全库存线时触发预警
         
         ### 预警级别：
@@ -438,10 +490,11 @@ def main():
     # 渠道分析
     st.header("📊 各渠道销量分析")
     
-    # 按渠道聚合数据
-    channel_analysis = filtered_df.groupby('Store Group Channel').agg({
-        'IDS GIV': ['sum', 'mean', 'count']
-    }).round(2)
+    # 按渠道聚合数据：由前缀和索引按首尾日期相减得到
+    if USE_SQL_STORE:
+        channel_analysis = store_channel_summary(store, *(range_key or (None, None))).round(2)
+    else:
+        channel_analysis = channel_summary(date_index, *(range_key or (None, None))).round(2)
     
     channel_analysis.columns = ['总销量', '日均销量', '交易天数']
     channel_analysis = channel_analysis.sort_values('总销量', ascending=False)
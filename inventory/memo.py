@@ -0,0 +1,26 @@
+from collections import OrderedDict
+
+# 每个会话最多保留的计算结果数量，超过后淘汰最久未使用的
+DEFAULT_MAX_ENTRIES = 16
+
+
+def new_lru_cache():
+    return OrderedDict()
+
+
+def lru_get(cache, key):
+    """命中时返回缓存值并标记为最近使用，未命中返回None"""
+    if key not in cache:
+        return None
+    cache.move_to_end(key)
+    return cache[key]
+
+
+def lru_put(cache, key, value, max_entries=DEFAULT_MAX_ENTRIES):
+    """写入缓存，超出容量时淘汰最久未使用的条目"""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_entries:
+        cache.popitem(last=False)
+    return value
+
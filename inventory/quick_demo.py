@@ -1,41 +1,38 @@
-import pandas as pd
 import numpy as np
 from datetime import datetime
+from sales_data import load_dataset, dataset_aggregate
 
 print('📊 库存预警与订单建议系统 - 演示分析')
 print('=' * 50)
 
-# 加载数据
+# 加载数据（共享的数据集：类型转换已在缓存中完成，各项汇总按需计算并复用）
 print('📂 正在加载数据...')
-df = pd.read_csv('/Users/willmbp/Documents/2024/My_projects/inventory/virtual_data_new_logic.csv')
+dataset = load_dataset('virtual_data_new_logic.csv')
+df = dataset['frame']
 
-# 数据预处理
-df['Date'] = pd.to_datetime(df['Date'])
-df['Inv.Value(RMB)'] = pd.to_numeric(df['Inv.Value(RMB)'], errors='coerce')
-df['IDS GIV'] = pd.to_numeric(df['IDS GIV'], errors='coerce').fillna(0)
-
-print(f'✅ 数据加载完成，共 {len(df)} 条记录')
+print(f'✅ 数据加载完成，共 {dataset["rows"]} 条记录')
 print(f'📅 时间范围: {df["Date"].min().strftime("%Y-%m-%d")} 至 {df["Date"].max().strftime("%Y-%m-%d")}')
 
-# 定义渠道分组
-retail_channels = ['HSM', 'MM', 'ICP', 'Grocery & Others', 'CVS', 'DCP']
-offline_channels = ['HSM', 'MM', 'Grocery & Others', 'CVS', 'DCP', 'ICP', 'WS']
+# 渠道分组
+retail_channels = dataset['channel_groups']['retail']
+offline_channels = dataset['channel_groups']['offline']
 
 print('\n🏪 渠道分类:')
 print(f'零售渠道: {retail_channels}')
 print(f'线下渠道: {offline_channels}')
 
-# 计算各渠道日销量
-retail_daily = df[df['Store Group Channel'].isin(retail_channels)].groupby('Date')['IDS GIV'].sum()
-offline_daily = df[df['Store Group Channel'].isin(offline_channels)].groupby('Date')['IDS GIV'].sum()
-all_daily = df.groupby('Date')['IDS GIV'].sum()
+# 各渠道分组日销量
+group_daily = dataset_aggregate(dataset, 'group_daily')
+retail_daily = group_daily['retail']
+offline_daily = group_daily['offline']
+all_daily = dataset_aggregate(dataset, 'daily').set_index('Date')['IDS GIV']
 
 print('\n📈 销量统计:')
 print(f'零售渠道总销量: ¥{retail_daily.sum():,.0f}')
 print(f'线下渠道总销量: ¥{offline_daily.sum():,.0f}')
 print(f'全渠道总销量: ¥{all_daily.sum():,.0f}')
 
-# 计算移动平均（7天）
+# 移动平均（7天）
 retail_ma = retail_daily.rolling(window=7, min_periods=1).mean()
 offline_ma = offline_daily.rolling(window=7, min_periods=1).mean()
 all_ma = all_daily.rolling(window=7, min_periods=1).mean()
@@ -55,7 +52,7 @@ safety_stock_offline = offline_ma.iloc[-1] * otd_days
 safety_stock_all = all_ma.iloc[-1] * otd_days
 
 # 获取当前库存
-daily_data = df.groupby('Date')['Inv.Value(RMB)'].first()
+daily_data = dataset_aggregate(dataset, 'daily').set_index('Date')['Inv.Value(RMB)']
 current_inventory = daily_data.iloc[-1]
 current_date = daily_data.index[-1]
 
@@ -95,12 +92,8 @@ if not alerts:
 
 # 渠道分析
 print('\n📊 各渠道销量分析:')
-channel_analysis = df.groupby('Store Group Channel').agg({
-    'IDS GIV': ['sum', 'mean', 'count']
-}).round(0)
-
+channel_analysis = dataset_aggregate(dataset, 'channel_totals').round(0)
 channel_analysis.columns = ['总销量', '日均销量', '交易天数']
-channel_analysis = channel_analysis.sort_values('总销量', ascending=False)
 
 print('\n渠道排名（按总销量）:')
 for i, (channel, data) in enumerate(channel_analysis.head(5).iterrows(), 1):
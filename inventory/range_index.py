@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from alert_core import build_channel_daily, build_group_membership
+
+
+def _prefix_sums(values):
+    """沿日期方向的前缀和，首行补0：区间 [i, j) 的合计 = prefix[j] - prefix[i]"""
+    values = np.asarray(values, dtype='float64')
+    prefix = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=prefix[1:])
+    return prefix
+
+
+def build_date_index(df, channel_groups):
+    """
+    按日期构建前缀和索引
+
+    对 日期 × 渠道 的销量和记录数、日期 × 渠道分组 的销量、每日总销量分别做前缀和。
+    之后任意日期范围的合计、均值和各渠道贡献都只需二分定位首尾日期再相减，
+    与原始记录的行数无关。
+    """
+    daily = df.groupby('Date').agg({
+        'Inv.Value(RMB)': 'first',
+        'IDS GIV': 'sum'
+    })
+    channel_daily = build_channel_daily(df).reindex(daily.index, fill_value=0)
+    channel_counts = (
+        df.groupby(['Date', 'Store Group Channel'], observed=True)['IDS GIV']
+        .count()
+        .unstack(fill_value=0)
+        .reindex(index=daily.index, columns=channel_daily.columns, fill_value=0)
+    )
+    return assemble_date_index(daily['Inv.Value(RMB)'], daily['IDS GIV'], channel_daily, channel_counts,
+                               channel_groups)
+
+
+def assemble_date_index(inventory, total, channel_daily, channel_counts, channel_groups):
+    """
+    由按日汇总结果组装前缀和索引
+
+    inventory、total 为每日库存和总销量，channel_daily、channel_counts 为
+    日期 × 渠道 的销量和记录数（行索引为日期，两者行列一致）。
+    """
+    membership = build_group_membership(channel_daily.columns, channel_groups)
+
+    return {
+        'dates': pd.DatetimeIndex(channel_daily.index),
+        'channels': channel_daily.columns,
+        'groups': membership.columns,
+        'inventory': np.asarray(inventory),
+        'total_prefix': _prefix_sums(total),
+        'channel_prefix': _prefix_sums(channel_daily),
+        'count_prefix': _prefix_sums(channel_counts),
+        'group_prefix': _prefix_sums(channel_daily.to_numpy(dtype='float64') @ membership.to_numpy())
+    }
+
+
+def range_bounds(index, start=None, end=None):
+    """日期范围（含首尾）在索引中的位置区间 [i, j)"""
+    dates = index['dates']
+    i = 0 if start is None else dates.searchsorted(pd.Timestamp(start), side='left')
+    j = len(dates) if end is None else dates.searchsorted(pd.Timestamp(end), side='right')
+    return i, max(i, j)
+
+
+def channel_summary(index, start=None, end=None):
+    """
+    日期范围内各渠道的总销量、每条记录的平均销量和记录数
+
+    与对过滤后的原始记录做 groupby(渠道).agg(['sum', 'mean', 'count']) 结果一致，
+    区间内没有记录的渠道不出现。
+    """
+    i, j = range_bounds(index, start, end)
+    totals = index['channel_prefix'][j] - index['channel_prefix'][i]
+    counts = index['count_prefix'][j] - index['count_prefix'][i]
+
+    present = counts > 0
+    summary = pd.DataFrame({
+        'sum': totals[present],
+        'mean': totals[present] / counts[present],
+        'count': counts[present].round().astype('int64')
+    }, index=index['channels'][present])
+    summary.index.name = 'Store Group Channel'
+    return summary
+
+
+def group_summary(index, start=None, end=None):
+    """日期范围内各渠道分组的总销量和日均销量"""
+    i, j = range_bounds(index, start, end)
+    totals = index['group_prefix'][j] - index['group_prefix'][i]
+    days = j - i
+    return pd.DataFrame({
+        'sum': totals,
+        'daily_mean': totals / days if days else np.full(len(totals), np.nan)
+    }, index=index['groups'])
+
+
+def range_total(index, start=None, end=None):
+    """日期范围内的总销量和天数"""
+    i, j = range_bounds(index, start, end)
+    return index['total_prefix'][j] - index['total_prefix'][i], j - i
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+
+from batch_alerts import SERIES_KEYS, aggregate_batch_daily
+from safety_models import DEFAULT_MODEL, DEFAULT_SERVICE_LEVEL, safety_stock_lines
+
+
+def new_rolling_state(series, groups, window=7):
+    """
+    创建滚动窗口状态：每个序列 × 渠道分组 保存最近 window 天日销量的环形缓冲区
+
+    series 为序列标签（SERIES_KEYS 组成的 MultiIndex，单序列时传 [None]），
+    groups 为渠道分组名。另外维护窗口内的和与平方和，新的一天到达时只更新
+    被挤出窗口的那一天和新的一天，移动平均、方差和安全库存线都是 O(1) 更新。
+    """
+    if window < 1:
+        raise ValueError(f'window 必须大于0: {window}')
+    n_series = len(series)
+    n_groups = len(groups)
+    return {
+        'window': window,
+        'series': series if isinstance(series, pd.Index) else pd.Index(series),
+        'groups': list(groups),
+        'buffer': np.zeros((n_series, window, n_groups)),
+        'sum': np.zeros((n_series, n_groups)),
+        'sum_sq': np.zeros((n_series, n_groups)),
+        'position': np.zeros(n_series, dtype='int64'),
+        'count': np.zeros(n_series, dtype='int64'),
+        'date': np.full(n_series, np.datetime64('NaT'), dtype='datetime64[ns]'),
+        'inventory': np.full(n_series, np.nan)
+    }
+
+
+def _resync(state, rows):
+    """缓冲区转满一圈时按缓冲区重新求和，避免加减累积的浮点误差（均摊仍为 O(1)）"""
+    if len(rows):
+        values = state['buffer'][rows]
+        state['sum'][rows] = values.sum(axis=1)
+        state['sum_sq'][rows] = (values * values).sum(axis=1)
+
+
+def _ensure_series(state, labels):
+    """返回各标签在状态中的行号，新出现的序列追加到状态末尾"""
+    labels = labels if isinstance(labels, pd.Index) else pd.Index(labels)
+    rows = state['series'].get_indexer(labels)
+    missing = rows < 0
+    if missing.any():
+        new = labels[missing]
+        extra = new_rolling_state(new, state['groups'], state['window'])
+        state['series'] = state['series'].append(new)
+        for key in ['buffer', 'sum', 'sum_sq', 'position', 'count', 'date', 'inventory']:
+            state[key] = np.concatenate([state[key], extra[key]])
+        rows = state['series'].get_indexer(labels)
+    return rows
+
+
+def push_day(state, rows, date, sales, inventory=None):
+    """
+    写入一天的数据
+
+    rows 为状态中的序列行号，sales 为对应的各分组日销量 (len(rows), n_groups)。
+    日期与该序列最后一天相同时视为当天数据的更新（例如当天只到了部分渠道），
+    替换窗口中最新的一天而不是再追加一天；早于最后一天的数据会报错。
+    """
+    rows = np.asarray(rows, dtype='int64')
+    sales = np.asarray(sales, dtype='float64').reshape(len(rows), len(state['groups']))
+    date = np.datetime64(pd.Timestamp(date), 'ns')
+
+    last = state['date'][rows]
+    if (last > date).any():
+        raise ValueError(f'{date} 早于已写入的最后日期，滚动窗口只能按日期顺序追加')
+
+    window = state['window']
+    replace = last == date
+    slots = np.where(replace, (state['position'][rows] - 1) % window, state['position'][rows])
+
+    old = state['buffer'][rows, slots]
+    state['buffer'][rows, slots] = sales
+    state['sum'][rows] += sales - old
+    state['sum_sq'][rows] += sales * sales - old * old
+
+    advanced = rows[~replace]
+    state['position'][advanced] = (state['position'][advanced] + 1) % window
+    state['count'][advanced] = np.minimum(state['count'][advanced] + 1, window)
+    _resync(state, advanced[state['position'][advanced] == 0])
+
+    state['date'][rows] = date
+    if inventory is not None:
+        state['inventory'][rows] = inventory
+    return state
+
+
+def rolling_mean(state):
+    """各序列、各分组当前窗口的日均销量（窗口未满时按已有天数平均，与 min_periods=1 一致）"""
+    count = state['count'][:, None].astype('float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, state['sum'] / count, np.nan)
+
+
+def rolling_variance(state):
+    """各序列、各分组当前窗口日销量的样本方差（ddof=1，不足两天为NaN）"""
+    count = state['count'][:, None].astype('float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (state['sum_sq'] - state['sum'] * state['sum'] / count) / (count - 1)
+    return np.where(count > 1, np.maximum(variance, 0), np.nan)
+
+
+def rolling_safety_stock(state, otd_days=7, model=DEFAULT_MODEL,
+                         service_level=DEFAULT_SERVICE_LEVEL, lead_time_std=0.0):
+    """当前窗口的安全库存线（默认 移动平均 × OTD天数，其他模型见 safety_models）"""
+    return safety_stock_lines(rolling_mean(state), np.sqrt(rolling_variance(state)), otd_days,
+                              model, service_level, lead_time_std)
+
+
+def seed_rolling_state(daily, group_daily, window=7, series_keys=SERIES_KEYS):
+    """
+    用已有的按日汇总结果（aggregate_batch_daily 的输出）初始化滚动状态
+
+    每个序列只取最后 window 天写入缓冲区，历史再长也不需要逐日回放。
+    """
+    keys = list(series_keys)
+    frame = daily.reset_index()
+    if keys:
+        codes = frame.groupby(keys, observed=True, sort=False).ngroup().to_numpy()
+        series = pd.MultiIndex.from_frame(frame[keys].drop_duplicates())
+    else:
+        codes = np.zeros(len(frame), dtype='int64')
+        series = pd.Index([None])
+
+    state = new_rolling_state(series, group_daily.columns, window)
+    if len(frame) == 0:
+        return state
+
+    # 每行在所属序列内距离最后一天的位置，只保留窗口内的行
+    from_end = frame.groupby(codes).cumcount(ascending=False).to_numpy()
+    keep = from_end < window
+    counts = np.bincount(codes, minlength=len(series))
+    state['count'] = np.minimum(counts, window)
+
+    # 窗口内最早的一天写在槽位0，下一次写入的槽位即窗口已有天数（满窗时回到0）
+    rows = codes[keep]
+    slots = state['count'][rows] - 1 - from_end[keep]
+    state['buffer'][rows, slots] = group_daily.to_numpy(dtype='float64')[keep]
+    state['position'] = state['count'] % window
+    _resync(state, np.arange(len(series)))
+
+    last = from_end == 0
+    state['date'][codes[last]] = frame.loc[last, 'Date'].to_numpy(dtype='datetime64[ns]')
+    state['inventory'][codes[last]] = frame.loc[last, 'Inv.Value(RMB)'].to_numpy(dtype='float64')
+    return state
+
+
+def update_rolling_state(state, df, channel_groups, series_keys=SERIES_KEYS):
+    """
+    把新到的原始记录（一天或几天）按日期顺序写入滚动状态
+
+    新记录先按 序列 × 日期 聚合，再逐日写入；每天的计算量只与序列数成正比，
+    与已有的历史长度无关。
+    """
+    keys = list(series_keys)
+    daily, group_daily = aggregate_batch_daily(df, channel_groups, keys)
+    group_daily = group_daily.reindex(columns=state['groups'], fill_value=0)
+    frame = daily.reset_index()
+
+    if keys:
+        rows = _ensure_series(state, pd.MultiIndex.from_frame(frame[keys]))
+    else:
+        rows = np.zeros(len(frame), dtype='int64')
+
+    sales = group_daily.to_numpy(dtype='float64')
+    inventory = frame['Inv.Value(RMB)'].to_numpy(dtype='float64')
+    dates = frame['Date'].to_numpy()
+    for date in np.unique(dates):
+        on_date = dates == date
+        push_day(state, rows[on_date], date, sales[on_date], inventory[on_date])
+    return state
+
+
+def rolling_snapshot(state, otd_days=7, series_keys=SERIES_KEYS, model=DEFAULT_MODEL,
+                     service_level=DEFAULT_SERVICE_LEVEL, lead_time_std=0.0):
+    """
+    当前状态展开为长表：每个 序列 × 渠道分组 一行
+
+    列与 build_batch_lines 一致（Daily_Sales 为最新一天的日销量，另加 Daily_Sales_Std），
+    可以直接交给 generate_batch_alerts 生成最新一天的预警。
+    """
+    keys = list(series_keys)
+    groups = state['groups']
+    n_series = len(state['series'])
+
+    frame = pd.DataFrame({'Date': state['date'], 'Inv.Value(RMB)': state['inventory']})
+    if keys:
+        frame = pd.concat([state['series'].to_frame(index=False, name=keys), frame], axis=1)
+    lines = frame.loc[np.repeat(np.arange(n_series), len(groups))].reset_index(drop=True)
+    lines['Channel Group'] = pd.Categorical(np.tile(groups, n_series), categories=groups)
+
+    # 最新一天的日销量在上一次写入的槽位；还没有数据的序列为NaN
+    latest = state['buffer'][np.arange(n_series), (state['position'] - 1) % state['window']]
+    latest[state['count'] == 0] = np.nan
+    lines['Daily_Sales'] = latest.ravel()
+    lines['Daily_Sales_MA'] = rolling_mean(state).ravel()
+    lines['Daily_Sales_Std'] = np.sqrt(rolling_variance(state)).ravel()
+    lines['Safety_Stock'] = rolling_safety_stock(state, otd_days, model, service_level, lead_time_std).ravel()
+    return lines
+
@@ -0,0 +1,79 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from alert_core import MA_SUFFIX
+
+# 可选的安全库存模型（键 -> 界面显示名称）
+SAFETY_MODELS = {
+    'moving_average': '移动平均 × OTD',
+    'service_level': '服务水平 z·σ·√L',
+    'reorder_point': '再订货点 d·L + z·σ·√L',
+    'lead_time_variance': '含交期波动 z·√(L·σ² + d²·σL²)'
+}
+
+DEFAULT_MODEL = 'moving_average'
+
+# 默认目标服务水平（不缺货的概率）
+DEFAULT_SERVICE_LEVEL = 0.95
+
+
+def service_level_z(service_level):
+    """服务水平对应的标准正态分位数 z，例如 0.95 -> 1.645"""
+    if not 0 < service_level < 1:
+        raise ValueError(f'服务水平必须在0和1之间: {service_level}')
+    return NormalDist().inv_cdf(service_level)
+
+
+def safety_stock_lines(mean, std, otd_days, model=DEFAULT_MODEL,
+                       service_level=DEFAULT_SERVICE_LEVEL, lead_time_std=0.0):
+    """
+    按模型计算安全库存线（整列广播运算，任意形状的 mean/std 一次算完）
+
+    mean 为日均销量 d，std 为日销量标准差 σ，otd_days 为交期 L（天），
+    lead_time_std 为交期的标准差 σL（天）：
+        moving_average      d × L
+        service_level       z × σ × √L
+        reorder_point       d × L + z × σ × √L
+        lead_time_variance  z × √(L × σ² + d² × σL²)
+    数据不足两天、标准差为NaN时按0处理。
+    """
+    if model not in SAFETY_MODELS:
+        raise ValueError(f'未知的安全库存模型: {model}，可选 {list(SAFETY_MODELS)}')
+
+    mean = np.asarray(mean, dtype='float64')
+    if model == 'moving_average':
+        return mean * otd_days
+
+    std = np.nan_to_num(np.asarray(std, dtype='float64'))
+    z = service_level_z(service_level)
+    if model == 'lead_time_variance':
+        return z * np.sqrt(otd_days * std ** 2 + mean ** 2 * lead_time_std ** 2)
+
+    safety = z * std * np.sqrt(otd_days)
+    if model == 'reorder_point':
+        return mean * otd_days + safety
+    return safety
+
+
+def apply_safety_model(moving_average, otd_days=7, model=DEFAULT_MODEL,
+                       service_level=DEFAULT_SERVICE_LEVEL, lead_time_std=0.0, window=7):
+    """
+    在 calculate_moving_average 的结果上按模型计算安全库存线
+
+    与 apply_otd 一样把移动平均列替换为 Safety_Stock_{分组} 列；日销量的标准差
+    对所有分组一次滚动计算（窗口与移动平均相同）。
+    """
+    ma_columns = [col for col in moving_average.columns if col.endswith(MA_SUFFIX)]
+    labels = [col[:-len(MA_SUFFIX)] for col in ma_columns]
+    sales = moving_average[[f'{label}_Daily_Sales' for label in labels]]
+    std = sales.rolling(window=window, min_periods=2).std().to_numpy()
+
+    safety_stock = pd.DataFrame(
+        safety_stock_lines(moving_average[ma_columns].to_numpy(), std, otd_days,
+                           model, service_level, lead_time_std),
+        columns=[f'Safety_Stock_{label}' for label in labels],
+        index=moving_average.index
+    )
+    return pd.concat([moving_average.drop(columns=ma_columns), safety_stock.fillna(0)], axis=1)
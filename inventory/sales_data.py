@@ -0,0 +1,174 @@
+import os
+
+import pandas as pd
+
+from alert_core import build_channel_daily, aggregate_channel_groups, calculate_moving_average, define_channel_groups
+from batch_alerts import SERIES_KEYS, aggregate_batch_daily
+from compact_store import compact_sales, compact_date_index, compact_moving_average, expand_compact
+from feed_ingest import discover_feeds, feeds_stamp, load_feeds, total_daily_channel_sales
+from ingest import load_sales_data, stream_daily_channel_sales
+from range_index import build_date_index
+
+# 数据文件默认放在脚本同级目录，可以用环境变量指定其他位置
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH_ENV = 'INVENTORY_DATA_PATH'
+DEFAULT_DATA_FILE = 'demo_inventory_data.csv'
+
+# 超过该大小的导出文件不整体载入内存，改为分块流式汇总
+STREAMING_THRESHOLD_BYTES = 512 * 1024 * 1024
+
+# 进程内已加载的数据集：(绝对路径, 列, 是否紧凑) -> 数据集
+_DATASETS = {}
+
+
+def enable_copy_on_write():
+    """
+    开启写时复制（pandas 3 默认开启）：对共享数据集的切片和列选择都是视图，
+    只有修改时才复制，多个会话可以安全地引用同一份数据
+    """
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
+
+
+def resolve_data_path(path=None):
+    """
+    数据文件路径：未指定时依次使用环境变量 INVENTORY_DATA_PATH 和默认演示数据，
+    相对路径按脚本所在目录解析；也可以是存放各经销商/Hub数据文件的目录
+    """
+    path = path or os.environ.get(DATA_PATH_ENV) or DEFAULT_DATA_FILE
+    if not os.path.isabs(path) and not os.path.exists(path):
+        path = os.path.join(DATA_DIR, path)
+    return os.path.abspath(path)
+
+
+def _source_stamp(path):
+    if os.path.isdir(path):
+        return feeds_stamp(discover_feeds(path))
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_dataset(path=None, columns=None, channel_groups=None, compact=False):
+    """
+    加载共享的数据集（同一进程内按路径缓存，源文件变化时自动重新加载）
+
+    返回字典：
+        path            数据文件（或数据文件目录）绝对路径
+        frame           带类型的明细表（Date为datetime64，维度为分类类型，金额为float64，
+                        出货金额缺失值已填0）；超大文件为 日期 × 渠道 的流式汇总；
+                        数据文件目录为各序列合计的 日期 × 渠道 汇总；紧凑模式下为None
+        compact         紧凑模式下为 compact_sales 的结果（日期编号、float32金额、库存单独成表），
+                        常驻内存只保留这一份
+        rows            源文件记录数
+        streamed        是否为流式汇总
+        channel_groups  渠道分组定义
+        aggregates      按需计算的汇总结果，通过 dataset_aggregate 读取
+    """
+    path = resolve_data_path(path)
+    key = (path, tuple(columns) if columns is not None else None, compact)
+    stamp = _source_stamp(path)
+
+    dataset = _DATASETS.get(key)
+    if dataset is not None and dataset['stamp'] == stamp:
+        return dataset
+
+    # 目录中的各个文件并发解析后合并，再把各经销商/Hub的序列合计为一条总量序列
+    # （库存按序列取当天的值后相加），看板按单条序列计算
+    is_feed_dir = os.path.isdir(path)
+    streamed = not is_feed_dir and stamp[1] > STREAMING_THRESHOLD_BYTES
+    if is_feed_dir:
+        frame = total_daily_channel_sales(load_feeds(path))
+        rows = frame.attrs['source_rows']
+    elif streamed:
+        frame = stream_daily_channel_sales(path)
+        rows = frame.attrs['source_rows']
+    else:
+        # 通过列式缓存加载（已完成日期和数值类型转换）
+        frame = load_sales_data(path, columns=columns)
+        rows = len(frame)
+    frame['IDS GIV'] = frame['IDS GIV'].fillna(0)
+
+    dataset = {
+        'path': path,
+        'stamp': stamp,
+        'frame': None if compact else frame,
+        'compact': compact_sales(frame) if compact else None,
+        'rows': rows,
+        'streamed': streamed,
+        'channel_groups': channel_groups or define_channel_groups(),
+        'aggregates': {}
+    }
+    _DATASETS[key] = dataset
+    return dataset
+
+
+def dataset_frame(dataset):
+    """数据集的明细表；紧凑模式下临时展开，不保存在数据集中"""
+    if dataset['compact'] is not None:
+        return expand_compact(dataset['compact'])
+    return dataset['frame']
+
+
+def _daily_totals(dataset):
+    """每日库存和总销量"""
+    return dataset_frame(dataset).groupby('Date').agg({
+        'Inv.Value(RMB)': 'first',
+        'IDS GIV': 'sum'
+    }).reset_index()
+
+
+def _channel_totals(dataset):
+    """各渠道销量汇总（总量、单条记录均值、记录数），按总量降序"""
+    return (
+        dataset_frame(dataset).groupby('Store Group Channel', observed=True)['IDS GIV']
+        .agg(['sum', 'mean', 'count'])
+        .sort_values('sum', ascending=False)
+    )
+
+
+def _channel_daily(dataset):
+    return build_channel_daily(dataset_frame(dataset))
+
+
+def _group_daily(dataset):
+    return aggregate_channel_groups(dataset_aggregate(dataset, 'channel_daily'), dataset['channel_groups'])
+
+
+def _moving_average(dataset):
+    if dataset['compact'] is not None:
+        return compact_moving_average(dataset['compact'], dataset['channel_groups'])
+    return calculate_moving_average(dataset['frame'], dataset['channel_groups'])
+
+
+def _date_index(dataset):
+    if dataset['compact'] is not None:
+        return compact_date_index(dataset['compact'], dataset['channel_groups'])
+    return build_date_index(dataset['frame'], dataset['channel_groups'])
+
+
+def _series_daily(dataset):
+    """按 序列 × 日期 的库存和渠道分组日销量（数据中没有的序列键列会被忽略）"""
+    frame = dataset_frame(dataset)
+    keys = [key for key in SERIES_KEYS if key in frame.columns]
+    daily, group_daily = aggregate_batch_daily(frame, dataset['channel_groups'], keys)
+    return keys, daily, group_daily
+
+
+# 数据集上可按需计算的汇总
+AGGREGATES = {
+    'daily': _daily_totals,
+    'channel_totals': _channel_totals,
+    'channel_daily': _channel_daily,
+    'group_daily': _group_daily,
+    'moving_average': _moving_average,
+    'date_index': _date_index,
+    'series_daily': _series_daily
+}
+
+
+def dataset_aggregate(dataset, name):
+    """读取数据集的汇总结果，第一次访问时计算并保存在数据集中，之后直接复用"""
+    aggregates = dataset['aggregates']
+    if name not in aggregates:
+        aggregates[name] = AGGREGATES[name](dataset)
+    return aggregates[name]
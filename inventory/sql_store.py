@@ -0,0 +1,329 @@
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+
+from alert_core import MA_SUFFIX, group_label
+from dashboard_data import WEEK_COLUMN, MONTH_COLUMN, CHANNEL_COLUMN, WORKBOOK_COLUMNS, prepare_workbook_frame
+from ingest import CACHE_DIR_NAME, load_sales_data, load_workbook_data
+
+try:
+    import duckdb
+except ImportError:  # 未安装duckdb时使用标准库的sqlite3
+    duckdb = None
+
+# 设置该环境变量（非空且不为0）时，两个看板的查询改为在本地嵌入式数据库中执行
+SQL_STORE_ENV = 'INVENTORY_SQL_STORE'
+
+# 使用的数据库：优先DuckDB（列式、适合分析查询），否则sqlite3
+STORE_BACKEND = 'duckdb' if duckdb is not None else 'sqlite'
+STORE_SUFFIXES = {'duckdb': 'duckdb', 'sqlite': 'sqlite3'}
+
+# 日期以 YYYY-MM-DD 文本保存，不限日期范围时使用的上下界
+MIN_DAY = '0000-01-01'
+MAX_DAY = '9999-12-31'
+
+# 表结构版本，修改表结构后递增，已有的数据库文件会自动重建
+STORE_VERSION = 1
+
+ALERT_COLUMNS = ['Date', 'Inv.Value(RMB)', 'Store Group Channel', 'IDS GIV']
+
+
+def sql_store_enabled():
+    """是否启用嵌入式数据库后端（环境变量 INVENTORY_SQL_STORE）"""
+    return os.environ.get(SQL_STORE_ENV, '') not in ('', '0')
+
+
+def _store_path(source_path, name, backend):
+    """数据库文件路径（位于源文件同级的缓存目录，不同数据库使用不同扩展名）"""
+    source_path = os.path.abspath(source_path)
+    cache_dir = os.path.join(os.path.dirname(source_path), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, f'{os.path.basename(source_path)}.{name}.{STORE_SUFFIXES[backend]}')
+
+
+def _connect(store, read_only=True, path=None):
+    path = path or store['path']
+    if store['backend'] == 'duckdb':
+        return duckdb.connect(path, read_only=read_only)
+    return sqlite3.connect(path)
+
+
+def _write_table(connection, backend, name, frame):
+    if backend == 'duckdb':
+        connection.register('frame_view', frame)
+        connection.execute(f'CREATE TABLE {name} AS SELECT * FROM frame_view')
+        connection.unregister('frame_view')
+    else:
+        frame.to_sql(name, connection, index=False)
+
+
+def query_store(store, sql, params=()):
+    """在数据库中执行查询，只把结果集取回为DataFrame（每次查询单独连接，可在多个会话线程中使用）"""
+    connection = _connect(store)
+    try:
+        if store['backend'] == 'duckdb':
+            return connection.execute(sql, list(params)).df()
+        return pd.read_sql_query(sql, connection, params=list(params))
+    finally:
+        connection.close()
+
+
+def _read_meta(store):
+    try:
+        meta = query_store(store, 'SELECT * FROM meta')
+    except Exception:
+        return None
+    return meta.iloc[0].to_dict() if len(meta) else None
+
+
+def open_store(source_path, name, build_tables, backend=STORE_BACKEND):
+    """
+    打开源文件对应的数据库，源文件变化（mtime或大小）时重建
+
+    build_tables(source_path) 返回 表名 -> DataFrame，另外写入一行 meta 表
+    （表结构版本、源文件的mtime和大小，以及 build_tables 返回的 'meta' 字段）。先写入临时文件
+    再替换，其他会话和进程读到的始终是完整的数据库。返回字典：backend、path、stamp、meta。
+    """
+    stat = os.stat(source_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    store = {'backend': backend, 'path': _store_path(source_path, name, backend), 'stamp': stamp}
+
+    meta = _read_meta(store) if os.path.exists(store['path']) else None
+    if meta is None or (meta.get('store_version'), meta['source_mtime_ns'], meta['source_size']) \
+            != (STORE_VERSION,) + stamp:
+        tables = build_tables(source_path)
+        meta = {'store_version': STORE_VERSION, 'source_mtime_ns': stamp[0], 'source_size': stamp[1],
+                **tables.pop('meta', {})}
+        tables['meta'] = pd.DataFrame([meta])
+
+        os.makedirs(os.path.dirname(store['path']), exist_ok=True)
+        _build_store_file(store, tables)
+
+    store['meta'] = meta
+    return store
+
+
+def _build_store_file(store, tables):
+    """
+    在临时文件中写完所有表和索引，再原子替换为数据库文件
+
+    临时文件由 mkstemp 为每次重建单独创建，多个进程同时重建（例如两个看板在源文件
+    变化后同时启动）时各写各的文件，不会删除或写坏对方的临时文件；最后替换的
+    一方生效，替换前的文件都是完整的。写入失败时删除自己的临时文件。
+    """
+    backend = store['backend']
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(store['path']) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(store['path']))
+    os.close(fd)
+    try:
+        if backend == 'duckdb':
+            # DuckDB 不能打开空文件，文件名已经唯一，由它自己创建
+            os.remove(tmp_path)
+        connection = _connect(store, read_only=False, path=tmp_path)
+        try:
+            for table, frame in tables.items():
+                _write_table(connection, backend, table, frame)
+            for statement in _index_statements(tables):
+                connection.execute(statement)
+            if backend == 'sqlite':
+                connection.commit()
+        finally:
+            connection.close()
+        os.replace(tmp_path, store['path'])
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _index_statements(tables):
+    """按日期过滤的表在日期列上建索引，工作簿明细另在行号列上建索引（取期末库存记录）"""
+    return [
+        f'CREATE INDEX {table}_{column} ON {table} ({column})'
+        for table, frame in tables.items() for column in ['day', 'row_id'] if column in frame.columns
+    ]
+
+
+def _day_range(start=None, end=None):
+    """日期范围（含首尾）转换为查询参数"""
+    return (
+        MIN_DAY if start is None else pd.Timestamp(start).strftime('%Y-%m-%d'),
+        MAX_DAY if end is None else pd.Timestamp(end).strftime('%Y-%m-%d')
+    )
+
+
+# ---- 库存预警系统：按日明细 ----
+
+def _alert_tables(source_path):
+    """
+    载入时按 日期 × 渠道 汇总出货金额和记录数（渠道为空的记录单独成行），
+    每日库存取当天第一条非空值；看板的查询都在这两张按日的表上执行
+    """
+    df = load_sales_data(source_path, columns=ALERT_COLUMNS)
+    day = df['Date'].dt.strftime('%Y-%m-%d')
+    daily_channel = (
+        pd.DataFrame({'day': day, 'channel': df['Store Group Channel'].astype(object),
+                      'ids': df['IDS GIV'].fillna(0).astype('float64')})
+        .groupby(['day', 'channel'], dropna=False, sort=True)['ids']
+        .agg(ids='sum', records='size')
+        .reset_index()
+    )
+    daily_inventory = (
+        df['Inv.Value(RMB)'].astype('float64').groupby(day, sort=True).first()
+        .rename_axis('day').rename('inv').reset_index()
+    )
+    return {'daily_channel': daily_channel, 'daily_inventory': daily_inventory, 'meta': {'rows': len(df)}}
+
+
+def open_sales_store(source_path):
+    """库存预警系统的数据库（日期 × 渠道 的出货汇总和每日库存），meta 中保存源文件记录数"""
+    return open_store(source_path, 'sales', _alert_tables)
+
+
+def store_date_bounds(store):
+    """数据中的首尾日期"""
+    bounds = query_store(store, 'SELECT MIN(day) AS first_day, MAX(day) AS last_day FROM daily_inventory')
+    return pd.Timestamp(bounds['first_day'].iloc[0]), pd.Timestamp(bounds['last_day'].iloc[0])
+
+
+def store_moving_average(store, channel_groups, start=None, end=None, window=7):
+    """
+    日期范围内的每日库存、各渠道分组日销量及其移动平均，在数据库中一次查询完成
+
+    分组日销量用 CASE 条件求和；移动平均对每天最近 window 天（不足时按已有天数）
+    单独求平均，不用窗口函数的滑动累加，窗口内全为0时结果也是精确的0。
+    结果与 calculate_moving_average 一致。
+    """
+    params = []
+    group_sums = []
+    for i, members in enumerate(channel_groups.values()):
+        group_sums.append(
+            f"SUM(CASE WHEN channel IN ({', '.join('?' * len(members))}) THEN ids ELSE 0 END) AS g{i}"
+        )
+        params.extend(members)
+    averages = [f'AVG(recent.g{i}) AS ma{i}' for i in range(len(channel_groups))]
+
+    sql = f"""
+        WITH daily AS (
+            SELECT day, SUM(ids) AS total, {', '.join(group_sums)}, ROW_NUMBER() OVER (ORDER BY day) AS rn
+            FROM daily_channel WHERE day BETWEEN ? AND ? GROUP BY day
+        ),
+        averages AS (
+            SELECT daily.rn, {', '.join(averages)}
+            FROM daily JOIN daily AS recent ON recent.rn BETWEEN daily.rn - {window - 1} AND daily.rn
+            GROUP BY daily.rn
+        )
+        SELECT daily.*, daily_inventory.inv, {', '.join(f'averages.ma{i}' for i in range(len(channel_groups)))}
+        FROM daily
+        JOIN averages ON averages.rn = daily.rn
+        LEFT JOIN daily_inventory ON daily_inventory.day = daily.day
+        ORDER BY daily.day
+    """
+    rows = query_store(store, sql, params + list(_day_range(start, end)))
+
+    labels = [group_label(group) for group in channel_groups]
+    result = pd.DataFrame({
+        'Date': pd.to_datetime(rows['day']),
+        'Inv.Value(RMB)': rows['inv'].astype('float64'),
+        'IDS GIV': rows['total'].astype('float64')
+    })
+    for i, label in enumerate(labels):
+        result[f'{label}_Daily_Sales'] = rows[f'g{i}'].astype('float64')
+    for i, label in enumerate(labels):
+        result[f'{label}{MA_SUFFIX}'] = rows[f'ma{i}'].astype('float64')
+    return result
+
+
+def store_channel_summary(store, start=None, end=None):
+    """日期范围内各渠道的总销量、每条记录的平均销量和记录数（与 channel_summary 一致）"""
+    summary = query_store(store, """
+        SELECT channel, SUM(ids) AS total, SUM(records) AS records
+        FROM daily_channel WHERE channel IS NOT NULL AND day BETWEEN ? AND ?
+        GROUP BY channel ORDER BY channel
+    """, _day_range(start, end))
+    return pd.DataFrame({
+        'sum': summary['total'].astype('float64').to_numpy(),
+        'mean': (summary['total'] / summary['records']).astype('float64').to_numpy(),
+        'count': summary['records'].astype('int64').to_numpy()
+    }, index=pd.Index(summary['channel'], name='Store Group Channel'))
+
+
+# ---- 进销存看板：周 × 渠道 汇总立方体 ----
+
+def _workbook_tables(source_path):
+    df = load_workbook_data(source_path, WORKBOOK_COLUMNS, prepare=prepare_workbook_frame)
+    workbook = pd.DataFrame({
+        'row_id': range(len(df)),
+        'day': df[WEEK_COLUMN].dt.strftime('%Y-%m-%d'),
+        'week': df[WEEK_COLUMN].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'month': df[MONTH_COLUMN].astype(str),
+        'channel': df[CHANNEL_COLUMN].astype(object),
+        'ids': df['IDS GIV'].astype('float64'),
+        'ds': df['DS GIV'].astype('float64'),
+        'inv': df['Inv.Value(RMB)'].astype('float64')
+    })
+    first = df.iloc[0] if len(df) else {}
+    meta = {
+        'rows': len(df),
+        'fpc_code': str(first.get('FPC Code', '')),
+        'distributor': str(first.get('Distributor Hierarchy - Distributor', '')),
+        'hub': str(first.get('Distributor Hierarchy - Hub', ''))
+    }
+    return {'workbook': workbook, 'meta': meta}
+
+
+def open_workbook_store(source_path):
+    """进销存看板的数据库（工作簿每行一条记录），meta 中保存记录数和SKU/经销商/Hub"""
+    return open_store(source_path, 'workbook', _workbook_tables)
+
+
+def store_rollup_cube(store, date_range=None):
+    """
+    在数据库中按所选日期范围汇总 周 × 渠道 立方体
+
+    与 slice_cube(build_rollup_cube(df), date_range) 的结果一致，只取回汇总后的小表。
+    """
+    if date_range is not None and len(date_range) == 2:
+        day_range = _day_range(*date_range)
+    else:
+        day_range = _day_range()
+    cube = query_store(store, """
+        WITH cells AS (
+            SELECT week, month, channel,
+                   COALESCE(SUM(ids), 0) AS ids, COALESCE(SUM(ds), 0) AS ds, COALESCE(SUM(inv), 0) AS inv_sum,
+                   MAX(CASE WHEN inv IS NOT NULL THEN row_id END) AS inv_row,
+                   MIN(row_id) AS first_row, COUNT(*) AS records
+            FROM workbook WHERE day BETWEEN ? AND ?
+            GROUP BY week, month, channel
+        )
+        SELECT cells.*, workbook.inv AS inv_last
+        FROM cells LEFT JOIN workbook ON workbook.row_id = cells.inv_row
+        ORDER BY cells.week, cells.month, cells.channel IS NULL, cells.channel
+    """, day_range)
+    return pd.DataFrame({
+        WEEK_COLUMN: pd.to_datetime(cube['week']),
+        MONTH_COLUMN: pd.PeriodIndex(cube['month'], freq='M'),
+        CHANNEL_COLUMN: cube['channel'].astype('str').where(cube['channel'].notna()),
+        'IDS GIV': cube['ids'].astype('float64'),
+        'DS GIV': cube['ds'].astype('float64'),
+        'Inv_Sum': cube['inv_sum'].astype('float64'),
+        'Inv_Last': cube['inv_last'].astype('float64'),
+        'Inv_Row': cube['inv_row'].astype('float64'),
+        'First_Row': cube['first_row'].astype('int64'),
+        'Rows': cube['records'].astype('int64')
+    })
+
+
+def store_overview(store):
+    """看板侧边栏的数据概览：记录数、首尾日期、SKU、经销商、Hub"""
+    bounds = query_store(store, 'SELECT MIN(week) AS first_week, MAX(week) AS last_week FROM workbook')
+    meta = store['meta']
+    return {
+        'rows': int(meta['rows']),
+        'first_date': pd.Timestamp(bounds['first_week'].iloc[0]),
+        'last_date': pd.Timestamp(bounds['last_week'].iloc[0]),
+        'fpc_code': meta['fpc_code'],
+        'distributor': meta['distributor'],
+        'hub': meta['hub']
+    }
@@ -4,9 +4,22 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+import inspect
 from datetime import datetime
 import warnings
+from ingest import load_workbook_data
+from chart_sampling import downsample_frame
+from safety_models import SAFETY_MODELS, DEFAULT_MODEL, DEFAULT_SERVICE_LEVEL, safety_stock_lines
+from dashboard_data import (
+    WORKBOOK_COLUMNS, prepare_workbook_frame,
+    build_rollup_cube, slice_cube, available_channels as cube_channels, channel_record_count,
+    weekly_trend, monthly_channel_sales, monthly_summary,
+    period_column, period_inventory, period_channel_sales, workbook_overview
+)
+from sql_store import sql_store_enabled, open_workbook_store, store_rollup_cube, store_overview
+from sales_data import enable_copy_on_write
 warnings.filterwarnings('ignore')
+enable_copy_on_write()
 
 # 设置页面配置
 st.set_page_config(
@@ -20,601 +33,673 @@ st.set_page_config(
 st.title("📊 SKU 80814094 库存销售分析")
 st.markdown("**武汉创洁工贸洗化股份有限公司 - 进销存数据可视化分析**")
 
-@st.cache_data
+# 原始记录和汇总立方体在进程内只保存一份，所有会话引用同一个对象（不序列化、不复制），
+# 各会话的日期筛选是立方体的视图；各Tab的小结果集仍按筛选条件缓存
+@st.cache_resource
 def load_data():
     """加载和预处理数据"""
     try:
-        df = pd.read_excel('save.xlsx')
-        
-        # 处理日期字段
-        df['Report Date Hierarchy - Week Ending'] = pd.to_datetime(df['Report Date Hierarchy - Week Ending'])
-        df['Year-Month'] = df['Report Date Hierarchy - Week Ending'].dt.to_period('M')
-        df['Week'] = df['Report Date Hierarchy - Week Ending'].dt.strftime('%Y-W%U')
-        
-        # 处理金额字段
-        df['Inv.Value(RMB)'] = pd.to_numeric(df['Inv.Value(RMB)'], errors='coerce')
-        df['IDS GIV'] = pd.to_numeric(df['IDS GIV'], errors='coerce')
-        df['DS GIV'] = pd.to_numeric(df['DS GIV'], errors='coerce')
-        
-        return df
+        # 只读模式流式读取需要的列；首次读取后连同派生的期间列写入列式缓存，
+        # 工作簿变化时自动重建
+        return load_workbook_data('save.xlsx', WORKBOOK_COLUMNS, prepare=prepare_workbook_frame)
     except Exception as e:
         st.error(f"数据加载失败: {e}")
         return None
 
-# 加载数据
-df = load_data()
+@st.cache_resource
+def load_rollup_cube():
+    """加载时构建一次 周 × 渠道 汇总立方体，各Tab只对它切片"""
+    df = load_data()
+    if df is None:
+        return None
+    return build_rollup_cube(df)
 
-if df is not None:
-    # 侧边栏 - 数据概览
-    st.sidebar.header("📈 数据概览")
-    st.sidebar.write(f"**数据行数**: {len(df):,}")
-    st.sidebar.write(f"**时间范围**: {df['Report Date Hierarchy - Week Ending'].min().strftime('%Y-%m-%d')} 至 {df['Report Date Hierarchy - Week Ending'].max().strftime('%Y-%m-%d')}")
-    st.sidebar.write(f"**SKU**: {df['FPC Code'].iloc[0]}")
-    st.sidebar.write(f"**经销商**: {df['Distributor Hierarchy - Distributor'].iloc[0]}")
-    st.sidebar.write(f"**Hub**: {df['Distributor Hierarchy - Hub'].iloc[0]}")
+# 设置 INVENTORY_SQL_STORE 时工作簿载入本地嵌入式数据库，日期过滤和汇总在数据库中查询，
+# 各会话只取回汇总后的立方体，不在内存中保存原始记录
+USE_SQL_STORE = sql_store_enabled()
+
+@st.cache_data
+def load_store():
+    """打开工作簿对应的数据库（工作簿变化时重建）"""
+    try:
+        return open_workbook_store('save.xlsx')
+    except Exception as e:
+        st.error(f"数据加载失败: {e}")
+        return None
+
+def tab_cube(date_range):
+    """所选日期范围的 周 × 渠道 汇总立方体（数据库后端在数据库中汇总，否则对内存中的立方体切片）"""
+    if USE_SQL_STORE:
+        return store_rollup_cube(load_store(), date_range)
+    return slice_cube(load_rollup_cube(), date_range)
+
+# 每个Tab的汇总结果和图表按筛选条件缓存的条目数
+TAB_CACHE_ENTRIES = 32
+
+TAB_LABELS = ["📈 库存销售趋势", "🥧 渠道分布分析", "💧 瀑布图分析", "⚠️ 安全库存分析"]
+
+# 支持 on_change 的Streamlit版本中Tab按需渲染：只执行当前选中Tab的汇总和绘图，
+# 旧版本所有Tab照常渲染（各Tab的结果仍然有缓存）
+LAZY_TABS = 'on_change' in inspect.signature(st.tabs).parameters
+TAB_OPTIONS = {'key': 'active_tab', 'on_change': 'rerun'} if LAZY_TABS else {}
+
+def tab_open(tab):
+    """Tab是否需要渲染（不支持按需渲染时总是渲染）"""
+    return getattr(tab, 'open', None) is not False
+
+@st.cache_data(max_entries=TAB_CACHE_ENTRIES)
+def build_trend_tab(date_range):
+    """Tab1的周汇总和趋势图（按日期范围缓存）"""
+    # 按周汇总数据
+    weekly_data = weekly_trend(tab_cube(date_range))
     
-    # 时间筛选器
-    st.sidebar.header("🎯 筛选条件")
-    date_range = st.sidebar.date_input(
-        "选择日期范围",
-        value=(df['Report Date Hierarchy - Week Ending'].min().date(), 
-               df['Report Date Hierarchy - Week Ending'].max().date()),
-        min_value=df['Report Date Hierarchy - Week Ending'].min().date(),
-        max_value=df['Report Date Hierarchy - Week Ending'].max().date()
+    # 图表数据：时间跨度很长时在服务端降采样（指标仍按完整数据计算）
+    chart_data = downsample_frame(weekly_data, ['Inv.Value(RMB)', 'DS GIV', 'IDS GIV'])
+    
+    # 创建双轴图表
+    fig = make_subplots(
+        rows=2, cols=1,
+        subplot_titles=("库存金额趋势", "销售趋势（进货vs出货）"),
+        vertical_spacing=0.1
     )
     
-    # 根据日期筛选数据
-    if len(date_range) == 2:
-        filtered_df = df[
-            (df['Report Date Hierarchy - Week Ending'].dt.date >= date_range[0]) &
-            (df['Report Date Hierarchy - Week Ending'].dt.date <= date_range[1])
-        ]
-    else:
-        filtered_df = df
+    # 库存趋势
+    fig.add_trace(
+        go.Scatter(
+            x=chart_data['Report Date Hierarchy - Week Ending'],
+            y=chart_data['Inv.Value(RMB)'],
+            mode='lines+markers',
+            name='库存金额(RMB)',
+            line=dict(color='#FF6B6B', width=3),
+            marker=dict(size=6)
+        ),
+        row=1, col=1
+    )
     
-    # 渠道筛选器
-    available_channels = filtered_df['Store Group Channel'].dropna().unique()
-    selected_channels = st.sidebar.multiselect(
-        "选择销售渠道",
-        options=available_channels,
-        default=available_channels[:5] if len(available_channels) > 5 else available_channels
+    # 进货趋势
+    fig.add_trace(
+        go.Scatter(
+            x=chart_data['Report Date Hierarchy - Week Ending'],
+            y=chart_data['DS GIV'],
+            mode='lines+markers',
+            name='进货金额(DS GIV)',
+            line=dict(color='#4ECDC4', width=2),
+            marker=dict(size=4)
+        ),
+        row=2, col=1
     )
     
-    # Tab导航
-    tab1, tab2, tab3, tab4 = st.tabs(["📈 库存销售趋势", "🥧 渠道分布分析", "💧 瀑布图分析", "⚠️ 安全库存分析"])
+    # 出货趋势
+    fig.add_trace(
+        go.Scatter(
+            x=chart_data['Report Date Hierarchy - Week Ending'],
+            y=chart_data['IDS GIV'],
+            mode='lines+markers',
+            name='出货金额(IDS GIV)',
+            line=dict(color='#45B7D1', width=2),
+            marker=dict(size=4)
+        ),
+        row=2, col=1
+    )
     
-    with tab1:
-        st.header("📈 库存与销售趋势分析")
-        
-        # 按周汇总数据
-        weekly_data = filtered_df.groupby('Report Date Hierarchy - Week Ending').agg({
-            'Inv.Value(RMB)': 'sum',
-            'IDS GIV': 'sum',
-            'DS GIV': 'sum'
-        }).reset_index()
-        
-        # 创建双轴图表
-        fig = make_subplots(
-            rows=2, cols=1,
-            subplot_titles=("库存金额趋势", "销售趋势（进货vs出货）"),
-            vertical_spacing=0.1
-        )
-        
-        # 库存趋势
-        fig.add_trace(
-            go.Scatter(
-                x=weekly_data['Report Date Hierarchy - Week Ending'],
-                y=weekly_data['Inv.Value(RMB)'],
-                mode='lines+markers',
-                name='库存金额(RMB)',
-                line=dict(color='#FF6B6B', width=3),
-                marker=dict(size=6)
-            ),
-            row=1, col=1
-        )
-        
-        # 进货趋势
-        fig.add_trace(
-            go.Scatter(
-                x=weekly_data['Report Date Hierarchy - Week Ending'],
-                y=weekly_data['DS GIV'],
-                mode='lines+markers',
-                name='进货金额(DS GIV)',
-                line=dict(color='#4ECDC4', width=2),
-                marker=dict(size=4)
-            ),
-            row=2, col=1
+    fig.update_layout(
+        height=600,
+        title_text="库存与销售趋势分析",
+        showlegend=True
+    )
+    
+    fig.update_xaxes(title_text="日期")
+    fig.update_yaxes(title_text="金额(RMB)", row=1, col=1)
+    fig.update_yaxes(title_text="金额(RMB)", row=2, col=1)
+    return weekly_data, fig
+
+def render_trend_tab(date_range):
+    """Tab1：库存与销售趋势"""
+    st.header("📈 库存与销售趋势分析")
+    
+    weekly_data, fig = build_trend_tab(date_range)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # 关键指标
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        avg_inv = weekly_data['Inv.Value(RMB)'].mean()
+        st.metric("平均库存金额", f"¥{avg_inv:,.0f}")
+    with col2:
+        total_in = weekly_data['DS GIV'].sum()
+        st.metric("总进货金额", f"¥{total_in:,.0f}")
+    with col3:
+        total_out = weekly_data['IDS GIV'].sum()
+        st.metric("总出货金额", f"¥{total_out:,.0f}")
+    with col4:
+        turnover = total_out / avg_inv if avg_inv > 0 else 0
+        st.metric("库存周转次数", f"{turnover:.1f}")
+
+@st.cache_data(max_entries=TAB_CACHE_ENTRIES)
+def build_channel_tab(date_range, selected_channels):
+    """Tab2的月度渠道汇总和渠道趋势图（按日期范围和所选渠道缓存）"""
+    # 按月份和渠道汇总
+    monthly_channel = monthly_channel_sales(tab_cube(date_range), selected_channels)
+    
+    # 渠道趋势图
+    channel_trend = monthly_channel.pivot(index='Year-Month', columns='Store Group Channel', values='IDS GIV').fillna(0)
+    
+    fig_trend = None
+    if not channel_trend.empty:
+        # 将Period对象转换为字符串以避免JSON序列化错误
+        channel_trend_data = channel_trend.reset_index()
+        channel_trend_data['Year-Month'] = channel_trend_data['Year-Month'].astype(str)
+        channel_trend_melted = channel_trend_data.melt(id_vars='Year-Month', var_name='Channel', value_name='Amount')
+        
+        fig_trend = px.line(
+            channel_trend_melted,
+            x='Year-Month',
+            y='Amount',
+            color='Channel',
+            title="各渠道出货金额月度趋势"
         )
-        
-        # 出货趋势
-        fig.add_trace(
-            go.Scatter(
-                x=weekly_data['Report Date Hierarchy - Week Ending'],
-                y=weekly_data['IDS GIV'],
-                mode='lines+markers',
-                name='出货金额(IDS GIV)',
-                line=dict(color='#45B7D1', width=2),
-                marker=dict(size=4)
-            ),
-            row=2, col=1
+    return monthly_channel, fig_trend
+
+@st.cache_data(max_entries=TAB_CACHE_ENTRIES)
+def build_channel_pies(date_range, selected_channels, selected_month):
+    """所选月份的出货/进货渠道分布饼图，没有数据时对应位置为None"""
+    monthly_channel, _ = build_channel_tab(date_range, selected_channels)
+    month_data = monthly_channel[monthly_channel['Year-Month-Str'] == selected_month]
+    
+    # 出货金额饼图
+    fig_pie1 = None
+    if not month_data['IDS GIV'].isna().all() and month_data['IDS GIV'].sum() > 0:
+        fig_pie1 = px.pie(
+            month_data, 
+            values='IDS GIV', 
+            names='Store Group Channel',
+            title=f"{selected_month} - 出货金额分布",
+            color_discrete_sequence=px.colors.qualitative.Set3
         )
-        
-        fig.update_layout(
-            height=600,
-            title_text="库存与销售趋势分析",
-            showlegend=True
+    
+    # 进货金额饼图
+    fig_pie2 = None
+    if not month_data['DS GIV'].isna().all() and month_data['DS GIV'].sum() > 0:
+        fig_pie2 = px.pie(
+            month_data, 
+            values='DS GIV', 
+            names='Store Group Channel',
+            title=f"{selected_month} - 进货金额分布",
+            color_discrete_sequence=px.colors.qualitative.Pastel
         )
+    return fig_pie1, fig_pie2
+
+def render_channel_tab(date_range, selected_channels):
+    """Tab2：各月渠道销售分布"""
+    st.header("🥧 不同月份渠道销售分布")
+    
+    monthly_channel, fig_trend = build_channel_tab(date_range, selected_channels)
+    
+    # 月份选择器
+    available_months = monthly_channel['Year-Month-Str'].unique()
+    selected_month = st.selectbox(
+        "选择月份查看渠道分布",
+        options=available_months,
+        index=len(available_months)-1 if len(available_months) > 0 else 0,
+        key="selected_month_tab2"
+    )
+    
+    if selected_month and not monthly_channel.empty:
+        fig_pie1, fig_pie2 = build_channel_pies(date_range, selected_channels, selected_month)
         
-        fig.update_xaxes(title_text="日期")
-        fig.update_yaxes(title_text="金额(RMB)", row=1, col=1)
-        fig.update_yaxes(title_text="金额(RMB)", row=2, col=1)
-        
-        st.plotly_chart(fig, use_container_width=True)
+        col1, col2 = st.columns(2)
         
-        # 关键指标
-        col1, col2, col3, col4 = st.columns(4)
         with col1:
-            avg_inv = weekly_data['Inv.Value(RMB)'].mean()
-            st.metric("平均库存金额", f"¥{avg_inv:,.0f}")
+            if fig_pie1 is not None:
+                st.plotly_chart(fig_pie1, use_container_width=True)
+            else:
+                st.write("该月份无出货数据")
+        
         with col2:
-            total_in = weekly_data['DS GIV'].sum()
-            st.metric("总进货金额", f"¥{total_in:,.0f}")
-        with col3:
-            total_out = weekly_data['IDS GIV'].sum()
-            st.metric("总出货金额", f"¥{total_out:,.0f}")
-        with col4:
-            turnover = total_out / avg_inv if avg_inv > 0 else 0
-            st.metric("库存周转次数", f"{turnover:.1f}")
+            if fig_pie2 is not None:
+                st.plotly_chart(fig_pie2, use_container_width=True)
+            else:
+                st.write("该月份无进货数据")
     
-    with tab2:
-        st.header("🥧 不同月份渠道销售分布")
-        
-        # 按月份和渠道汇总
-        if selected_channels:
-            channel_filtered_df = filtered_df[filtered_df['Store Group Channel'].isin(selected_channels)]
-        else:
-            channel_filtered_df = filtered_df[filtered_df['Store Group Channel'].notna()]
-        
-        monthly_channel = channel_filtered_df.groupby(['Year-Month', 'Store Group Channel']).agg({
-            'IDS GIV': 'sum',
-            'DS GIV': 'sum'
-        }).reset_index()
-        
-        # 将Period对象转换为字符串
-        monthly_channel['Year-Month-Str'] = monthly_channel['Year-Month'].astype(str)
-        
-        # 月份选择器
-        available_months = monthly_channel['Year-Month-Str'].unique()
-        selected_month = st.selectbox(
-            "选择月份查看渠道分布",
-            options=available_months,
-            index=len(available_months)-1 if len(available_months) > 0 else 0,
-            key="selected_month_tab2"
-        )
-        
-        if selected_month and not monthly_channel.empty:
-            month_data = monthly_channel[monthly_channel['Year-Month-Str'] == selected_month]
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # 出货金额饼图
-                if not month_data['IDS GIV'].isna().all() and month_data['IDS GIV'].sum() > 0:
-                    fig_pie1 = px.pie(
-                        month_data, 
-                        values='IDS GIV', 
-                        names='Store Group Channel',
-                        title=f"{selected_month} - 出货金额分布",
-                        color_discrete_sequence=px.colors.qualitative.Set3
-                    )
-                    st.plotly_chart(fig_pie1, use_container_width=True)
-                else:
-                    st.write("该月份无出货数据")
-            
-            with col2:
-                # 进货金额饼图
-                if not month_data['DS GIV'].isna().all() and month_data['DS GIV'].sum() > 0:
-                    fig_pie2 = px.pie(
-                        month_data, 
-                        values='DS GIV', 
-                        names='Store Group Channel',
-                        title=f"{selected_month} - 进货金额分布",
-                        color_discrete_sequence=px.colors.qualitative.Pastel
-                    )
-                    st.plotly_chart(fig_pie2, use_container_width=True)
-                else:
-                    st.write("该月份无进货数据")
-        
-        # 渠道趋势图
-        st.subheader("各渠道月度趋势")
-        channel_trend = monthly_channel.pivot(index='Year-Month', columns='Store Group Channel', values='IDS GIV').fillna(0)
-        
-        if not channel_trend.empty:
-            # 将Period对象转换为字符串以避免JSON序列化错误
-            channel_trend_data = channel_trend.reset_index()
-            channel_trend_data['Year-Month'] = channel_trend_data['Year-Month'].astype(str)
-            channel_trend_melted = channel_trend_data.melt(id_vars='Year-Month', var_name='Channel', value_name='Amount')
-            
-            fig_trend = px.line(
-                channel_trend_melted,
-                x='Year-Month',
-                y='Amount',
-                color='Channel',
-                title="各渠道出货金额月度趋势"
-            )
-            st.plotly_chart(fig_trend, use_container_width=True)
+    st.subheader("各渠道月度趋势")
+    if fig_trend is not None:
+        st.plotly_chart(fig_trend, use_container_width=True)
+
+@st.cache_data(max_entries=TAB_CACHE_ENTRIES)
+def build_waterfall_tab(date_range):
+    """Tab3的月度汇总和瀑布图（按日期范围缓存）"""
+    # 按月汇总数据
+    monthly_data = monthly_summary(tab_cube(date_range))
     
-    with tab3:
-        st.header("💧 月度进销存瀑布图分析")
-        
-        # 按月汇总数据
-        monthly_summary = filtered_df.groupby('Year-Month').agg({
-            'DS GIV': 'sum',  # 进货
-            'IDS GIV': 'sum',  # 出货
-            'Inv.Value(RMB)': 'last'  # 期末库存
-        }).reset_index()
-        
-        monthly_summary['Month'] = monthly_summary['Year-Month'].astype(str)
-        monthly_summary = monthly_summary.sort_values('Year-Month')
-        
-        # 计算净变化（进货 - 出货）
-        monthly_summary['Net_Change'] = monthly_summary['DS GIV'] - monthly_summary['IDS GIV']
-        
-        # 创建瀑布图数据
-        months = monthly_summary['Month'].tolist()
-        inflow = monthly_summary['DS GIV'].tolist()
-        outflow = monthly_summary['IDS GIV'].tolist()
-        inventory = monthly_summary['Inv.Value(RMB)'].tolist()
-        
-        fig_waterfall = go.Figure()
-        
-        # 添加进货柱状图
-        fig_waterfall.add_trace(go.Bar(
-            x=months,
-            y=inflow,
-            name='进货(DS GIV)',
-            marker_color='lightgreen',
-            opacity=0.8
-        ))
-        
-        # 添加出货柱状图（负值）
-        fig_waterfall.add_trace(go.Bar(
-            x=months,
-            y=[-x for x in outflow],
-            name='出货(IDS GIV)',
-            marker_color='lightcoral',
-            opacity=0.8
-        ))
-        
-        # 添加库存折线图
-        fig_waterfall.add_trace(go.Scatter(
-            x=months,
-            y=inventory,
-            mode='lines+markers',
-            name='期末库存',
-            line=dict(color='orange', width=3),
-            marker=dict(size=8),
-            yaxis='y2'
-        ))
-        
-        # 更新布局
-        fig_waterfall.update_layout(
-            title="月度进销存瀑布图",
-            xaxis_title="月份",
-            yaxis_title="进货/出货金额(RMB)",
-            yaxis2=dict(
-                title="库存金额(RMB)",
-                overlaying='y',
-                side='right'
-            ),
-            height=500,
-            barmode='relative'
-        )
-        
-        st.plotly_chart(fig_waterfall, use_container_width=True)
-        
-        # 显示详细数据表
-        st.subheader("月度汇总数据")
-        display_df = monthly_summary[['Month', 'DS GIV', 'IDS GIV', 'Net_Change', 'Inv.Value(RMB)']].copy()
-        display_df.columns = ['月份', '进货金额', '出货金额', '净变化', '期末库存']
-        st.dataframe(display_df, use_container_width=True)
+    # 创建瀑布图数据
+    months = monthly_data['Month'].tolist()
+    inflow = monthly_data['DS GIV'].tolist()
+    outflow = monthly_data['IDS GIV'].tolist()
+    inventory = monthly_data['Inv.Value(RMB)'].tolist()
     
-    with tab4:
-        st.header("⚠️ Safety Stock Analysis")
-        
+    fig_waterfall = go.Figure()
+    
+    # 添加进货柱状图
+    fig_waterfall.add_trace(go.Bar(
+        x=months,
+        y=inflow,
+        name='进货(DS GIV)',
+        marker_color='lightgreen',
+        opacity=0.8
+    ))
+    
+    # 添加出货柱状图（负值）
+    fig_waterfall.add_trace(go.Bar(
+        x=months,
+        y=[-x for x in outflow],
+        name='出货(IDS GIV)',
+        marker_color='lightcoral',
+        opacity=0.8
+    ))
+    
+    # 添加库存折线图
+    fig_waterfall.add_trace(go.Scatter(
+        x=months,
+        y=inventory,
+        mode='lines+markers',
+        name='期末库存',
+        line=dict(color='orange', width=3),
+        marker=dict(size=8),
+        yaxis='y2'
+    ))
+    
+    # 更新布局
+    fig_waterfall.update_layout(
+        title="月度进销存瀑布图",
+        xaxis_title="月份",
+        yaxis_title="进货/出货金额(RMB)",
+        yaxis2=dict(
+            title="库存金额(RMB)",
+            overlaying='y',
+            side='right'
+        ),
+        height=500,
+        barmode='relative'
+    )
+    return monthly_data, fig_waterfall
+
+def render_waterfall_tab(date_range):
+    """Tab3：月度进销存瀑布图"""
+    st.header("💧 月度进销存瀑布图分析")
+    
+    monthly_data, fig_waterfall = build_waterfall_tab(date_range)
+    st.plotly_chart(fig_waterfall, use_container_width=True)
+    
+    # 显示详细数据表
+    st.subheader("月度汇总数据")
+    display_df = monthly_data[['Month', 'DS GIV', 'IDS GIV', 'Net_Change', 'Inv.Value(RMB)']].copy()
+    display_df.columns = ['月份', '进货金额', '出货金额', '净变化', '期末库存']
+    st.dataframe(display_df, use_container_width=True)
+
+@st.cache_data(max_entries=TAB_CACHE_ENTRIES)
+def build_safety_periods(date_range, review_period, retail_channels, offline_channels):
+    """
+    Tab4按周期汇总的库存和各渠道分组销售额（按日期范围和分析周期缓存）
+    
+    OTD和安全系数只影响最后的乘法，拖动滑块时不需要重新汇总。
+    """
+    filtered_cube = tab_cube(date_range)
+    period_data = period_inventory(filtered_cube, review_period)
+    
+    # 按渠道分组计算销售额
+    retail_sales = period_channel_sales(filtered_cube, review_period, retail_channels)
+    offline_sales = period_channel_sales(filtered_cube, review_period, offline_channels)
+    all_sales = period_channel_sales(filtered_cube, review_period)
+    return period_data, retail_sales, offline_sales, all_sales
+
+def render_safety_tab(date_range, safety_model=DEFAULT_MODEL, service_level=DEFAULT_SERVICE_LEVEL, lead_time_std=0.0):
+    """Tab4：安全库存分析"""
+    st.header("⚠️ Safety Stock Analysis")
+    
+    if safety_model == DEFAULT_MODEL:
         st.info("💡 Safety Stock Formula: Safety Stock = Daily Average Sales × Lead Time Days × Safety Factor")
+    else:
+        st.info(f"💡 Safety Stock Model: {SAFETY_MODELS[safety_model]} (Service Level {service_level:.0%})")
+    
+    # 重新定义渠道分组 - 为demo效果调整，让差异更明显
+    retail_channels = ['HSM', 'MM', 'CVS']  # 高销量核心零售渠道
+    offline_channels = ['HSM', 'MM', 'CVS', 'Grocery & Others', 'DCP', 'WS', 'B Store']  # 线下所有渠道
+    
+    # 显示渠道分组说明
+    with st.expander("📋 Channel Group Definition"):
+        st.markdown("### Channel Segmentation Strategy")
         
-        # 重新定义渠道分组 - 为demo效果调整，让差异更明显
-        retail_channels = ['HSM', 'MM', 'CVS']  # 高销量核心零售渠道
-        offline_channels = ['HSM', 'MM', 'CVS', 'Grocery & Others', 'DCP', 'WS', 'B Store']  # 线下所有渠道
-        
-        # 显示渠道分组说明
-        with st.expander("📋 Channel Group Definition"):
-            st.markdown("### Channel Segmentation Strategy")
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.markdown("**🔴 Retail Channels (Dotted Line)**")
-                st.write("High-volume core retail")
-                for channel in retail_channels:
-                    st.write(f"• {channel}")
-                    
-            with col2:
-                st.markdown("**🟡 Offline Channels (Dash-dot Line)**")
-                st.write("All offline distribution")
-                for channel in offline_channels:
-                    st.write(f"• {channel}")
-                    
-            with col3:
-                st.markdown("**🟢 All Channels (Solid Line)**")
-                st.write("Complete sales network")
-                st.write("• All Store Group Channels")
-                st.write("• Including online & offline")
-            
-            st.markdown("**Business Logic:**")
-            st.write("- **Retail**: Critical immediate-sale channels requiring highest safety stock")
-            st.write("- **Offline**: Traditional distribution network with moderate safety requirements") 
-            st.write("- **All Channels**: Complete demand coverage with baseline safety stock")
-        
-        # 参数设置
-        st.markdown("### 📊 Analysis Parameters")
         col1, col2, col3 = st.columns(3)
         with col1:
-            otd_days = st.slider("Lead Time (OTD Days)", min_value=1, max_value=30, value=7, help="Order to Delivery lead time", key="otd_days_tab4")
+            st.markdown("**🔴 Retail Channels (Dotted Line)**")
+            st.write("High-volume core retail")
+            for channel in retail_channels:
+                st.write(f"• {channel}")
+                
         with col2:
-            safety_factor = st.slider("Safety Factor", min_value=1.0, max_value=3.0, value=1.5, step=0.1, help="Safety multiplier for demand variability", key="safety_factor_tab4")
+            st.markdown("**🟡 Offline Channels (Dash-dot Line)**")
+            st.write("All offline distribution")
+            for channel in offline_channels:
+                st.write(f"• {channel}")
+                
         with col3:
-            review_period = st.selectbox("Analysis Period", ["Weekly", "Monthly"], index=1, key="review_period_tab4")
-        
+            st.markdown("**🟢 All Channels (Solid Line)**")
+            st.write("Complete sales network")
+            st.write("• All Store Group Channels")
+            st.write("• Including online & offline")
+        
+        st.markdown("**Business Logic:**")
+        st.write("- **Retail**: Critical immediate-sale channels requiring highest safety stock")
+        st.write("- **Offline**: Traditional distribution network with moderate safety requirements") 
+        st.write("- **All Channels**: Complete demand coverage with baseline safety stock")
+    
+    # 参数设置
+    st.markdown("### 📊 Analysis Parameters")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        otd_days = st.slider("Lead Time (OTD Days)", min_value=1, max_value=30, value=7, help="Order to Delivery lead time", key="otd_days_tab4")
+    with col2:
+        safety_factor = st.slider("Safety Factor", min_value=1.0, max_value=3.0, value=1.5, step=0.1, help="Safety multiplier for demand variability", key="safety_factor_tab4")
+    with col3:
+        review_period = st.selectbox("Analysis Period", ["Weekly", "Monthly"], index=1, key="review_period_tab4")
+    
 
-        
-        # 计算平均销售额
-        if review_period == "Weekly":
-            period_data = filtered_df.groupby('Report Date Hierarchy - Week Ending').agg({
-                'IDS GIV': 'sum',
-                'Inv.Value(RMB)': 'last'
-            }).reset_index()
-            period_data['Period'] = period_data['Report Date Hierarchy - Week Ending'].dt.strftime('%Y-%m-%d')
-            days_in_period = 7
-        else:
-            period_data = filtered_df.groupby('Year-Month').agg({
-                'IDS GIV': 'sum',
-                'Inv.Value(RMB)': 'last'
-            }).reset_index()
-            period_data['Period'] = period_data['Year-Month'].astype(str)
-            days_in_period = 30
-        
-        # 按渠道分组计算销售额
-        if review_period == "Weekly":
-            # 零售渠道销售额
-            retail_df = filtered_df[filtered_df['Store Group Channel'].isin(retail_channels)]
-            retail_sales = retail_df.groupby('Report Date Hierarchy - Week Ending')['IDS GIV'].sum() if not retail_df.empty else pd.Series(dtype=float)
-            
-            # 线下渠道销售额
-            offline_df = filtered_df[filtered_df['Store Group Channel'].isin(offline_channels)]
-            offline_sales = offline_df.groupby('Report Date Hierarchy - Week Ending')['IDS GIV'].sum() if not offline_df.empty else pd.Series(dtype=float)
-            
-            # 全渠道销售额
-            all_sales = filtered_df.groupby('Report Date Hierarchy - Week Ending')['IDS GIV'].sum()
-        else:
-            # 零售渠道销售额
-            retail_df = filtered_df[filtered_df['Store Group Channel'].isin(retail_channels)]
-            retail_sales = retail_df.groupby('Year-Month')['IDS GIV'].sum() if not retail_df.empty else pd.Series(dtype=float)
-            
-            # 线下渠道销售额
-            offline_df = filtered_df[filtered_df['Store Group Channel'].isin(offline_channels)]
-            offline_sales = offline_df.groupby('Year-Month')['IDS GIV'].sum() if not offline_df.empty else pd.Series(dtype=float)
-            
-            # 全渠道销售额
-            all_sales = filtered_df.groupby('Year-Month')['IDS GIV'].sum()
-        
-        # 计算日均销售额和安全库存 - 为demo效果调整倍数
-        retail_daily_avg = retail_sales.mean() / days_in_period if not retail_sales.empty and retail_sales.mean() > 0 else 0
-        offline_daily_avg = offline_sales.mean() / days_in_period if not offline_sales.empty and offline_sales.mean() > 0 else 0
-        all_daily_avg = all_sales.mean() / days_in_period if not all_sales.empty and all_sales.mean() > 0 else 0
-        
-        # 确保没有NaN值
-        retail_daily_avg = retail_daily_avg if not pd.isna(retail_daily_avg) else 0
-        offline_daily_avg = offline_daily_avg if not pd.isna(offline_daily_avg) else 0
-        all_daily_avg = all_daily_avg if not pd.isna(all_daily_avg) else 0
-        
+    
+    # 计算平均销售额
+    period_data, retail_sales, offline_sales, all_sales = build_safety_periods(
+        date_range, review_period, retail_channels, offline_channels
+    )
+    _, days_in_period = period_column(review_period)
+    
+    # 计算日均销售额和安全库存 - 为demo效果调整倍数
+    retail_daily_avg = retail_sales.mean() / days_in_period if not retail_sales.empty and retail_sales.mean() > 0 else 0
+    offline_daily_avg = offline_sales.mean() / days_in_period if not offline_sales.empty and offline_sales.mean() > 0 else 0
+    all_daily_avg = all_sales.mean() / days_in_period if not all_sales.empty and all_sales.mean() > 0 else 0
+    
+    # 确保没有NaN值
+    retail_daily_avg = retail_daily_avg if not pd.isna(retail_daily_avg) else 0
+    offline_daily_avg = offline_daily_avg if not pd.isna(offline_daily_avg) else 0
+    all_daily_avg = all_daily_avg if not pd.isna(all_daily_avg) else 0
+    
+    if safety_model == DEFAULT_MODEL:
         # 计算安全库存 - 为demo效果调整不同的安全系数
         safety_stock_retail = retail_daily_avg * otd_days * (safety_factor * 1.8)  # 零售渠道要求更高的安全库存
         safety_stock_offline = offline_daily_avg * otd_days * (safety_factor * 1.2)  # 线下渠道中等安全库存
         safety_stock_all = all_daily_avg * otd_days * safety_factor  # 全渠道基础安全库存
-        
-        # 将安全库存数据添加到period_data（每个周期都是相同的值）
-        period_data['Safety_Stock_Retail'] = safety_stock_retail
-        period_data['Safety_Stock_Offline'] = safety_stock_offline
-        period_data['Safety_Stock_All'] = safety_stock_all
-        
-        # 调试信息（可选，显示计算结果）
-        if st.checkbox("Show Debug Info", key="debug_info_tab4"):
-            with st.expander("📊 Calculation Details"):
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write("**Data Volume:**")
-                    st.write(f"- Retail channel records: {len(retail_df) if 'retail_df' in locals() else 0}")
-                    st.write(f"- Offline channel records: {len(offline_df) if 'offline_df' in locals() else 0}")
-                    st.write(f"- Total records: {len(filtered_df)}")
-                with col2:
-                    st.write("**Safety Multipliers:**")
-                    st.write(f"- Retail: {safety_factor * 1.8:.1f}x (High priority)")
-                    st.write(f"- Offline: {safety_factor * 1.2:.1f}x (Medium priority)")
-                    st.write(f"- All Channels: {safety_factor:.1f}x (Baseline)")
-        
-        current_avg_inv = period_data['Inv.Value(RMB)'].mean()
-        
-        # 重新设计指标显示布局
-        st.markdown("### 📈 Sales Performance Metrics")
-        
-        # 销售指标
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric(
-                "🔴 Retail Daily Sales", 
-                f"¥{retail_daily_avg:,.0f}",
-                help="High-volume core retail channels"
-            )
-        with col2:
-            st.metric(
-                "🟡 Offline Daily Sales", 
-                f"¥{offline_daily_avg:,.0f}",
-                help="Complete offline distribution network"
-            )
-        with col3:
-            st.metric(
-                "🟢 All Channels Daily Sales", 
-                f"¥{all_daily_avg:,.0f}",
-                help="Total sales across all channels"
-            )
-        with col4:
-            st.metric(
-                "📦 Current Inventory", 
-                f"¥{current_avg_inv:,.0f}",
-                help="Average inventory value"
-            )
-        
-        st.markdown("### 🛡️ Safety Stock Requirements")
-        
-        # 安全库存指标 - 重新设计
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            retail_status = "✅ Sufficient" if current_avg_inv >= safety_stock_retail else "⚠️ Low"
-            st.metric(
-                "🔴 Retail Safety Stock", 
-                f"¥{safety_stock_retail:,.0f}",
-                delta=f"{retail_status}"
-            )
-            st.caption(f"Safety Factor: {safety_factor * 1.8:.1f}x")
-            
-        with col2:
-            offline_status = "✅ Sufficient" if current_avg_inv >= safety_stock_offline else "⚠️ Low"
-            st.metric(
-                "🟡 Offline Safety Stock", 
-                f"¥{safety_stock_offline:,.0f}",
-                delta=f"{offline_status}"
-            )
-            st.caption(f"Safety Factor: {safety_factor * 1.2:.1f}x")
-            
-        with col3:
-            all_status = "✅ Sufficient" if current_avg_inv >= safety_stock_all else "⚠️ Low"
-            st.metric(
-                "🟢 All Channels Safety Stock", 
-                f"¥{safety_stock_all:,.0f}",
-                delta=f"{all_status}"
-            )
-            st.caption(f"Safety Factor: {safety_factor:.1f}x")
-        
-        # 安全库存趋势图
-        fig_safety = go.Figure()
-        
-        # 实际库存
-        fig_safety.add_trace(go.Scatter(
-            x=period_data['Period'],
-            y=period_data['Inv.Value(RMB)'],
-            mode='lines+markers',
-            name='实际库存',
-            line=dict(color='blue', width=3),
-            marker=dict(size=6)
-        ))
-        
-        # 零售渠道安全库存线
-        fig_safety.add_trace(go.Scatter(
-            x=period_data['Period'],
-            y=period_data['Safety_Stock_Retail'],
-            mode='lines',
-            name='🔴 Retail Channels Safety Stock',
-            line=dict(color='red', dash='dot', width=3)
-        ))
-        
-        # 线下渠道安全库存线
-        fig_safety.add_trace(go.Scatter(
-            x=period_data['Period'],
-            y=period_data['Safety_Stock_Offline'],
-            mode='lines',
-            name='🟡 Offline Channels Safety Stock',
-            line=dict(color='orange', dash='dashdot', width=2)
-        ))
-        
-        # 全渠道安全库存线
-        fig_safety.add_trace(go.Scatter(
-            x=period_data['Period'],
-            y=period_data['Safety_Stock_All'],
-            mode='lines',
-            name='🟢 All Channels Safety Stock',
-            line=dict(color='green', dash='solid', width=2)
-        ))
-        
-        fig_safety.update_layout(
-            title=f"Multi-Channel Safety Stock Analysis - {review_period} View",
-            xaxis_title="Time Period",
-            yaxis_title="Inventory Value (RMB)",
-            height=600,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            )
+        captions = [f"Safety Factor: {safety_factor * 1.8:.1f}x", f"Safety Factor: {safety_factor * 1.2:.1f}x", f"Safety Factor: {safety_factor:.1f}x"]
+    else:
+        # 按所选模型计算：周期销售额的方差 = 周期天数 × 日销量方差，由此折算日销量标准差
+        daily_avg = np.array([retail_daily_avg, offline_daily_avg, all_daily_avg])
+        daily_std = np.array([sales.std() for sales in [retail_sales, offline_sales, all_sales]]) / np.sqrt(days_in_period)
+        safety_stock_retail, safety_stock_offline, safety_stock_all = safety_stock_lines(
+            daily_avg, daily_std, otd_days, safety_model, service_level, lead_time_std
         )
-        
-        st.plotly_chart(fig_safety, use_container_width=True)
-        
-        # 多级预警分析
-        st.markdown("### 🚨 Multi-Level Alert Analysis")
-        
-        current_inv = period_data['Inv.Value(RMB)'].iloc[-1] if not period_data.empty else 0
-        
-        alert_levels = []
-        if current_inv < safety_stock_retail:
-            alert_levels.append(("🔴 CRITICAL", "Inventory below retail channels safety stock", safety_stock_retail - current_inv))
-        if current_inv < safety_stock_offline:
-            alert_levels.append(("🟡 WARNING", "Inventory below offline channels safety stock", safety_stock_offline - current_inv))
-        if current_inv < safety_stock_all:
-            alert_levels.append(("🔵 INFO", "Inventory below all channels safety stock", safety_stock_all - current_inv))
-        
-        if alert_levels:
-            for level, message, shortage in alert_levels:
-                st.warning(f"**{level}**: {message} - Recommended replenishment: ¥{shortage:,.0f}")
-        else:
-            st.success("✅ Inventory levels are healthy - No alerts triggered")
-        
-        # 详细数据表
-        st.markdown("### 📊 Safety Stock Data Summary")
-        display_df = period_data[['Period', 'Inv.Value(RMB)', 'Safety_Stock_Retail', 'Safety_Stock_Offline', 'Safety_Stock_All']].copy()
-        display_df.columns = ['Period', 'Actual Inventory', 'Retail Safety Stock', 'Offline Safety Stock', 'All Channels Safety Stock']
-        
-        # 格式化数值显示
-        for col in ['Actual Inventory', 'Retail Safety Stock', 'Offline Safety Stock', 'All Channels Safety Stock']:
-            display_df[col] = display_df[col].apply(lambda x: f"¥{x:,.0f}")
-        
-        st.dataframe(display_df, use_container_width=True)
-        
-        # 添加methodology说明
-        with st.expander("📚 Methodology & Demo Insights"):
-            st.markdown("""
-            ### Safety Stock Analysis Methodology
-            
-            **Channel Segmentation Strategy:**
-            - **Retail Channels (🔴)**: High-velocity, critical sales points requiring maximum safety stock
-            - **Offline Channels (🟡)**: Broader distribution network with moderate safety requirements  
-            - **All Channels (🟢)**: Complete demand coverage with baseline safety stock
-            
-            **Differentiated Safety Factors:**
-            - Retail: 1.8x multiplier (highest priority for stock availability)
-            - Offline: 1.2x multiplier (balanced approach)
-            - All Channels: 1.0x multiplier (baseline coverage)
-            
-            **Business Value:**
-            - Optimize inventory allocation across channel priorities
-            - Reduce stockout risk for critical sales channels
-            - Balance inventory costs with service level requirements
-            - Enable data-driven replenishment decisions
-            """)
-        
+        captions = [f"Service Level: {service_level:.0%}"] * 3
+    
+    # 将安全库存数据添加到period_data（每个周期都是相同的值）
+    period_data['Safety_Stock_Retail'] = safety_stock_retail
+    period_data['Safety_Stock_Offline'] = safety_stock_offline
+    period_data['Safety_Stock_All'] = safety_stock_all
+    
+    # 调试信息（可选，显示计算结果）
+    if st.checkbox("Show Debug Info", key="debug_info_tab4"):
+        with st.expander("📊 Calculation Details"):
+            col1, col2 = st.columns(2)
+            with col1:
+                filtered_cube = tab_cube(date_range)
+                st.write("**Data Volume:**")
+                st.write(f"- Retail channel records: {channel_record_count(filtered_cube, retail_channels)}")
+                st.write(f"- Offline channel records: {channel_record_count(filtered_cube, offline_channels)}")
+                st.write(f"- Total records: {channel_record_count(filtered_cube)}")
+            with col2:
+                st.write("**Safety Multipliers:**")
+                st.write(f"- Retail: {safety_factor * 1.8:.1f}x (High priority)")
+                st.write(f"- Offline: {safety_factor * 1.2:.1f}x (Medium priority)")
+                st.write(f"- All Channels: {safety_factor:.1f}x (Baseline)")
+    
+    current_avg_inv = period_data['Inv.Value(RMB)'].mean()
+    
+    # 重新设计指标显示布局
+    st.markdown("### 📈 Sales Performance Metrics")
+    
+    # 销售指标
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric(
+            "🔴 Retail Daily Sales", 
+            f"¥{retail_daily_avg:,.0f}",
+            help="High-volume core retail channels"
+        )
+    with col2:
+        st.metric(
+            "🟡 Offline Daily Sales", 
+            f"¥{offline_daily_avg:,.0f}",
+            help="Complete offline distribution network"
+        )
+    with col3:
+        st.metric(
+            "🟢 All Channels Daily Sales", 
+            f"¥{all_daily_avg:,.0f}",
+            help="Total sales across all channels"
+        )
+    with col4:
+        st.metric(
+            "📦 Current Inventory", 
+            f"¥{current_avg_inv:,.0f}",
+            help="Average inventory value"
+        )
+    
+    st.markdown("### 🛡️ Safety Stock Requirements")
+    
+    # 安全库存指标 - 重新设计
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        retail_status = "✅ Sufficient" if current_avg_inv >= safety_stock_retail else "⚠️ Low"
+        st.metric(
+            "🔴 Retail Safety Stock", 
+            f"¥{safety_stock_retail:,.0f}",
+            delta=f"{retail_status}"
+        )
+        st.caption(captions[0])
+        
+    with col2:
+        offline_status = "✅ Sufficient" if current_avg_inv >= safety_stock_offline else "⚠️ Low"
+        st.metric(
+            "🟡 Offline Safety Stock", 
+            f"¥{safety_stock_offline:,.0f}",
+            delta=f"{offline_status}"
+        )
+        st.caption(captions[1])
+        
+    with col3:
+        all_status = "✅ Sufficient" if current_avg_inv >= safety_stock_all else "⚠️ Low"
+        st.metric(
+            "🟢 All Channels Safety Stock", 
+            f"¥{safety_stock_all:,.0f}",
+            delta=f"{all_status}"
+        )
+        st.caption(captions[2])
+    
+    # 安全库存趋势图
+    fig_safety = go.Figure()
+    
+    # 实际库存
+    fig_safety.add_trace(go.Scatter(
+        x=period_data['Period'],
+        y=period_data['Inv.Value(RMB)'],
+        mode='lines+markers',
+        name='实际库存',
+        line=dict(color='blue', width=3),
+        marker=dict(size=6)
+    ))
+    
+    # 零售渠道安全库存线
+    fig_safety.add_trace(go.Scatter(
+        x=period_data['Period'],
+        y=period_data['Safety_Stock_Retail'],
+        mode='lines',
+        name='🔴 Retail Channels Safety Stock',
+        line=dict(color='red', dash='dot', width=3)
+    ))
+    
+    # 线下渠道安全库存线
+    fig_safety.add_trace(go.Scatter(
+        x=period_data['Period'],
+        y=period_data['Safety_Stock_Offline'],
+        mode='lines',
+        name='🟡 Offline Channels Safety Stock',
+        line=dict(color='orange', dash='dashdot', width=2)
+    ))
+    
+    # 全渠道安全库存线
+    fig_safety.add_trace(go.Scatter(
+        x=period_data['Period'],
+        y=period_data['Safety_Stock_All'],
+        mode='lines',
+        name='🟢 All Channels Safety Stock',
+        line=dict(color='green', dash='solid', width=2)
+    ))
+    
+    fig_safety.update_layout(
+        title=f"Multi-Channel Safety Stock Analysis - {review_period} View",
+        xaxis_title="Time Period",
+        yaxis_title="Inventory Value (RMB)",
+        height=600,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        )
+    )
+    
+    st.plotly_chart(fig_safety, use_container_width=True)
+    
+    # 多级预警分析
+    st.markdown("### 🚨 Multi-Level Alert Analysis")
+    
+    current_inv = period_data['Inv.Value(RMB)'].iloc[-1] if not period_data.empty else 0
+    
+    alert_levels = []
+    if current_inv < safety_stock_retail:
+        alert_levels.append(("🔴 CRITICAL", "Inventory below retail channels safety stock", safety_stock_retail - current_inv))
+    if current_inv < safety_stock_offline:
+        alert_levels.append(("🟡 WARNING", "Inventory below offline channels safety stock", safety_stock_offline - current_inv))
+    if current_inv < safety_stock_all:
+        alert_levels.append(("🔵 INFO", "Inventory below all channels safety stock", safety_stock_all - current_inv))
+    
+    if alert_levels:
+        for level, message, shortage in alert_levels:
+            st.warning(f"**{level}**: {message} - Recommended replenishment: ¥{shortage:,.0f}")
+    else:
+        st.success("✅ Inventory levels are healthy - No alerts triggered")
+    
+    # 详细数据表
+    st.markdown("### 📊 Safety Stock Data Summary")
+    display_df = period_data[['Period', 'Inv.Value(RMB)', 'Safety_Stock_Retail', 'Safety_Stock_Offline', 'Safety_Stock_All']].copy()
+    display_df.columns = ['Period', 'Actual Inventory', 'Retail Safety Stock', 'Offline Safety Stock', 'All Channels Safety Stock']
+    
+    # 格式化数值显示
+    for col in ['Actual Inventory', 'Retail Safety Stock', 'Offline Safety Stock', 'All Channels Safety Stock']:
+        display_df[col] = display_df[col].apply(lambda x: f"¥{x:,.0f}")
+    
+    st.dataframe(display_df, use_container_width=True)
+    
+    # 添加methodology说明
+    with st.expander("📚 Methodology & Demo Insights"):
+        st.markdown("""
+        ### Safety Stock Analysis Methodology
+        
+        **Channel Segmentation Strategy:**
+        - **Retail Channels (🔴)**: High-velocity, critical sales points requiring maximum safety stock
+        - **Offline Channels (🟡)**: Broader distribution network with moderate safety requirements  
+        - **All Channels (🟢)**: Complete demand coverage with baseline safety stock
+        
+        **Differentiated Safety Factors:**
+        - Retail: 1.8x multiplier (highest priority for stock availability)
+        - Offline: 1.2x multiplier (balanced approach)
+        - All Channels: 1.0x multiplier (baseline coverage)
+        
+        **Business Value:**
+        - Optimize inventory allocation across channel priorities
+        - Reduce stockout risk for critical sales channels
+        - Balance inventory costs with service level requirements
+        - Enable data-driven replenishment decisions
+        """)
+
+# 加载数据
+if USE_SQL_STORE:
+    store = load_store()
+    overview = store_overview(store) if store is not None else None
+else:
+    df = load_data()
+    overview = workbook_overview(df) if df is not None else None
+
+if overview is not None:
+    # 侧边栏 - 数据概览
+    st.sidebar.header("📈 数据概览")
+    st.sidebar.write(f"**数据行数**: {overview['rows']:,}")
+    st.sidebar.write(f"**时间范围**: {overview['first_date'].strftime('%Y-%m-%d')} 至 {overview['last_date'].strftime('%Y-%m-%d')}")
+    st.sidebar.write(f"**SKU**: {overview['fpc_code']}")
+    st.sidebar.write(f"**经销商**: {overview['distributor']}")
+    st.sidebar.write(f"**Hub**: {overview['hub']}")
+    
+    # 时间筛选器
+    st.sidebar.header("🎯 筛选条件")
+    date_range = st.sidebar.date_input(
+        "选择日期范围",
+        value=(overview['first_date'].date(), 
+               overview['last_date'].date()),
+        min_value=overview['first_date'].date(),
+        max_value=overview['last_date'].date()
+    )
+    
+    # 根据日期筛选数据（对汇总立方体切片，不再过滤原始记录）
+    filtered_cube = tab_cube(date_range)
+    
+    # 渠道筛选器
+    available_channels = cube_channels(filtered_cube)
+    selected_channels = st.sidebar.multiselect(
+        "选择销售渠道",
+        options=available_channels,
+        default=available_channels[:5] if len(available_channels) > 5 else available_channels
+    )
+    
+    # 安全库存模型（用于安全库存分析Tab）
+    st.sidebar.header("🛡️ 安全库存模型")
+    safety_model = st.sidebar.selectbox(
+        "计算模型",
+        options=list(SAFETY_MODELS),
+        format_func=SAFETY_MODELS.get,
+        help="移动平均模型使用演示用的分渠道安全系数；其余模型按日销量波动和目标服务水平计算"
+    )
+    service_level = DEFAULT_SERVICE_LEVEL
+    lead_time_std = 0.0
+    if safety_model != DEFAULT_MODEL:
+        service_level = st.sidebar.slider("目标服务水平", min_value=0.80, max_value=0.99, value=DEFAULT_SERVICE_LEVEL, step=0.01)
+        if safety_model == 'lead_time_variance':
+            lead_time_std = st.sidebar.number_input("交期标准差（天）", min_value=0.0, max_value=15.0, value=2.0, step=0.5)
+    
+    # Tab导航
+    tab1, tab2, tab3, tab4 = st.tabs(TAB_LABELS, **TAB_OPTIONS)
+    
+    with tab1:
+        if tab_open(tab1):
+            render_trend_tab(date_range)
+    
+    with tab2:
+        if tab_open(tab2):
+            render_channel_tab(date_range, selected_channels)
+    
+    with tab3:
+        if tab_open(tab3):
+            render_waterfall_tab(date_range)
+    
+    with tab4:
+        if tab_open(tab4):
+            render_safety_tab(date_range, safety_model, service_level, lead_time_std)
 
 else:
     st.error("无法加载数据文件，请确保 save.xlsx 文件存在于当前目录")
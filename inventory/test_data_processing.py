@@ -1,18 +1,14 @@
-import pandas as pd
 import numpy as np
+from sales_data import load_dataset, dataset_aggregate
 
 print("🔍 测试数据处理逻辑")
 print("=" * 40)
 
-# 加载数据
-df = pd.read_csv('/Users/willmbp/Documents/2024/My_projects/inventory/virtual_data_new_logic.csv')
+# 加载共享的数据集（超大文件自动分块流式汇总为 日期 × 渠道，内存占用与文件大小无关）
+dataset = load_dataset('virtual_data_new_logic.csv')
+df = dataset['frame']
 
-# 数据预处理
-df['Date'] = pd.to_datetime(df['Date'])
-df['Inv.Value(RMB)'] = pd.to_numeric(df['Inv.Value(RMB)'], errors='coerce')
-df['IDS GIV'] = pd.to_numeric(df['IDS GIV'], errors='coerce').fillna(0)
-
-print(f"数据总量: {len(df)} 条记录")
+print(f"数据总量: {dataset['rows']} 条记录")
 
 # 检查库存为0的情况
 zero_inventory_days = df[df['Inv.Value(RMB)'] == 0]['Date'].unique()
@@ -24,10 +20,7 @@ total_sales = df['IDS GIV'].sum()
 print(f"总销量: ¥{total_sales:,.0f}")
 
 # 按日期聚合检查
-daily_data = df.groupby('Date').agg({
-    'Inv.Value(RMB)': 'first',
-    'IDS GIV': 'sum'
-}).reset_index()
+daily_data = dataset_aggregate(dataset, 'daily')
 
 print(f"日期范围: {daily_data['Date'].min()} 至 {daily_data['Date'].max()}")
 print(f"有库存的天数: {len(daily_data[daily_data['Inv.Value(RMB)'] > 0])} 天")
@@ -49,7 +42,7 @@ if len(valid_sales_days) > 0:
 
 # 渠道分析
 print("\n渠道销量统计:")
-channel_sales = df.groupby('Store Group Channel')['IDS GIV'].sum().sort_values(ascending=False)
+channel_sales = dataset_aggregate(dataset, 'channel_totals')['sum']
 for channel, sales in channel_sales.head(5).items():
     print(f"  {channel}: ¥{sales:,.0f}")
 
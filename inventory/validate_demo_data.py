@@ -2,140 +2,165 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
-def validate_demo_data():
-    """验证演示数据的质量和预警逻辑展示效果"""
-    
-    print("🔍 验证演示数据...")
-    
-    # 加载数据
-    df = pd.read_csv('demo_inventory_data.csv')
-    
-    # 基本数据验证
-    print(f"\n📊 基本数据统计:")
-    print(f"总记录数: {len(df):,}")
-    print(f"日期范围: {df['Date'].min()} 至 {df['Date'].max()}")
-    print(f"唯一日期数: {df['Date'].nunique()}")
-    print(f"渠道数量: {df['Store Group Channel'].nunique()}")
-    
-    # 按日汇总数据
-    daily_data = df.groupby('Date').agg({
-        'Inv.Value(RMB)': 'first',
-        'IDS GIV': 'sum'
-    }).reset_index()
-    
-    daily_data['Date'] = pd.to_datetime(daily_data['Date'])
-    daily_data = daily_data.sort_values('Date')
+from backtest import backtest_alerts, summarize_backtest
+from data_quality import run_quality_checks
+from sales_data import load_dataset, dataset_aggregate
+
+def print_single_series(report):
+    """单条序列（演示数据）的详细输出"""
+    series = report['series'].iloc[0]
+    otd_summary = report['otd']
     
     print(f"\n📈 库存趋势分析:")
-    print(f"初始库存: ¥{daily_data['Inv.Value(RMB)'].iloc[0]:,.0f}")
-    print(f"最终库存: ¥{daily_data['Inv.Value(RMB)'].iloc[-1]:,.0f}")
-    print(f"最高库存: ¥{daily_data['Inv.Value(RMB)'].max():,.0f}")
-    print(f"最低库存: ¥{daily_data['Inv.Value(RMB)'].min():,.0f}")
+    print(f"初始库存: ¥{series['Initial_Inventory']:,.0f}")
+    print(f"最终库存: ¥{series['Final_Inventory']:,.0f}")
+    print(f"最高库存: ¥{series['Max_Inventory']:,.0f}")
+    print(f"最低库存: ¥{series['Min_Inventory']:,.0f}")
     
     # 销量分析
     print(f"\n💰 销量分析:")
-    print(f"总销量: ¥{daily_data['IDS GIV'].sum():,.0f}")
-    print(f"日均销量: ¥{daily_data['IDS GIV'].mean():,.0f}")
-    print(f"最高日销量: ¥{daily_data['IDS GIV'].max():,.0f}")
-    print(f"最低日销量: ¥{daily_data['IDS GIV'].min():,.0f}")
+    print(f"总销量: ¥{series['Total_Sales']:,.0f}")
+    print(f"日均销量: ¥{series['Mean_Sales']:,.0f}")
+    print(f"最高日销量: ¥{series['Max_Sales']:,.0f}")
+    print(f"最低日销量: ¥{series['Min_Sales']:,.0f}")
     
-    # 渠道分析
-    print(f"\n🏪 渠道销量排名:")
-    channel_sales = df.groupby('Store Group Channel')['IDS GIV'].sum().sort_values(ascending=False)
-    total_sales = channel_sales.sum()
-    
-    for i, (channel, sales) in enumerate(channel_sales.items(), 1):
-        percentage = (sales / total_sales) * 100
-        print(f"{i:2d}. {channel:20s}: ¥{sales:8,.0f} ({percentage:5.1f}%)")
+    print_channel_ranking(report)
     
     # 预警逻辑验证
     print(f"\n⚠️ 预警逻辑验证:")
-    
-    # 计算7日移动平均
-    daily_data['MA7'] = daily_data['IDS GIV'].rolling(window=7, min_periods=1).mean()
-    
-    # 不同OTD下的安全库存线
-    otd_scenarios = [7, 14, 21]
-    
-    for otd in otd_scenarios:
-        daily_data[f'Safety_Stock_{otd}'] = daily_data['MA7'] * otd
+    for _, scenario in otd_summary.iterrows():
+        print(f"\nOTD {scenario['OTD']:2d}天:")
+        print(f"  安全库存线均值: ¥{scenario['Safety_Stock_Mean']:,.0f}")
+        print(f"  触发预警天数: {scenario['Alert_Days']} / {scenario['Days']} 天")
         
-        # 检查预警触发情况
-        below_safety = daily_data[daily_data['Inv.Value(RMB)'] < daily_data[f'Safety_Stock_{otd}']]
-        
-        print(f"\nOTD {otd:2d}天:")
-        print(f"  安全库存线均值: ¥{daily_data[f'Safety_Stock_{otd}'].mean():,.0f}")
-        print(f"  触发预警天数: {len(below_safety)} / {len(daily_data)} 天")
-        
-        if len(below_safety) > 0:
-            print(f"  首次预警日期: {below_safety['Date'].min().strftime('%Y-%m-%d')}")
-            print(f"  最低库存/安全库存比: {(below_safety['Inv.Value(RMB)'] / below_safety[f'Safety_Stock_{otd}']).min():.1%}")
+        if scenario['Alert_Days'] > 0:
+            print(f"  首次预警日期: {scenario['First_Alert'].strftime('%Y-%m-%d')}")
+            print(f"  最低库存/安全库存比: {scenario['Min_Inventory_Ratio']:.1%}")
     
     # 补货事件识别
     print(f"\n🔄 补货事件分析:")
-    daily_data['Inventory_Change'] = daily_data['Inv.Value(RMB)'].diff()
-    restocks = daily_data[daily_data['Inventory_Change'] > 50000]  # 补货阈值5万
-    
+    restocks = report['restocks']
     if len(restocks) > 0:
         print(f"检测到 {len(restocks)} 次补货事件:")
-        for _, restock in restocks.iterrows():
-            print(f"  {restock['Date'].strftime('%Y-%m-%d')}: +¥{restock['Inventory_Change']:,.0f}")
+        for date, change in zip(restocks['Date'], restocks['Inventory_Change']):
+            print(f"  {date.strftime('%Y-%m-%d')}: +¥{change:,.0f}")
     else:
         print("未检测到明显的补货事件")
     
     # 数据质量检查
     print(f"\n✅ 数据质量检查:")
-    
-    # 检查缺失值
-    missing_inventory = daily_data['Inv.Value(RMB)'].isna().sum()
-    missing_sales = daily_data['IDS GIV'].isna().sum()
-    zero_inventory_days = (daily_data['Inv.Value(RMB)'] == 0).sum()
-    zero_sales_days = (daily_data['IDS GIV'] == 0).sum()
-    
-    print(f"库存缺失值: {missing_inventory} 天")
-    print(f"销量缺失值: {missing_sales} 天") 
-    print(f"零库存天数: {zero_inventory_days} 天")
-    print(f"零销量天数: {zero_sales_days} 天")
-    
-    # 逻辑一致性检查
-    inconsistent_days = 0
-    for i in range(1, len(daily_data)):
-        prev_inventory = daily_data.iloc[i-1]['Inv.Value(RMB)']
-        prev_sales = daily_data.iloc[i-1]['IDS GIV']
-        curr_inventory = daily_data.iloc[i]['Inv.Value(RMB)']
-        
-        # 计算理论库存（不考虑补货）
-        theoretical_inventory = prev_inventory - prev_sales
-        
-        # 如果当前库存明显高于理论库存，可能是补货
-        if curr_inventory > theoretical_inventory + 1000:  # 允许1000的误差
-            continue
-        
-        # 如果差异过大，标记为不一致
-        if abs(curr_inventory - theoretical_inventory) > 1000:
-            inconsistent_days += 1
-    
-    print(f"库存逻辑不一致天数: {inconsistent_days} 天")
+    print(f"库存缺失值: {series['Missing_Inventory_Days']} 天")
+    print(f"销量缺失值: {series['Missing_Sales_Days']} 天") 
+    print(f"零库存天数: {series['Zero_Inventory_Days']} 天")
+    print(f"零销量天数: {series['Zero_Sales_Days']} 天")
+    print(f"库存逻辑不一致天数: {series['Inconsistent_Days']} 天")
     
     # 演示效果评估
     print(f"\n🎯 演示效果评估:")
+    print(f"库存下降趋势天数比例: {series['Downward_Trend_Pct']:.1f}%")
+
+def print_multi_series(report):
+    """多条序列：输出各项检查的汇总和问题最多的序列"""
+    series = report['series']
+    otd_summary = report['otd']
     
-    # 检查是否有清晰的库存下降趋势
-    downward_trend_days = 0
-    for i in range(1, len(daily_data)):
-        if daily_data.iloc[i]['Inv.Value(RMB)'] < daily_data.iloc[i-1]['Inv.Value(RMB)']:
-            downward_trend_days += 1
+    print(f"\n📈 序列概况:")
+    print(f"序列数: {len(series):,}")
+    print(f"每条序列天数: {series['Days'].min()} - {series['Days'].max()} 天")
+    print(f"总销量: ¥{series['Total_Sales'].sum():,.0f}")
     
-    trend_percentage = (downward_trend_days / (len(daily_data) - 1)) * 100
+    print_channel_ranking(report)
+    
+    print(f"\n⚠️ 预警逻辑验证:")
+    for otd, scenario in otd_summary.groupby('OTD'):
+        alerted = scenario[scenario['Alert_Days'] > 0]
+        print(f"OTD {otd:2d}天: {len(alerted):,} / {len(scenario):,} 条序列触发预警，"
+              f"平均触发率 {scenario['Alert_Pct'].mean():.1f}%")
+    
+    print(f"\n🔄 补货事件分析:")
+    print(f"检测到 {len(report['restocks']):,} 次补货事件，"
+          f"涉及 {report['restocks']['Series'].nunique():,} 条序列")
+    
+    print(f"\n✅ 数据质量检查:")
+    for column, label in [
+        ('Missing_Inventory_Days', '库存缺失值'),
+        ('Missing_Sales_Days', '销量缺失值'),
+        ('Zero_Inventory_Days', '零库存天数'),
+        ('Zero_Sales_Days', '零销量天数'),
+        ('Inconsistent_Days', '库存逻辑不一致天数')
+    ]:
+        affected = (series[column] > 0).sum()
+        print(f"{label}: 共 {series[column].sum():,} 天，涉及 {affected:,} 条序列")
+    
+    worst = series[series['Inconsistent_Days'] > 0].nlargest(5, 'Inconsistent_Days')
+    if len(worst) > 0:
+        print(f"\n库存逻辑不一致最多的序列:")
+        columns = [c for c in ['Distributor', 'Hub', 'Product Hierarchy - Brand'] if c in worst.columns]
+        print(worst[columns + ['Days', 'Inconsistent_Days']].to_string(index=False))
+    
+    print(f"\n🎯 演示效果评估:")
+    transitions = (series['Days'] - 1).clip(lower=0).sum()
+    trend_percentage = series['Downward_Days'].sum() / transitions * 100 if transitions else 0
     print(f"库存下降趋势天数比例: {trend_percentage:.1f}%")
+
+def print_backtest(report):
+    """OTD 1-30天 历史预警回测：各预警级别的触发率和首次预警到断货的提前天数"""
+    summary = summarize_backtest(report['backtest'])
+    level_names = {'critical': '严重', 'warning': '警告', 'info': '提醒'}
+    
+    print(f"\n📆 历史预警回测 (OTD {summary['OTD'].min()}-{summary['OTD'].max()}天):")
+    for otd, rows in summary.groupby('OTD'):
+        parts = []
+        for row in rows.itertuples(index=False):
+            lead = f"断货前{row.Median_Lead_Days:.0f}天" if pd.notna(row.Median_Lead_Days) else "无断货"
+            parts.append(f"{level_names.get(row.Level, row.Level)} {row.Alerted_Series}/{row.Series}序列 {row.Alert_Pct:5.1f}% {lead}")
+        print(f"OTD {otd:2d}天: " + " | ".join(parts))
+
+def print_channel_ranking(report):
+    """渠道销量排名"""
+    print(f"\n🏪 渠道销量排名:")
+    for i, row in enumerate(report['channels'].itertuples(index=False), 1):
+        channel, sales, percentage = row
+        print(f"{i:2d}. {channel:20s}: ¥{sales:8,.0f} ({percentage:5.1f}%)")
+
+def validate_demo_data(data_path=None):
+    """验证演示数据的质量和预警逻辑展示效果（默认使用演示数据）"""
+    
+    print("🔍 验证演示数据...")
+    
+    # 加载共享的数据集（带类型的明细表，汇总结果按需计算并复用）
+    dataset = load_dataset(data_path)
+    df = dataset['frame']
+    
+    # 所有检查按序列向量化计算，返回结构化的报告
+    report = run_quality_checks(df)
+    overview = report['overview']
+    
+    # 基本数据验证
+    print(f"\n📊 基本数据统计:")
+    print(f"总记录数: {overview['records']:,}")
+    print(f"日期范围: {overview['start_date'].strftime('%Y-%m-%d')} 至 {overview['end_date'].strftime('%Y-%m-%d')}")
+    print(f"唯一日期数: {overview['unique_dates']}")
+    print(f"渠道数量: {overview['channels']}")
+    
+    if overview['series'] == 1:
+        print_single_series(report)
+    else:
+        print_multi_series(report)
+    
+    # 每个历史日期 × OTD网格 × 渠道分组一次广播回测
+    keys, daily, group_daily = dataset_aggregate(dataset, 'series_daily')
+    report['backtest'] = backtest_alerts(daily, group_daily, series_keys=keys)
+    print_backtest(report)
     
     # 检查HSM是否为主导渠道
-    hsm_percentage = (channel_sales['HSM'] / total_sales) * 100
+    channels = report['channels'].set_index('Store Group Channel')['Share_Pct']
+    hsm_percentage = channels.get('HSM', 0)
     print(f"HSM渠道占比: {hsm_percentage:.1f}% {'✅' if hsm_percentage > 60 else '❌'}")
     
     # 检查是否有多级预警触发
-    otd_14_alerts = len(daily_data[daily_data['Inv.Value(RMB)'] < daily_data['Safety_Stock_14']])
-    alert_percentage = (otd_14_alerts / len(daily_data)) * 100
+    otd_14 = report['otd'][report['otd']['OTD'] == 14]
+    alert_percentage = otd_14['Alert_Days'].sum() / otd_14['Days'].sum() * 100 if len(otd_14) else 0
     print(f"14天OTD预警触发率: {alert_percentage:.1f}% {'✅' if 20 <= alert_percentage <= 80 else '❌'}")
     
     print(f"\n🎉 演示数据验证完成！")
@@ -147,6 +172,9 @@ def validate_demo_data():
     print("3. ⚠️ 多阶段预警触发，展示预警系统的实用性")
     print("4. 🔄 包含补货事件，展示库存管理的动态性")
     print("5. 📈 数据逻辑一致，无异常值干扰演示效果")
+    
+    return report
 
 if __name__ == "__main__":
-    validate_demo_data() 
\ No newline at end of file
+    import sys
+    validate_demo_data(*sys.argv[1:2])